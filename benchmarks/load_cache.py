@@ -0,0 +1,55 @@
+"""
+Compare loading the index from YAML against the binary format.
+
+    python benchmarks/load_cache.py [HOOK_COUNT ...]
+"""
+
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+import yaml
+from pre_commit_hub.commands._index_file import IndexFile, write_index
+from pre_commit_hub.models import SearchIndex
+from synthetic import make_search_index
+
+
+def load_yaml(path: Path) -> SearchIndex:
+    with open(path, "r") as f:
+        return SearchIndex.model_validate(yaml.safe_load(f))
+
+
+def best_of(function, repeat: int) -> float:
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main() -> int:
+    hook_counts = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]
+
+    print(f"{'hooks':>8} {'yaml':>10} {'binary':>10} {'open':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for hook_count in hook_counts:
+            search_index = make_search_index(hook_count)
+            yaml_path = Path(tmp) / f"index-{hook_count}.yaml"
+            binary_path = Path(tmp) / f"index-{hook_count}.bin"
+            yaml_path.write_text(
+                yaml.dump(search_index.model_dump(), default_flow_style=False)
+            )
+            write_index(binary_path, search_index)
+
+            repeat = 1 if hook_count >= 100_000 else 3
+            yaml_time = best_of(lambda: load_yaml(yaml_path), repeat)
+            binary_time = best_of(
+                lambda: IndexFile(binary_path).to_search_index(), repeat
+            )
+            open_time = best_of(lambda: IndexFile(binary_path), repeat)
+            print(
+                f"{hook_count:>8} {yaml_time * 1000:>8.1f}ms"
+                f" {binary_time * 1000:>8.1f}ms {open_time * 1000:>8.2f}ms"
+                f" {yaml_time / binary_time:>7.1f}x"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
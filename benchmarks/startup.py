@@ -0,0 +1,105 @@
+"""
+Measure how long the CLI spends importing modules before doing any work, using
+`python -X importtime`, and fail if a command goes over its budget.
+
+    python benchmarks/startup.py [--repeat N]
+
+Only imports made after interpreter startup (i.e. after `site`) are counted,
+so the numbers don't depend on what else is installed in the environment.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+# Budgets in milliseconds of import time, for the median of the runs.
+BUDGETS = {
+    "--help": 30.0,
+    "remove": 60.0,
+}
+
+RUN_CLI = "import sys; from pre_commit_hub.cli import main; sys.exit(main())"
+
+CONFIG = """\
+repos:
+- repo: https://github.com/psf/black
+  rev: 24.4.2
+  hooks:
+  - id: black
+"""
+
+
+def import_times(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds of each top-level import made after `site`."""
+    times: Dict[str, int] = {}
+    after_site = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.startswith("  "):
+            continue
+        name = name.strip()
+        if after_site:
+            times[name] = times.get(name, 0) + int(cumulative)
+        elif name == "site":
+            after_site = True
+    return times
+
+
+def measure(args: List[str], cwd: Path, home: Path) -> Dict[str, int]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RUN_CLI, *args],
+        cwd=cwd,
+        env={**os.environ, "HOME": str(home)},
+        capture_output=True,
+        text=True,
+    )
+    return import_times(result.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__ and __doc__.split("\n\n")[1])
+    parser.add_argument("--repeat", type=int, default=7)
+    options = parser.parse_args()
+
+    commands = {
+        "--help": ["--help"],
+        "remove": ["remove", "black"],
+    }
+
+    exit_code = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        home = Path(tmp)
+        (home / ".pre-commit-hub").mkdir()
+        (home / ".pre-commit-hub" / "index.yaml").write_text("repositories: []\n")
+
+        print(f"{'command':<10} {'imports':>10} {'budget':>10}  slowest")
+        for name, args in commands.items():
+            runs = []
+            for _ in range(options.repeat):
+                config = home / ".pre-commit-config.yaml"
+                config.write_text(CONFIG)
+                runs.append(measure(args, home, home))
+
+            totals = sorted(sum(times.values()) / 1000 for times in runs)
+            median = totals[len(totals) // 2]
+            slowest = sorted(runs[-1].items(), key=lambda item: -item[1])[:3]
+            slowest_text = ", ".join(
+                f"{module} {micros / 1000:.1f}ms" for module, micros in slowest
+            )
+            budget = BUDGETS[name]
+            print(f"{name:<10} {median:>8.1f}ms {budget:>8.1f}ms  {slowest_text}")
+            if median > budget:
+                print(f"{name} is over its import time budget", file=sys.stderr)
+                exit_code = 1
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
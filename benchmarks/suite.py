@@ -0,0 +1,178 @@
+"""
+Benchmark index loading, search, hook lookup and config edits at synthetic
+scale, reporting latency and peak memory of each operation.
+
+    python benchmarks/suite.py                      # run and print
+    python benchmarks/suite.py --save baseline.json # also save as a baseline
+    python benchmarks/suite.py --compare baseline.json [--threshold 0.2]
+
+With `--compare`, exits with 1 if any operation got slower, or used more
+memory, than the baseline by more than the threshold. Baselines depend on
+the machine they were recorded on, so compare against one saved locally.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+import yaml
+from pre_commit_hub.commands import add, remove, search
+from pre_commit_hub.commands._index_file import IndexFile, write_index
+from pre_commit_hub.models import Hook
+from synthetic import make_config, make_search_index
+
+HOOK_COUNTS = [1_000, 10_000, 100_000]
+CONFIG_REPO_COUNTS = [100, 500]
+SEARCH_QUERIES = ["lint", "python format", "secrets docker", "zz"]
+
+# Changes smaller than these are noise, however large they are relatively.
+MIN_CHANGE = {"seconds": 0.001, "peak_bytes": 64 * 1024}
+
+Benchmark = Tuple[str, Callable[[], object]]
+
+
+def index_benchmarks(home: Path, hook_count: int) -> Iterator[Benchmark]:
+    search_index = make_search_index(hook_count)
+    cache_dir = home / ".pre-commit-hub"
+    cache_dir.mkdir(exist_ok=True)
+    for name in ("index.bin", "index.yaml"):
+        (cache_dir / name).unlink(missing_ok=True)
+
+    (cache_dir / "index.yaml").write_text(
+        yaml.dump(search_index.model_dump(), default_flow_style=False)
+    )
+    yield f"load_cache[yaml,{hook_count}]", search.load_cache
+    write_index(cache_dir / "index.bin", search_index)
+    yield f"load_cache[binary,{hook_count}]", search.load_cache
+    yield f"load_index[binary,{hook_count}]", search.load_index
+
+    yield (
+        f"search[{hook_count}]",
+        lambda: [search.extract(query) for query in SEARCH_QUERIES],
+    )
+    yield (
+        f"search_batch[{hook_count}]",
+        lambda: search.extract_many(SEARCH_QUERIES),
+    )
+
+    repo = search_index.repositories[len(search_index.repositories) // 2]
+    queries = [
+        repo.hooks[0].id,
+        f"{repo.repository.split('/')[1]}:{repo.hooks[0].id}",
+        f"{repo.repository.replace('/', ':')}:{repo.hooks[0].id}",
+    ]
+    yield (
+        f"find_hooks[lookup,{hook_count}]",
+        lambda: [
+            add.find_hooks(IndexFile(cache_dir / "index.bin"), query)
+            for query in queries
+        ],
+    )
+    yield (
+        f"find_hooks[scan,{hook_count}]",
+        lambda: [add.find_hooks(search_index, query) for query in queries],
+    )
+
+
+def config_benchmarks(repo_count: int) -> Iterator[Benchmark]:
+    config = make_config(repo_count)
+    hook = Hook(id="new-hook", name="New hook")
+    existing = yaml.safe_load(config)["repos"][repo_count // 2]
+    yield (
+        f"modify_yaml_config[{repo_count}]",
+        lambda: add.modify_yaml_config(config, hook, "new/repository", "v1.0.0"),
+    )
+    yield (
+        f"transform_yaml_remove_hook[{repo_count}]",
+        lambda: remove.transform_yaml_remove_hook(config, existing["hooks"][0]["id"]),
+    )
+
+
+def measure(function: Callable[[], object], repeat: int) -> Dict[str, float]:
+    # Time and memory are measured in separate runs, since tracing allocations
+    # slows everything down considerably.
+    seconds = min(timeit.repeat(function, number=1, repeat=repeat))
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def regressions(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[str]:
+    found = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric, value in result.items():
+            before = baseline[name][metric]
+            if value > before * (1 + threshold) and value - before > MIN_CHANGE[metric]:
+                found.append(
+                    f"{name}: {metric} went from {before:.6g} to {value:.6g}"
+                    f" (+{value / before - 1:.0%})"
+                )
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__ and __doc__.split("\n\n")[0])
+    parser.add_argument("--save", type=Path, help="Save the results as a baseline")
+    parser.add_argument("--compare", type=Path, help="Baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--hooks",
+        type=int,
+        nargs="+",
+        default=HOOK_COUNTS,
+        help="Index sizes to benchmark",
+    )
+    options = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'operation':<36} {'latency':>12} {'peak memory':>12}")
+    with tempfile.TemporaryDirectory() as home:
+        os.environ["HOME"] = home
+        for hook_count in options.hooks:
+            # The generator writes the files each benchmark reads right before
+            # yielding it, so the benchmarks must run as they are produced.
+            for name, function in index_benchmarks(Path(home), hook_count):
+                results[name] = measure(function, options.repeat)
+                report(name, results[name])
+        for repo_count in CONFIG_REPO_COUNTS:
+            for name, function in config_benchmarks(repo_count):
+                results[name] = measure(function, options.repeat)
+                report(name, results[name])
+
+    if options.save:
+        options.save.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+    if options.compare:
+        baseline = json.loads(options.compare.read_text())
+        found = regressions(results, baseline, options.threshold)
+        for regression in found:
+            print(f"regression: {regression}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+def report(name: str, result: Dict[str, float]) -> None:
+    print(
+        f"{name:<36} {result['seconds'] * 1000:>10.2f}ms"
+        f" {result['peak_bytes'] / 2**20:>10.1f}MiB"
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Synthetic data for benchmarks."""
+
+import random
+from pre_commit_hub.models import Hook, Repository, SearchIndex
+
+WORDS = [
+    "lint", "format", "check", "python", "yaml", "json", "docs", "spell",
+    "type", "sort", "imports", "secrets", "shell", "docker", "terraform", "go",
+    "rust", "markdown", "license", "commit", "whitespace", "security", "sql",
+]  # fmt: skip
+
+
+def make_search_index(hook_count: int, hooks_per_repo: int = 10, seed: int = 0):
+    rng = random.Random(seed)
+    repositories = []
+    for repo_index in range(0, hook_count, hooks_per_repo):
+        owner = f"{rng.choice(WORDS)}-org{repo_index}"
+        project = f"{rng.choice(WORDS)}-{rng.choice(WORDS)}"
+        hooks = []
+        for hook_index in range(min(hooks_per_repo, hook_count - repo_index)):
+            words = rng.sample(WORDS, 3)
+            hooks.append(
+                Hook(
+                    id=f"{'-'.join(words[:2])}-{hook_index}",
+                    name=" ".join(words).title(),
+                    description=(
+                        f"{' '.join(rng.sample(WORDS, 8))}."
+                        if rng.random() < 0.8
+                        else None
+                    ),
+                )
+            )
+        repositories.append(
+            Repository(
+                repository=f"{owner}/{project}",
+                stars=rng.randrange(100_000),
+                hooks=hooks,
+            )
+        )
+    return SearchIndex(repositories=repositories)
+
+
+def make_config(repo_count: int, hooks_per_repo: int = 3, seed: int = 0) -> str:
+    """A `.pre-commit-config.yaml` with `repo_count` pinned repositories."""
+    rng = random.Random(seed)
+    lines = ["repos:"]
+    for repo_index in range(repo_count):
+        owner = f"{rng.choice(WORDS)}-org{repo_index}"
+        project = f"{rng.choice(WORDS)}-{rng.choice(WORDS)}"
+        lines.append(f"- repo: https://github.com/{owner}/{project}")
+        lines.append(f"  rev: v{rng.randrange(10)}.{rng.randrange(20)}.0")
+        lines.append("  hooks:")
+        for hook_index in range(hooks_per_repo):
+            lines.append(f"  - id: {'-'.join(rng.sample(WORDS, 2))}-{hook_index}")
+            if rng.random() < 0.3:
+                lines.append(f"    args: [--{rng.choice(WORDS)}]")
+    return "\n".join(lines) + "\n"
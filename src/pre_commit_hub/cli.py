@@ -1,11 +1,16 @@
 import argparse
 import os
 from pathlib import Path
-from .commands.build_index import build_cache
-from .commands.search import search_hooks
-from .commands.add import add_hook
-from .commands.remove import remove_hook
-from .console import error, warning
+from . import trace
+
+# Command modules are imported by `main` only once it knows which command runs,
+# so e.g. `remove` doesn't pay for importing the GitHub and fuzzy search stacks.
+
+
+CONFIG_FILES_HELP = (
+    "Config file, directory containing one, or glob of either. Can be repeated"
+    " to edit many configs at once (default: .pre-commit-config.yaml)"
+)
 
 
 def check_cache_exists():
@@ -13,25 +18,134 @@ def check_cache_exists():
     return cache_file.exists()
 
 
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive integer, got {value}")
+    return number
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"expected a positive number, got {value}")
+    return number
+
+
+def non_negative_float(value: str) -> float:
+    number = float(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"expected a non-negative number, got {value}")
+    return number
+
+
 def setup_parser():
     parser = argparse.ArgumentParser(
         description="Experimental pre-commit package manager."
     )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the time spent in each phase of the command",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Write the phases as a Chrome trace to FILE (implies --profile)",
+    )
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
-    subparsers.add_parser(
+    build_parser = subparsers.add_parser(
         "build-index", help="(Re)build the index of pre-commit hooks."
     )
+    build_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=1,
+        help="Number of repositories to fetch concurrently (default: 1)",
+    )
+    build_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only download repositories that changed since the last build",
+    )
+    build_parser.add_argument(
+        "--graphql",
+        action="store_true",
+        help="Fetch repositories in bulk through the GraphQL API (needs a token)",
+    )
+    build_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue a build that failed or was interrupted, only fetching"
+        " the repositories it didn't get",
+    )
+    build_parser.add_argument(
+        "--publish",
+        metavar="DIRECTORY",
+        help="Also publish the index to DIRECTORY as shards for fetch-index",
+    )
+
+    fetch_parser = subparsers.add_parser(
+        "fetch-index", help="Download an index published with build-index --publish"
+    )
+    fetch_parser.add_argument(
+        "source", help="Directory or URL the index was published to"
+    )
 
     search_parser = subparsers.add_parser("search", help="Search for pre-commit hooks")
-    search_parser.add_argument("query", help="Search query")
+    search_parser.add_argument("query", nargs="?", help="Search query")
+    search_parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Search for every query in FILE, one per line ('-' for stdin)",
+    )
+    search_parser.add_argument(
+        "-n",
+        "--limit",
+        type=positive_int,
+        default=5,
+        help="Number of results to show (default: 5)",
+    )
+    search_output = search_parser.add_mutually_exclusive_group()
+    search_output.add_argument(
+        "--json",
+        dest="output",
+        action="store_const",
+        const="json",
+        default="text",
+        help="Print the results as a JSON array",
+    )
+    search_output.add_argument(
+        "--jsonl",
+        dest="output",
+        action="store_const",
+        const="jsonl",
+        help="Print the results as JSON, one object per line",
+    )
 
     add_parser = subparsers.add_parser("add", help="Add pre-commit hooks to the config")
     add_parser.add_argument("hook_ids", nargs="+", help="Hook IDs to add")
+    add_parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Ask GitHub for the latest revisions instead of using the index's",
+    )
+    add_parser.add_argument(
+        "--max-age",
+        type=non_negative_float,
+        default=7,
+        metavar="DAYS",
+        help="Ask GitHub for revisions the index resolved more than DAYS ago"
+        " (default: 7)",
+    )
     add_parser.add_argument(
         "-f",
         "--config-file",
-        help="Path to the config file (default: .pre-commit-config.yaml)",
+        dest="config_files",
+        action="append",
+        help=CONFIG_FILES_HELP,
     )
 
     remove_parser = subparsers.add_parser(
@@ -39,34 +153,146 @@ def setup_parser():
     )
     remove_parser.add_argument("hook_ids", nargs="+", help="Hook IDs to remove")
     remove_parser.add_argument(
+        "-f",
+        "--config-file",
+        dest="config_files",
+        action="append",
+        help=CONFIG_FILES_HELP,
+    )
+
+    update_parser = subparsers.add_parser(
+        "update", help="Update the repositories in the config to their latest revision"
+    )
+    update_parser.add_argument(
         "-f",
         "--config-file",
         help="Path to the config file (default: .pre-commit-config.yaml)",
     )
+    update_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Show the updates without writing the config",
+    )
+    update_parser.add_argument(
+        "--timeout",
+        type=positive_float,
+        help="Give up on a repository after this many seconds",
+    )
+    update_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=positive_int,
+        default=8,
+        help="Number of repositories to resolve concurrently (default: 8)",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="Keep the index in memory and answer searches from it"
+    )
+    serve_parser.add_argument(
+        "--socket",
+        help="Unix socket to listen on (default: ~/.pre-commit-hub/serve.sock)",
+    )
 
     return parser
 
 
+def warn_if_no_github_token() -> None:
+    if not os.environ.get("GITHUB_TOKEN"):
+        from .console import warning
+
+        warning("No `GITHUB_TOKEN` in env. GitHub API rate limits may be very low.")
+
+
+def report_github_usage() -> None:
+    from .commands._github import usage_summary
+
+    summary = usage_summary()
+    if summary:
+        print(summary)
+
+
 def main() -> int:
     parser = setup_parser()
     args = parser.parse_args()
 
-    if not os.environ.get("GITHUB_TOKEN"):
-        warning("No `GITHUB_TOKEN` in env. GitHub API rate limits may be very low.")
+    trace_file = args.trace or trace.trace_file_from_env()
+    if args.profile or trace_file or os.environ.get("PRE_COMMIT_HUB_TRACE", "0") != "0":
+        trace.enable()
+    try:
+        with trace.phase("cli.main", command=args.command):
+            return run(parser, args)
+    finally:
+        if trace.enabled():
+            trace.print_summary()
+            if trace_file:
+                trace.write_chrome_trace(Path(trace_file))
 
+
+def run(parser: argparse.ArgumentParser, args: argparse.Namespace) -> int:
     if args.command == "build-index":
-        return build_cache()
+        with trace.phase("import"):
+            from .commands.build_index import build_cache
+
+        warn_if_no_github_token()
+        exit_code = build_cache(
+            args.jobs, args.incremental, args.graphql, args.publish, args.resume
+        )
+        report_github_usage()
+        return exit_code
+
+    if args.command == "fetch-index":
+        with trace.phase("import"):
+            from .commands.fetch_index import fetch_index
+
+        return fetch_index(args.source)
+
+    if args.command == "update":
+        with trace.phase("import"):
+            from .commands.update import update_repos
+
+        warn_if_no_github_token()
+        exit_code = update_repos(
+            args.config_file, args.dry_run, args.timeout, args.jobs
+        )
+        report_github_usage()
+        return exit_code
+
+    from .console import error
 
     if not check_cache_exists():
         error("Cache does not exist. Please run 'build-index' first.")
         return 1
 
     if args.command == "search":
-        return search_hooks(args.query)
+        with trace.phase("import"):
+            from .commands.search import search_batch, search_hooks
+
+        if (args.query is None) == (args.batch is None):
+            parser.error("search takes either a query or --batch FILE")
+        elif args.batch is not None:
+            return search_batch(args.batch, args.limit, args.output)
+        return search_hooks(args.query, args.limit, args.output)
     elif args.command == "add":
-        return max(add_hook(hook_id, args.config_file) for hook_id in args.hook_ids)
+        with trace.phase("import"):
+            from .commands.add import add_hooks
+
+        warn_if_no_github_token()
+        exit_code = add_hooks(
+            args.hook_ids, args.config_files, args.fresh, args.max_age * 24 * 60 * 60
+        )
+        report_github_usage()
+        return exit_code
+    elif args.command == "serve":
+        with trace.phase("import"):
+            from .commands.serve import serve
+
+        return serve(args.socket)
     elif args.command == "remove":
-        return max(remove_hook(hook_id, args.config_file) for hook_id in args.hook_ids)
+        with trace.phase("import"):
+            from .commands.remove import remove_hooks
+
+        return remove_hooks(args.hook_ids, args.config_files)
     elif args.command is None:
         parser.print_help()
         return 1
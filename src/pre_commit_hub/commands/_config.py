@@ -0,0 +1,554 @@
+import os
+import tempfile
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from ..trace import phase, traced
+from yaml.nodes import MappingNode, Node, ScalarNode, SequenceNode
+
+# The C loader is much faster, and its nodes carry the same positions.
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# A replacement of `text[start:end]`.
+Patch = Tuple[int, int, str]
+
+
+@traced("config.write")
+def write_atomic(path: Path, content: Union[str, bytes]) -> None:
+    """
+    Replace the contents of `path` with `content`.
+    The content is written to a temporary file next to `path` and then renamed
+    over it, so readers (and interrupted runs) only ever see the old or the new
+    file, never a partially written one.
+    """
+    with open_atomic(path, "wb" if isinstance(content, bytes) else "w") as f:
+        f.write(content)
+
+
+@contextmanager
+def open_atomic(path: Path, mode: str = "w") -> Iterator[IO]:
+    """`write_atomic` for content written a piece at a time."""
+    if path.exists():
+        permissions = path.stat().st_mode & 0o777
+    else:
+        umask = os.umask(0)
+        os.umask(umask)
+        permissions = 0o666 & ~umask
+
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.chmod(tmp_name, permissions)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def render_scalar(value: str) -> str:
+    """`value` as a YAML scalar, quoted only if it would otherwise not load back
+    as the same string (e.g. `1.10`, `yes`)."""
+    return yaml.safe_dump(value, width=float("inf")).split("\n", 1)[0]
+
+
+def add_hook_to_data(
+    config: dict, repo_url: str, hook_id: str, rev: Optional[str]
+) -> None:
+    repo_entry = next((r for r in config["repos"] if r.get("repo") == repo_url), None)
+    if repo_entry is None:
+        repo_entry = {"repo": repo_url, "hooks": []}
+        if rev is not None:
+            repo_entry = {"repo": repo_url, "rev": rev, "hooks": []}
+        config["repos"].append(repo_entry)
+    elif "rev" not in repo_entry and rev is not None:
+        repo_entry["rev"] = rev
+    repo_entry.setdefault("hooks", [])
+    if not any(h.get("id") == hook_id for h in repo_entry["hooks"]):
+        repo_entry["hooks"].append({"id": hook_id})
+
+
+def remove_hook_from_data(config: dict, hook_id: str) -> bool:
+    """
+    Remove the hook from the parsed config in place, dropping repos left
+    without hooks. Returns whether any hook was removed.
+    """
+    removed = False
+    new_repos = []
+    for repo in config["repos"]:
+        hooks = repo.get("hooks", [])
+        new_hooks = [h for h in hooks if h.get("id") != hook_id]
+        removed = removed or len(new_hooks) != len(hooks)
+        if new_hooks:
+            repo["hooks"] = new_hooks
+            new_repos.append(repo)
+
+    config["repos"] = new_repos
+    return removed
+
+
+class ConfigEditor:
+    """
+    Edits a pre-commit config by patching its text.
+
+    The config is composed into YAML nodes, which remember where in the text
+    they came from, so an edit only inserts or deletes the lines of the entry it
+    touches, in the indentation style the config already uses. Comments and all
+    other lines are left as they are. Layouts the patches don't handle (e.g. a
+    flow style `hooks: [...]` list) fall back to dumping the whole config.
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self._document: Optional[Tuple[Optional[Node], dict]] = None
+
+    def _parse(self) -> Tuple[Optional[Node], dict]:
+        # Parsed on first use after every edit, so a batch of edits followed
+        # by a write doesn't parse the result of the last one.
+        if self._document is None:
+            with phase("config.parse"):
+                loader = Loader(self.text)
+                try:
+                    root = loader.get_single_node()
+                    data = None if root is None else loader.construct_document(root)
+                finally:
+                    loader.dispose()
+            self._document = root, data or {"repos": []}
+        return self._document
+
+    @property
+    def _root(self) -> Optional[Node]:
+        return self._parse()[0]
+
+    @property
+    def config(self) -> dict:
+        return self._parse()[1]
+
+    def _apply(self, patches: List[Patch]) -> None:
+        for start, end, replacement in sorted(patches, reverse=True):
+            self.text = self.text[:start] + replacement + self.text[end:]
+        self._document = None
+
+    def _rewrite(self) -> None:
+        self.text = yaml.dump(self.config, default_flow_style=False, sort_keys=False)
+        self._document = None
+
+    def _line_start(self, index: int) -> int:
+        return self.text.rfind("\n", 0, index) + 1
+
+    def _line_end(self, index: int) -> int:
+        """The start of the line after the one `index` is on."""
+        if index > 0 and self.text[index - 1] == "\n":
+            return index
+        newline = self.text.find("\n", index)
+        return len(self.text) if newline == -1 else newline + 1
+
+    def _content_end(self, node: Node) -> int:
+        """
+        Where the node's own text ends. A block collection's end mark is where
+        the next token starts, past any trailing blank lines and comments.
+        """
+        if (
+            not isinstance(node, (SequenceNode, MappingNode))
+            or node.flow_style
+            or not node.value
+        ):
+            return node.end_mark.index
+        last = node.value[-1]
+        return self._content_end(last[1] if isinstance(node, MappingNode) else last)
+
+    def _dash(self, item: Node) -> Optional[int]:
+        """Position of a block sequence item's `-`, if it starts its line."""
+        dash = self.text.rfind("-", 0, item.start_mark.index)
+        if dash == -1 or self.text[self._line_start(dash) : dash].strip():
+            return None
+        return dash
+
+    def _item_span(self, item: Node) -> Optional[Tuple[int, int]]:
+        """The lines of a block sequence item, from its `-` to its last line."""
+        dash = self._dash(item)
+        if dash is None:
+            return None
+        return self._line_start(dash), self._line_end(self._content_end(item))
+
+    def _insert_after(self, node: Node, lines: List[str]) -> Patch:
+        position = self._line_end(self._content_end(node))
+        prefix = "" if self.text[position - 1 : position] in ("", "\n") else "\n"
+        return position, position, prefix + "".join(lines)
+
+    def _replace_empty(self, key: Node, value: Node, lines: List[str]) -> Patch:
+        """Replace an empty value (`key:` or `key: []`) with block lines."""
+        end = self._line_end(value.end_mark.index)
+        # Keep a comment following the value.
+        rest = self.text[value.end_mark.index : end].rstrip()
+        return key.end_mark.index, end, f":{rest}\n" + "".join(lines)
+
+    @staticmethod
+    def _get(mapping: Optional[Node], key: str) -> Optional[Tuple[Node, Node]]:
+        if not isinstance(mapping, MappingNode):
+            return None
+        for key_node, value_node in mapping.value:
+            if isinstance(key_node, ScalarNode) and key_node.value == key:
+                return key_node, value_node
+        return None
+
+    @staticmethod
+    def _is_empty(node: Node) -> bool:
+        if isinstance(node, ScalarNode):
+            return node.tag == "tag:yaml.org,2002:null"
+        return isinstance(node, SequenceNode) and node.flow_style and not node.value
+
+    @staticmethod
+    def _is_block_sequence(node: Node) -> bool:
+        return isinstance(node, SequenceNode) and not node.flow_style
+
+    def _style(self) -> Tuple[int, int]:
+        """
+        How the config lays out sequences: how far `-` is indented past the key
+        owning the sequence, and how far the item's keys are past the `-`.
+        """
+        repos = self._get(self._root, "repos")
+        if repos is not None and self._is_block_sequence(repos[1]) and repos[1].value:
+            item = repos[1].value[0]
+            dash = self._dash(item)
+            if dash is not None:
+                dash_column = dash - self._line_start(dash)
+                return (
+                    dash_column - repos[0].start_mark.column,
+                    item.start_mark.column - dash_column,
+                )
+        return 0, 2
+
+    def _item_lines(
+        self, dash_column: int, gap: int, pairs: List[Tuple[str, str]]
+    ) -> List[str]:
+        first_key, first_value = pairs[0]
+        lines = [f"{' ' * dash_column}-{' ' * (gap - 1)}{first_key}: {first_value}\n"]
+        for key, value in pairs[1:]:
+            lines.append(f"{' ' * (dash_column + gap)}{key}:{value}\n")
+        return lines
+
+    def _entry_lines(
+        self, dash_column: int, repo_url: str, hook_id: str, rev: Optional[str]
+    ) -> List[str]:
+        offset, gap = self._style()
+        key_column = dash_column + gap
+        pairs = [("repo", render_scalar(repo_url))]
+        if rev is not None:
+            pairs.append(("rev", " " + render_scalar(rev)))
+        pairs.append(("hooks", ""))
+        return self._item_lines(dash_column, gap, pairs) + self._item_lines(
+            key_column + offset, gap, [("id", render_scalar(hook_id))]
+        )
+
+    def _fallback_add(self, repo_url: str, hook_id: str, rev: Optional[str]) -> bool:
+        add_hook_to_data(self.config, repo_url, hook_id, rev)
+        self._rewrite()
+        return True
+
+    @traced("config.add_hook")
+    def add_hook(self, repo_url: str, hook_id: str, rev: Optional[str]) -> bool:
+        """
+        Add the hook to the repository's entry, creating the entry (pinned to
+        `rev`) if there is none, and pinning an unpinned entry to `rev`.
+        Returns whether the config changed.
+        """
+        if self._root is not None and not isinstance(self._root, MappingNode):
+            return self._fallback_add(repo_url, hook_id, rev)
+
+        repos = self._get(self._root, "repos")
+        if repos is None:
+            # An empty file, or one without a `repos` key yet.
+            prefix = "" if self.text[-1:] in ("", "\n") else "\n"
+            lines = ["repos:\n", *self._entry_lines(0, repo_url, hook_id, rev)]
+            end = len(self.text)
+            self._apply([(end, end, prefix + "".join(lines))])
+            return True
+
+        key, value = repos
+        offset, _ = self._style()
+        if self._is_empty(value):
+            lines = self._entry_lines(
+                key.start_mark.column + offset, repo_url, hook_id, rev
+            )
+            self._apply([self._replace_empty(key, value, lines)])
+            return True
+        if not self._is_block_sequence(value):
+            return self._fallback_add(repo_url, hook_id, rev)
+
+        entry = None
+        for item in value.value:
+            repo = self._get(item, "repo")
+            if repo is not None and repo[1].value == repo_url:
+                entry = item
+                break
+        if entry is None:
+            last = value.value[-1]
+            dash = self._dash(last)
+            if dash is None:
+                return self._fallback_add(repo_url, hook_id, rev)
+            lines = self._entry_lines(
+                dash - self._line_start(dash), repo_url, hook_id, rev
+            )
+            self._apply([self._insert_after(last, lines)])
+            return True
+
+        hooks = self._get(entry, "hooks")
+        if hooks is None or entry.flow_style:
+            return self._fallback_add(repo_url, hook_id, rev)
+        for hook in hooks[1].value if isinstance(hooks[1], SequenceNode) else []:
+            hook_id_pair = self._get(hook, "id")
+            if hook_id_pair is not None and hook_id_pair[1].value == hook_id:
+                return False
+
+        patches: List[Patch] = []
+        repo_key, repo_value = self._get(entry, "repo")  # type: ignore[misc]
+        if self._get(entry, "rev") is None and rev is not None:
+            indent = " " * repo_key.start_mark.column
+            patches.append(
+                self._insert_after(repo_value, [f"{indent}rev: {render_scalar(rev)}\n"])
+            )
+
+        hooks_key, hooks_value = hooks
+        _, gap = self._style()
+        if self._is_empty(hooks_value):
+            lines = self._item_lines(
+                hooks_key.start_mark.column + offset,
+                gap,
+                [("id", render_scalar(hook_id))],
+            )
+            patches.append(self._replace_empty(hooks_key, hooks_value, lines))
+        elif self._is_block_sequence(hooks_value):
+            last = hooks_value.value[-1]
+            dash = self._dash(last)
+            if dash is None:
+                return self._fallback_add(repo_url, hook_id, rev)
+            dash_column = dash - self._line_start(dash)
+            lines = self._item_lines(
+                dash_column,
+                last.start_mark.column - dash_column,
+                [("id", render_scalar(hook_id))],
+            )
+            patches.append(self._insert_after(last, lines))
+        else:
+            return self._fallback_add(repo_url, hook_id, rev)
+
+        self._apply(patches)
+        return True
+
+    @traced("config.set_revisions")
+    def set_revisions(self, revisions: Dict[str, str]) -> bool:
+        """
+        Pin the entries of the repositories in `revisions` (by URL) to their
+        revision. Returns whether the config changed.
+        """
+        repos = self._get(self._root, "repos")
+        if repos is None or not isinstance(repos[1], SequenceNode):
+            return False
+
+        patches: List[Patch] = []
+        for item in repos[1].value:
+            repo = self._get(item, "repo")
+            if repo is None or repo[1].value not in revisions:
+                continue
+            revision = revisions[repo[1].value]
+            rev = self._get(item, "rev")
+            if rev is not None and rev[1].value == revision:
+                continue
+            if rev is not None and isinstance(rev[1], ScalarNode):
+                patches.append(
+                    (
+                        rev[1].start_mark.index,
+                        rev[1].end_mark.index,
+                        render_scalar(revision),
+                    )
+                )
+            elif rev is None and not item.flow_style:
+                indent = " " * repo[0].start_mark.column
+                patches.append(
+                    self._insert_after(
+                        repo[1], [f"{indent}rev: {render_scalar(revision)}\n"]
+                    )
+                )
+            else:
+                for entry in self.config["repos"]:
+                    if entry.get("repo") in revisions:
+                        entry["rev"] = revisions[entry["repo"]]
+                self._rewrite()
+                return True
+
+        if not patches:
+            return False
+        self._apply(patches)
+        return True
+
+    @traced("config.remove_hook")
+    def remove_hook(self, hook_id: str) -> bool:
+        """
+        Remove the hook from every repository, dropping the entries of
+        repositories left without hooks. Returns whether any hook was removed.
+        """
+        repos = self._get(self._root, "repos")
+        if repos is None or self._is_empty(repos[1]):
+            return False
+
+        items = repos[1].value if self._is_block_sequence(repos[1]) else None
+        patches: List[Patch] = []
+        removed_entries = 0
+        for item in items or []:
+            hooks = self._get(item, "hooks")
+            if hooks is None or not isinstance(hooks[1], SequenceNode):
+                continue
+            matches = []
+            for hook in hooks[1].value:
+                hook_id_pair = self._get(hook, "id")
+                if hook_id_pair is not None and hook_id_pair[1].value == hook_id:
+                    matches.append(hook)
+            if not matches:
+                continue
+
+            if len(matches) == len(hooks[1].value):
+                removed_entries += 1
+                spans = [self._item_span(item)]
+            elif hooks[1].flow_style:
+                spans = [None]
+            else:
+                spans = [self._item_span(hook) for hook in matches]
+            if None in spans:
+                items = None
+                break
+            patches.extend((start, end, "") for start, end in spans)  # type: ignore[misc]
+
+        if items is None:
+            removed = remove_hook_from_data(self.config, hook_id)
+            if removed:
+                self._rewrite()
+            return removed
+        if not patches:
+            return False
+
+        if removed_entries == len(items):
+            # Leave `repos: []` rather than a null `repos:`.
+            key, value = repos
+            patches = [
+                (key.end_mark.index, self._line_end(self._content_end(value)), ": []\n")
+            ]
+        self._apply(patches)
+        return True
+
+
+class ConfigError(Exception):
+    """A config that isn't shaped like a pre-commit config."""
+
+
+def check_config(config: Any) -> None:
+    """Raise `ConfigError` unless the edits can make sense of `config`."""
+    if not isinstance(config, dict):
+        raise ConfigError("expected a mapping at the top level")
+    repos = config.get("repos")
+    if repos is None:
+        return
+    if not isinstance(repos, list):
+        raise ConfigError("expected `repos` to be a list")
+    for repo in repos:
+        if not isinstance(repo, dict):
+            raise ConfigError("expected every entry of `repos` to be a mapping")
+        hooks = repo.get("hooks", [])
+        if not isinstance(hooks, list) or not all(
+            isinstance(hook, dict) for hook in hooks
+        ):
+            raise ConfigError("expected `hooks` to be a list of mappings")
+
+
+class ConfigTransaction:
+    """
+    A batch of edits to a pre-commit config.
+    The config is parsed once when the transaction is created, edits patch the
+    text in memory and `commit` writes the result back with a single atomic
+    write, only if an edit marked the transaction as `changed`.
+    Raises `ConfigError` if the config isn't shaped like a pre-commit config.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.editor = ConfigEditor(path.read_text() if path.exists() else "")
+        self.changed = False
+        check_config(self.editor.config)
+
+    @property
+    def config(self) -> dict:
+        return self.editor.config
+
+    def add_hook(self, repo_url: str, hook_id: str, rev: Optional[str]) -> bool:
+        changed = self.editor.add_hook(repo_url, hook_id, rev)
+        self.changed = self.changed or changed
+        return changed
+
+    def set_revisions(self, revisions: Dict[str, str]) -> bool:
+        changed = self.editor.set_revisions(revisions)
+        self.changed = self.changed or changed
+        return changed
+
+    def remove_hook(self, hook_id: str) -> bool:
+        removed = self.editor.remove_hook(hook_id)
+        self.changed = self.changed or removed
+        return removed
+
+    def commit(self) -> None:
+        if self.changed:
+            write_atomic(self.path, self.editor.text)
+            self.changed = False
+
+
+# How many configs `edit_configs` edits at once.
+MAX_WORKERS = 8
+
+
+@dataclass
+class ConfigResult:
+    path: Path
+    changed: bool = False
+    error: Optional[str] = None
+
+
+def edit_configs(
+    paths: List[Path], edit: Callable[[ConfigTransaction], object]
+) -> List[ConfigResult]:
+    """
+    Apply `edit` to each config, concurrently, writing the ones it changed.
+    A config that can't be read, parsed or written doesn't stop the others.
+    """
+
+    def edit_config(path: Path) -> ConfigResult:
+        if not path.is_file():
+            return ConfigResult(path, error="not found")
+        try:
+            transaction = ConfigTransaction(path)
+            edit(transaction)
+            changed = transaction.changed
+            transaction.commit()
+        except (OSError, yaml.YAMLError, ConfigError) as e:
+            return ConfigResult(path, error=str(e))
+        return ConfigResult(path, changed=changed)
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(paths))) as executor:
+        return list(executor.map(edit_config, paths))
+
+
+def report_config_results(results: List[ConfigResult]) -> int:
+    """Print which configs changed, and return 1 if any couldn't be edited."""
+    from ..console import error
+
+    changed = [result for result in results if result.changed]
+    print(f"Changed {len(changed)} of {len(results)} configs")
+    for result in changed:
+        print(f"  {result.path}")
+
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        error(f"{result.path}: {result.error}")
+    return 1 if failed else 0
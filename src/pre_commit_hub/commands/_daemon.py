@@ -0,0 +1,71 @@
+"""
+Client for a running `pre-commit-hub serve`.
+
+Kept free of the heavy dependencies so that talking to the server is all a
+command pays for when one is running.
+
+The protocol is JSON lines over a Unix socket: each request is an object with a
+`command` and its parameters, and each response is `{"result": ...}` or
+`{"error": "..."}`.
+"""
+
+import json
+import socket
+from pathlib import Path
+from typing import Any, Optional
+
+
+class DaemonError(Exception):
+    pass
+
+
+def socket_path() -> Path:
+    return Path.home() / ".pre-commit-hub" / "serve.sock"
+
+
+class Daemon:
+    """A connection to a running server."""
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._socket = sock
+        self._file = sock.makefile("rwb")
+
+    @classmethod
+    def connect(cls, path: Optional[Path] = None) -> Optional["Daemon"]:
+        """Connect to the server, or return `None` if none is running."""
+        if not hasattr(socket, "AF_UNIX"):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(path or socket_path()))
+        except OSError:
+            # No socket, or a stale one left by a server that was killed.
+            sock.close()
+            return None
+        return cls(sock)
+
+    def request(self, command: str, **params: Any) -> Any:
+        try:
+            self._file.write(json.dumps({"command": command, **params}).encode())
+            self._file.write(b"\n")
+            self._file.flush()
+            line = self._file.readline()
+        except OSError as e:
+            raise DaemonError(f"Lost connection to the server: {e}") from e
+        if not line:
+            raise DaemonError("The server closed the connection")
+
+        response = json.loads(line)
+        if "error" in response:
+            raise DaemonError(response["error"])
+        return response["result"]
+
+    def close(self) -> None:
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self) -> "Daemon":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,258 @@
+"""
+Fuzzy hook search backed by a trigram inverted index.
+
+Documents are scored exactly like `thefuzz.process.extract` with
+`fuzz.partial_token_sort_ratio` scores the hook dicts `search` used to build,
+but their normalized, token-sorted text is computed once at `build-index` time.
+At query time the trigram postings pick the documents sharing the most
+trigrams with the query, and scoring stops as soon as no remaining document can
+beat the current top-K.
+
+Batches of queries skip the trigram index: `extract_many` scores every document
+against many queries at once with rapidfuzz's `cdist`, on all CPUs.
+"""
+
+import heapq
+from array import array
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+from rapidfuzz import fuzz as rfuzz
+from rapidfuzz import process as rprocess
+from thefuzz.utils import full_process
+from ..models import Hook, Repository
+from ..trace import traced
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789 "
+GRAM_COUNT = len(ALPHABET) ** 3
+
+# Queries scored per `cdist` call, which allocates a score for every document
+# for each of them.
+BATCH_SIZE = 256
+
+CUTOFF_SLACK = 1e-3
+
+_CODES = {char: code for code, char in enumerate(ALPHABET)}
+_OTHER = _CODES[" "]
+
+
+def normalize(text: str) -> str:
+    """Apply the processing `partial_token_sort_ratio` applies to its input."""
+    return " ".join(sorted(full_process(text, force_ascii=True).split()))
+
+
+def document_text(repository: Repository, hook: Hook) -> str:
+    # `search` used to score the `str()` of this dict, so keep its exact shape
+    # to keep scores (and therefore rankings) unchanged.
+    document = {
+        "repository": repository.repository,
+        "stars": repository.stars,
+        **hook.model_dump(),
+    }
+    return normalize(str(document))
+
+
+def trigrams(text: str) -> Set[int]:
+    codes = [_CODES.get(char, _OTHER) for char in text]
+    base = len(ALPHABET)
+    return {
+        (codes[i] * base + codes[i + 1]) * base + codes[i + 2]
+        for i in range(len(codes) - 2)
+    }
+
+
+def build_postings(documents: Sequence[str]) -> Tuple[array, array]:
+    """
+    Build the inverted index as two flat arrays: the documents containing
+    trigram `g` are `postings[offsets[g]:offsets[g + 1]]`, in increasing order.
+    """
+    buckets: Dict[int, List[int]] = {}
+    for doc_index, text in enumerate(documents):
+        for gram in trigrams(text):
+            buckets.setdefault(gram, []).append(doc_index)
+
+    offsets = array("I", [0])
+    postings = array("I")
+    for gram in range(GRAM_COUNT):
+        postings.extend(buckets.get(gram, ()))
+        offsets.append(len(postings))
+    return offsets, postings
+
+
+def upper_bound(query: str, distinct_grams: int, shared_grams: int) -> float:
+    """
+    The best `partial_ratio` a document sharing `shared_grams` of the query's
+    trigrams can reach, for documents at least as long as the query.
+
+    Each insertion or deletion touches at most three of the query's trigrams,
+    so the best-aligned window is at least `ceil(missing / 3)` edits away, and
+    the window is never longer than the query.
+    """
+    min_distance = -(-(distinct_grams - shared_grams) // 3)
+    return 100 * (1 - min_distance / (2 * len(query)))
+
+
+class FuzzyIndex:
+    def __init__(
+        self,
+        document: Callable[[int], str],
+        document_count: int,
+        min_length: int = 0,
+        postings_offsets: Optional[Sequence[int]] = None,
+        postings: Optional[Sequence[int]] = None,
+    ) -> None:
+        self._document = document
+        self._document_count = document_count
+        self._min_length = min_length
+        self._postings_offsets = postings_offsets
+        self._postings = postings
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[str]) -> "FuzzyIndex":
+        """An index without postings, which scores every document."""
+        return cls(documents.__getitem__, len(documents))
+
+    def _score(
+        self,
+        query: str,
+        doc_indexes: Sequence[int],
+        limit: int,
+        score_cutoff: float = 0,
+    ) -> List[Tuple[float, int]]:
+        """
+        The `limit` best scoring of `doc_indexes`, which must be in increasing
+        order for ties to be broken by document order.
+        """
+        # Scores below `score_cutoff` cannot make the top-K, so rapidfuzz is
+        # allowed to give up on those documents early, and it keeps only the
+        # best `limit` instead of returning (and sorting) every score.
+        # rapidfuzz drops documents scoring exactly the cutoff, which would lose
+        # ties with lower document indexes than the current top-K's last.
+        score_cutoff = max(0, score_cutoff - CUTOFF_SLACK)
+        documents = [self._document(doc_index) for doc_index in doc_indexes]
+        return [
+            (score, doc_indexes[position])
+            for _, score, position in rprocess.extract(
+                query,
+                documents,
+                scorer=rfuzz.partial_ratio,
+                processor=None,
+                limit=limit,
+                score_cutoff=score_cutoff,
+            )
+        ]
+
+    @traced("fuzzy.extract")
+    def extract(self, query: str, limit: int = 5) -> List[Tuple[int, float]]:
+        """
+        Return the `limit` best `(document index, score)` pairs, best first and
+        ties broken by document order, same as `thefuzz.process.extract`.
+        """
+        query = normalize(query)
+        grams = trigrams(query)
+
+        if (
+            self._postings_offsets is None
+            or self._postings is None
+            or not grams
+            or len(query) >= self._min_length
+        ):
+            # Without an index, or when the bound does not hold, score all.
+            return self._top(
+                self._score(query, range(self._document_count), limit), limit
+            )
+
+        shared: Counter = Counter()
+        for gram in grams:
+            start = self._postings_offsets[gram]
+            end = self._postings_offsets[gram + 1]
+            shared.update(self._postings[start:end])
+
+        levels: Dict[int, List[int]] = {}
+        for doc_index, count in shared.items():
+            levels.setdefault(count, []).append(doc_index)
+
+        top: List[Tuple[int, float]] = []
+        for count in range(len(grams), 0, -1):
+            top = self._top(
+                self._score(
+                    query,
+                    sorted(levels.get(count, [])),
+                    limit,
+                    self._cutoff(top, limit),
+                )
+                + [(score, doc_index) for doc_index, score in top],
+                limit,
+            )
+            if len(top) == limit and top[-1][1] > upper_bound(
+                query, len(grams), count - 1
+            ):
+                return top
+
+        # Documents sharing no trigram can still beat what we have so far.
+        unscored = [
+            doc_index
+            for doc_index in range(self._document_count)
+            if doc_index not in shared
+        ]
+        return self._top(
+            self._score(query, unscored, limit, self._cutoff(top, limit))
+            + [(score, doc_index) for doc_index, score in top],
+            limit,
+        )
+
+    @traced("fuzzy.extract_many")
+    def extract_many(
+        self, queries: Sequence[str], limit: int = 5, workers: int = -1
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        `extract` each of `queries`, with the same results. Scoring runs on
+        `workers` threads (-1 for one per CPU) and needs numpy; without it the
+        queries are extracted one by one.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            return [self.extract(query, limit) for query in queries]
+
+        documents = [
+            self._document(doc_index) for doc_index in range(self._document_count)
+        ]
+        normalized = [normalize(query) for query in queries]
+        results = []
+        for start in range(0, len(normalized), BATCH_SIZE):
+            scores = rprocess.cdist(
+                normalized[start : start + BATCH_SIZE],
+                documents,
+                scorer=rfuzz.partial_ratio,
+                processor=None,
+                dtype=np.float64,
+                workers=workers,
+            )
+            results.extend(self._top_of_row(row, limit) for row in scores)
+        return results
+
+    @staticmethod
+    def _top_of_row(scores, limit: int) -> List[Tuple[int, float]]:
+        import numpy as np
+
+        if limit < len(scores):
+            # Every document tied with the `limit`th best is a candidate, so
+            # ties are still broken by document order.
+            kth = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            candidates = np.flatnonzero(scores >= kth)
+        else:
+            candidates = np.arange(len(scores))
+        order = np.lexsort((candidates, -scores[candidates]))[:limit]
+        return [
+            (int(candidates[position]), float(scores[candidates[position]]))
+            for position in order
+        ]
+
+    @staticmethod
+    def _cutoff(top: List[Tuple[int, float]], limit: int) -> float:
+        return top[-1][1] if len(top) == limit else 0
+
+    @staticmethod
+    def _top(scored: List[Tuple[float, int]], limit: int) -> List[Tuple[int, float]]:
+        best = heapq.nsmallest(limit, scored, key=lambda item: (-item[0], item[1]))
+        return [(doc_index, score) for score, doc_index in best]
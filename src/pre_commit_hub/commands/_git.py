@@ -1,5 +1,8 @@
+import glob
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
+
+CONFIG_NAME = ".pre-commit-config.yaml"
 
 
 def find_config_file(config_file: Optional[str] = None) -> Path:
@@ -16,9 +19,35 @@ def find_config_file(config_file: Optional[str] = None) -> Path:
     git_root = find_git_root(cwd)
 
     if git_root:
-        return git_root / ".pre-commit-config.yaml"
+        return git_root / CONFIG_NAME
     else:
-        return cwd / ".pre-commit-config.yaml"
+        return cwd / CONFIG_NAME
+
+
+def find_config_files(patterns: Optional[List[str]] = None) -> List[Path]:
+    """
+    Find the pre-commit config files `patterns` refer to.
+    Each pattern is a config file, a directory containing one, or a glob of
+    either (`**` matches any number of directories). Without patterns, this is
+    the one config `find_config_file` finds.
+    """
+    if not patterns:
+        return [find_config_file()]
+
+    paths: Dict[Path, None] = {}
+    for pattern in patterns:
+        if any(char in pattern for char in "*?["):
+            for match in sorted(glob.glob(pattern, recursive=True)):
+                path = Path(match)
+                if path.is_dir():
+                    path = path / CONFIG_NAME
+                # Globs only ever pick up configs that exist.
+                if path.is_file():
+                    paths[path] = None
+        else:
+            path = Path(pattern)
+            paths[path / CONFIG_NAME if path.is_dir() else path] = None
+    return list(paths)
 
 
 def find_git_root(path: Path) -> Optional[Path]:
@@ -1,5 +1,257 @@
+"""
+The GitHub client shared by every command.
+
+All requests made through `get_github()` go over one keep-alive connection pool
+per host, are paced by a token bucket shared by every thread, wait for the rate
+limit to reset instead of failing once the quota is used up, and retry with
+exponential backoff (honouring `Retry-After` and `X-RateLimit-Reset`) on rate
+limit errors and server errors.
+
+Configured through the environment:
+
+    GITHUB_TOKEN                          token to authenticate with
+    GITHUB_API_URL                        API root (default: https://api.github.com)
+    PRE_COMMIT_HUB_POOL_SIZE              connections kept alive per host
+    PRE_COMMIT_HUB_REQUESTS_PER_SECOND    sustained request rate
+"""
+
 import os
-from github import Github
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple
+import requests
+import requests.adapters
+from github import Auth, Github, GithubRetry
+from github.Requester import (
+    HTTPRequestsConnectionClass,
+    HTTPSRequestsConnectionClass,
+    Requester,
+    RequestsResponse,
+)
+from ..trace import count, phase
+
+DEFAULT_API_URL = "https://api.github.com"
+DEFAULT_POOL_SIZE = 16
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_BURST = 20
+MAX_RETRIES = 8
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, in bursts of `capacity`."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+@dataclass
+class RateLimit:
+    """Usage counters and the last rate limit GitHub reported."""
+
+    requests: int = 0
+    bytes: int = 0
+    remaining: Optional[int] = None
+    limit: Optional[int] = None
+    reset: Optional[int] = None
+
+
+class RequestScheduler:
+    def __init__(self, requests_per_second: float, burst: float) -> None:
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.rate_limit = RateLimit()
+        self._lock = threading.Lock()
+
+    def before_request(self) -> None:
+        with self._lock:
+            remaining, reset = self.rate_limit.remaining, self.rate_limit.reset
+        if remaining == 0 and reset is not None and reset > time.time():
+            # Waiting out the quota is cheaper than collecting 403s and
+            # retrying each of them.
+            time.sleep(reset - time.time() + 1)
+        self.bucket.acquire()
+
+    def after_response(self, headers: Mapping[str, str], size: int) -> None:
+        with self._lock:
+            self.rate_limit.requests += 1
+            self.rate_limit.bytes += size
+            if "x-ratelimit-remaining" in headers:
+                self.rate_limit.remaining = int(headers["x-ratelimit-remaining"])
+                self.rate_limit.limit = int(headers["x-ratelimit-limit"])
+                self.rate_limit.reset = int(headers["x-ratelimit-reset"])
+
+
+_scheduler = RequestScheduler(DEFAULT_REQUESTS_PER_SECOND, DEFAULT_BURST)
+_sessions: Dict[Tuple[str, str, int], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _shared_session(
+    protocol: str, host: str, port: int, retry: Any, pool_size: int
+) -> requests.Session:
+    key = (protocol, host, port)
+    with _sessions_lock:
+        if key not in _sessions:
+            session = requests.Session()
+            session.auth = Requester.noopAuth
+            adapter = requests.adapters.HTTPAdapter(
+                max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size
+            )
+            session.mount(f"{protocol}://", adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
+
+class _ScheduledConnection:
+    """
+    PyGithub connection that goes through the shared session and scheduler.
+    PyGithub creates one of these per request once custom connection classes
+    are injected, so the pooling lives in the shared session instead.
+    """
+
+    protocol: str
+    default_port: int
+    # Set by PyGithub on every request.
+    verb: str
+    url: str
+    input: Any
+    headers: Dict[str, str]
+
+    def __init__(
+        self,
+        host: str,
+        port: Optional[int] = None,
+        strict: bool = False,
+        timeout: Optional[int] = None,
+        retry: Any = None,
+        pool_size: Optional[int] = None,
+        **kwargs: Any,
+    ) -> None:
+        self.host = host
+        self.port = port if port else self.default_port
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        self.retry = retry
+        self.pool_size = pool_size or DEFAULT_POOL_SIZE
+        self.session = _shared_session(
+            self.protocol, host, self.port, retry, self.pool_size
+        )
+
+    def getresponse(self) -> RequestsResponse:
+        _scheduler.before_request()
+        with phase("github.request", method=self.verb, url=self.url):
+            # What PyGithub's connection does, but keeping the `requests`
+            # response, whose body can be measured in bytes rather than
+            # decoded characters.
+            response = self.session.request(
+                self.verb,
+                f"{self.protocol}://{self.host}:{self.port}{self.url}",
+                headers=self.headers,
+                data=self.input,
+                timeout=self.timeout,
+                verify=self.verify,
+                allow_redirects=False,
+            )
+        size = int(response.headers.get("content-length", len(response.content)))
+        _scheduler.after_response(response.headers, size)
+        count("http.requests")
+        count("http.bytes", size)
+        return RequestsResponse(response)
+
+    def close(self) -> None:
+        # The session outlives the connection, see above.
+        pass
+
+
+class ScheduledHTTPSConnection(_ScheduledConnection, HTTPSRequestsConnectionClass):
+    protocol = "https"
+    default_port = 443
+
+
+class ScheduledHTTPConnection(_ScheduledConnection, HTTPRequestsConnectionClass):
+    protocol = "http"
+    default_port = 80
+
+
+_github: Optional[Github] = None
+_github_lock = threading.Lock()
+
+
+def create_github() -> Github:
+    global _scheduler
+    _scheduler = RequestScheduler(
+        float(
+            os.environ.get(
+                "PRE_COMMIT_HUB_REQUESTS_PER_SECOND", DEFAULT_REQUESTS_PER_SECOND
+            )
+        ),
+        DEFAULT_BURST,
+    )
+    Requester.injectConnectionClasses(ScheduledHTTPConnection, ScheduledHTTPSConnection)
+    github_token = os.environ.get("GITHUB_TOKEN")
+    return Github(
+        auth=Auth.Token(github_token) if github_token else None,
+        base_url=os.environ.get("GITHUB_API_URL", DEFAULT_API_URL),
+        pool_size=int(os.environ.get("PRE_COMMIT_HUB_POOL_SIZE", DEFAULT_POOL_SIZE)),
+        retry=GithubRetry(
+            total=MAX_RETRIES,
+            backoff_factor=1,
+            status_forcelist=[429, *range(500, 600)],
+        ),
+        # Pacing is done by the scheduler, which unlike this is thread-safe.
+        seconds_between_requests=None,
+    )
+
+
+def get_github() -> Github:
+    """The shared client, created on first use."""
+    global _github
+    with _github_lock:
+        if _github is None:
+            _github = create_github()
+        return _github
+
+
+def reset_github() -> None:
+    """Drop the shared client and connections, e.g. after changing the env."""
+    global _github
+    with _github_lock:
+        _github = None
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def rate_limit() -> RateLimit:
+    return _scheduler.rate_limit
+
 
-github_token = os.environ.get("GITHUB_TOKEN")
-g = Github(github_token)
+def usage_summary() -> Optional[str]:
+    """A one-line summary of GitHub API usage, if any requests were made."""
+    usage = rate_limit()
+    if not usage.requests:
+        return None
+    summary = f"GitHub API: {usage.requests} requests, {usage.bytes / 1024:.0f} KiB"
+    if usage.remaining is not None and usage.reset is not None:
+        reset = time.strftime("%H:%M", time.localtime(usage.reset))
+        summary += f", {usage.remaining}/{usage.limit} remaining (resets {reset})"
+    return summary
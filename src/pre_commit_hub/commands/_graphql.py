@@ -0,0 +1,127 @@
+"""
+Bulk repository fetches through the GitHub GraphQL API.
+
+One query asks for the metadata, the hooks file and the newest tags of a whole
+batch of repositories, where the REST API needs a request per repository for
+each of those. The hooks file is only identified by its blob SHA there, and
+`fetch_blobs` downloads the files that weren't parsed by an earlier build.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from ._github import get_github
+
+# Repositories per query. GitHub limits how many nodes a single query may
+# touch, and with ten tags per repository this stays well below it.
+BATCH_SIZE = 50
+
+TAG_COUNT = 10
+
+REPOSITORY_FIELDS = """
+    stargazerCount
+    description
+    homepageUrl
+    hooksFile: object(expression: "HEAD:.pre-commit-hooks.yaml") {
+      ... on Blob { oid }
+    }
+    defaultBranchRef { target { oid } }
+    tags: refs(
+      refPrefix: "refs/tags/"
+      first: %d
+      orderBy: {field: TAG_COMMIT_DATE, direction: DESC}
+    ) {
+      nodes {
+        name
+        target { oid ... on Tag { target { oid } } }
+      }
+    }
+""" % (TAG_COUNT,)
+
+
+def repositories_query(count: int) -> str:
+    """A query for `count` repositories, passed as `$owner{i}` and `$name{i}`."""
+    parameters = ", ".join(
+        f"$owner{i}: String!, $name{i}: String!" for i in range(count)
+    )
+    fields = "\n".join(
+        f"  r{i}: repository(owner: $owner{i}, name: $name{i}) {{{REPOSITORY_FIELDS}}}"
+        for i in range(count)
+    )
+    return f"query({parameters}) {{\n{fields}\n}}"
+
+
+def blobs_query(count: int) -> str:
+    """A query for `count` blobs, passed as `$owner{i}`, `$name{i}` and `$oid{i}`."""
+    parameters = ", ".join(
+        f"$owner{i}: String!, $name{i}: String!, $oid{i}: GitObjectID!"
+        for i in range(count)
+    )
+    fields = "\n".join(
+        f"  b{i}: repository(owner: $owner{i}, name: $name{i}) {{"
+        f" object(oid: $oid{i}) {{ ... on Blob {{ text isTruncated }} }} }}"
+        for i in range(count)
+    )
+    return f"query({parameters}) {{\n{fields}\n}}"
+
+
+def _query(query: str, variables: Dict[str, str]) -> Dict[str, Any]:
+    # PyGithub's own `graphql_query` raises as soon as anything in the response
+    # is an error, which would throw away the nodes that did resolve.
+    requester = get_github()._Github__requester  # type: ignore[attr-defined]
+    _, response = requester.requestJsonAndCheck(
+        "POST",
+        requester.graphql_url,
+        input={"query": query, "variables": variables},
+    )
+    return response.get("data") or {}
+
+
+def _repository_variables(i: int, repository: str) -> Dict[str, str]:
+    owner, name = repository.split("/", 1)
+    return {f"owner{i}": owner, f"name{i}": name}
+
+
+def fetch_repositories(repositories: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Fetch a batch of `owner/name` repositories in a single query.
+    Returns one node per repository, `None` for the ones GitHub couldn't
+    resolve (e.g. renamed or deleted repositories) so they can be retried over
+    REST. Raises if the query as a whole fails.
+    """
+    variables = {}
+    for i, repository in enumerate(repositories):
+        variables.update(_repository_variables(i, repository))
+    data = _query(repositories_query(len(repositories)), variables)
+    return [data.get(f"r{i}") for i in range(len(repositories))]
+
+
+def fetch_blobs(blobs: Sequence[Tuple[str, str]]) -> List[Optional[str]]:
+    """
+    Fetch the text of `(owner/name, oid)` blobs in a single query.
+    Returns `None` for the blobs GitHub couldn't resolve or only returned part
+    of. Raises if the query as a whole fails.
+    """
+    variables = {}
+    for i, (repository, oid) in enumerate(blobs):
+        variables.update(_repository_variables(i, repository))
+        variables[f"oid{i}"] = oid
+    data = _query(blobs_query(len(blobs)), variables)
+
+    texts: List[Optional[str]] = []
+    for i in range(len(blobs)):
+        blob = (data.get(f"b{i}") or {}).get("object")
+        if not blob or blob.get("isTruncated"):
+            texts.append(None)
+        else:
+            texts.append(blob.get("text"))
+    return texts
+
+
+def tag_commits(node: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """`(name, commit sha)` of the tags in a repository node, newest first."""
+    tags = []
+    for tag in node["tags"]["nodes"]:
+        target = tag["target"]
+        # Annotated tags point at a tag object, which points at the commit.
+        commit = target.get("target") or target
+        tags.append((tag["name"], commit["oid"]))
+    return tags
@@ -0,0 +1,155 @@
+"""
+Hooks parsed from `.pre-commit-hooks.yaml` files, kept across builds by the
+git blob SHA GitHub returns with each file.
+
+Forks and mirrors publish byte-identical files, and most files don't change
+between builds, so each distinct file is only parsed and validated once.
+
+The hooks are kept in SQLite rather than in memory, so what a build holds
+doesn't grow with the number of files in the catalog. Like the query cache,
+the store is an optimization only: if it can't be read or written, every file
+is parsed.
+"""
+
+import json
+import sqlite3
+import threading
+import yaml
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+from pydantic import ValidationError
+from ..models import Hook
+from ..trace import count
+from ._config import Loader
+
+# Enough for every file in the catalog; the least recently used files, i.e.
+# old versions, are dropped first.
+MAX_FILES = 10000
+
+
+def parse_hooks_text(text: Union[str, bytes]) -> List[Hook]:
+    # Parsing holds the GIL, so the C loader also keeps the other fetch
+    # workers from waiting on it.
+    hooks = yaml.load(text, Loader=Loader)
+    return [Hook.model_validate(hook) for hook in hooks]
+
+
+def cache_path() -> Path:
+    return Path.home() / ".pre-commit-hub" / "hook-files.sqlite"
+
+
+class HookFileStore:
+    """The hooks of every file seen by recent builds. Safe to share by threads."""
+
+    def __init__(
+        self, connection: Optional[sqlite3.Connection], max_files: int = MAX_FILES
+    ) -> None:
+        self._connection = connection
+        self._max_files = max_files
+        self._lock = threading.Lock()
+        # Counts uses rather than timing them, so files used within the same
+        # build are still ordered.
+        self._clock = 0
+        if connection is not None:
+            (self._clock,) = connection.execute(
+                "SELECT COALESCE(MAX(used), 0) FROM files"
+            ).fetchone()
+
+    @classmethod
+    def load(cls, max_files: int = MAX_FILES) -> "HookFileStore":
+        """The store of previous builds; one that keeps nothing if unusable."""
+        try:
+            cache_path().parent.mkdir(parents=True, exist_ok=True)
+            # The fetch workers share the connection, behind the store's lock.
+            connection = sqlite3.connect(
+                str(cache_path()), timeout=1, check_same_thread=False
+            )
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS files"
+                    " (sha TEXT PRIMARY KEY, hooks TEXT NOT NULL,"
+                    " used INTEGER NOT NULL)"
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS files_used ON files (used)"
+                )
+            return cls(connection, max_files)
+        except (OSError, sqlite3.Error):
+            return cls(None, max_files)
+
+    def _execute(self, sql: str, *parameters: object) -> Optional[tuple]:
+        # Callers hold the lock. Changes are committed by `save`, so a build
+        # doesn't wait on a sync to disk per file.
+        if self._connection is None:
+            return None
+        try:
+            return self._connection.execute(sql, parameters).fetchone()
+        except sqlite3.Error:
+            return None
+
+    def __contains__(self, sha: object) -> bool:
+        with self._lock:
+            return self._execute("SELECT 1 FROM files WHERE sha = ?", sha) is not None
+
+    def get(self, sha: str) -> Optional[List[Hook]]:
+        """The hooks in the file with blob `sha`, if it was parsed before."""
+        with self._lock:
+            row = self._execute("SELECT hooks FROM files WHERE sha = ?", sha)
+            if row is not None:
+                self._clock += 1
+                self._execute(
+                    "UPDATE files SET used = ? WHERE sha = ?", self._clock, sha
+                )
+        if row is not None:
+            try:
+                hooks = [Hook.model_validate(hook) for hook in json.loads(row[0])]
+            except ValidationError:
+                # Kept by a version with other hooks.
+                hooks = None
+            if hooks is not None:
+                count("hook_files.hits")
+                return hooks
+        count("hook_files.misses")
+        return None
+
+    def hooks(
+        self, sha: Optional[str], text: Callable[[], Union[str, bytes]]
+    ) -> List[Hook]:
+        """The hooks in the file with blob `sha`, parsing `text()` if unknown."""
+        if sha is None:
+            return parse_hooks_text(text())
+        hooks = self.get(sha)
+        if hooks is not None:
+            return hooks
+        return self.add(sha, text())
+
+    def add(self, sha: str, text: Union[str, bytes]) -> List[Hook]:
+        """Parse `text`, the file with blob `sha`, and keep its hooks."""
+        hooks = parse_hooks_text(text)
+        value = json.dumps([hook.model_dump() for hook in hooks])
+        with self._lock:
+            self._clock += 1
+            self._execute(
+                "INSERT OR REPLACE INTO files (sha, hooks, used) VALUES (?, ?, ?)",
+                sha,
+                value,
+                self._clock,
+            )
+        return hooks
+
+    def save(self) -> None:
+        """Keep the `max_files` most recently used files. Closes the store."""
+        with self._lock:
+            if self._connection is None:
+                return
+            self._execute(
+                "DELETE FROM files WHERE sha IN"
+                " (SELECT sha FROM files ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                self._max_files,
+            )
+            try:
+                self._connection.commit()
+            except sqlite3.Error:
+                pass
+            self._connection.close()
+            self._connection = None
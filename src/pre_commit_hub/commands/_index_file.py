@@ -0,0 +1,356 @@
+"""
+Binary on-disk format for the search index.
+
+The file is a header, a table of contents and a list of 8-byte aligned
+sections. Each section is a flat array of fixed-width integers (or raw bytes),
+so a reader can `mmap` the file and cast sections to `memoryview`s without
+parsing anything up front. Strings are stored once in a string table and
+referenced by their index.
+
+    header    magic, version, byte order, section count
+    toc       (name, typecode, offset, length) for every section
+    sections  strings.offsets, strings.data, repo.*, hook.*, search.*, lookup.*
+
+The search sections hold each hook's normalized search document and a trigram
+inverted index over them; see `_fuzzy`. The lookup sections hold a hash table
+from the queries `add` accepts to hooks; see `_lookup`.
+"""
+
+import io
+import math
+import mmap
+import os
+from bisect import bisect_right
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Union
+from ..models import Hook, Repository, SearchIndex
+from ._fuzzy import FuzzyIndex, build_postings, document_text
+from ._lookup import HookLookup, build_table
+
+MAGIC = b"PCHUBIDX"
+# Bumped whenever the header or table of contents layout changes. Version 2
+# widened section names to 32 bytes.
+VERSION = 2
+
+# String index used for missing optional values (e.g. a hook's description).
+NONE = 0xFFFFFFFF
+
+_HEADER = struct.Struct("<8sBBxxI")
+_TOC_ENTRY = struct.Struct("<32scxxxxxxxQQ")
+_BYTE_ORDERS = {"little": 0, "big": 1}
+
+
+class IndexFormatError(Exception):
+    pass
+
+
+class StringTable:
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._offsets = array("I", [0])
+        self._data = bytearray()
+
+    def add(self, value: Optional[str]) -> int:
+        if value is None:
+            return NONE
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = len(self._ids)
+            self._ids[value] = string_id
+            self._data += value.encode()
+            self._offsets.append(len(self._data))
+        return string_id
+
+    def sections(self) -> Dict[str, Union[array, bytes]]:
+        return {"strings.offsets": self._offsets, "strings.data": bytes(self._data)}
+
+
+def build_sections(
+    repositories: Iterable[Repository],
+) -> Dict[str, Union[array, bytes]]:
+    """
+    The sections of an index of `repositories`. They're only iterated once, so
+    they can be read from disk as they're needed.
+    """
+    strings = StringTable()
+    repo_names = array("I")
+    repo_stars = array("q")
+    repo_hooks = array("I", [0])
+    repo_revisions = array("I")
+    repo_revision_commits = array("I")
+    repo_resolved_at = array("d")
+    hook_ids = array("I")
+    hook_names = array("I")
+    hook_descriptions = array("I")
+    documents = []
+    lookup_keys = []
+
+    for repo in repositories:
+        repo_names.append(strings.add(repo.repository))
+        repo_stars.append(repo.stars)
+        repo_revisions.append(strings.add(repo.revision))
+        repo_revision_commits.append(strings.add(repo.revision_commit))
+        repo_resolved_at.append(
+            math.nan if repo.revision_resolved_at is None else repo.revision_resolved_at
+        )
+        for hook in repo.hooks:
+            hook_ids.append(strings.add(hook.id))
+            hook_names.append(strings.add(hook.name))
+            hook_descriptions.append(strings.add(hook.description))
+            documents.append(document_text(repo, hook))
+            lookup_keys.append((repo.repository, hook.id))
+        repo_hooks.append(len(hook_ids))
+
+    document_ids = array("I", [strings.add(text) for text in documents])
+    postings_offsets, postings = build_postings(documents)
+    lookup_slots, lookup_hashes = build_table(lookup_keys)
+
+    return {
+        **strings.sections(),
+        "repo.name": repo_names,
+        "repo.stars": repo_stars,
+        "repo.hooks": repo_hooks,
+        "repo.revision": repo_revisions,
+        "repo.revision_commit": repo_revision_commits,
+        "repo.revision_resolved_at": repo_resolved_at,
+        "hook.id": hook_ids,
+        "hook.name": hook_names,
+        "hook.description": hook_descriptions,
+        "search.document": document_ids,
+        "search.min_length": array("I", [min(map(len, documents), default=0)]),
+        "search.postings_offsets": postings_offsets,
+        "search.postings": postings,
+        "lookup.slots": lookup_slots,
+        "lookup.hashes": lookup_hashes,
+    }
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _write_sections(f: BinaryIO, sections: Dict[str, Union[array, bytes]]) -> None:
+    offset = _align(_HEADER.size + _TOC_ENTRY.size * len(sections))
+    toc = []
+    for name, section in sections.items():
+        typecode = section.typecode if isinstance(section, array) else "B"
+        length = len(section) * (section.itemsize if isinstance(section, array) else 1)
+        toc.append((name, typecode, offset, length))
+        offset = _align(offset + length)
+
+    f.write(_HEADER.pack(MAGIC, VERSION, _BYTE_ORDERS[sys.byteorder], len(sections)))
+    for name, typecode, offset, length in toc:
+        f.write(_TOC_ENTRY.pack(name.encode(), typecode.encode(), offset, length))
+    for (_, _, offset, _), section in zip(toc, sections.values()):
+        f.write(b"\0" * (offset - f.tell()))
+        f.write(section if isinstance(section, bytes) else section.tobytes())
+
+
+def write_index(path: Path, search_index: SearchIndex) -> None:
+    """Write `search_index` to `path`, replacing any existing file atomically."""
+    write_repositories(path, search_index.repositories)
+
+
+def write_repositories(path: Path, repositories: Iterable[Repository]) -> None:
+    """`write_index` for repositories streamed from elsewhere."""
+    sections = build_sections(repositories)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "wb") as f:
+        _write_sections(f, sections)
+    os.replace(tmp_path, path)
+
+
+class IndexFile:
+    """
+    Read-only view of an index written by `write_index`.
+    Sections are memory-mapped and only decoded when accessed, and the data is
+    trusted, so objects are built without running pydantic validation.
+    """
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as f:
+            try:
+                self._buffer: Union[mmap.mmap, bytes] = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            except ValueError as e:
+                raise IndexFormatError(f"{path} is empty") from e
+        self._load(path)
+
+    @classmethod
+    def from_search_index(cls, search_index: SearchIndex) -> "IndexFile":
+        """
+        Build the index in memory, for caches that only have the YAML export.
+        Readers then get the same compact representation either way.
+        """
+        f = io.BytesIO()
+        _write_sections(f, build_sections(search_index.repositories))
+        index_file = cls.__new__(cls)
+        index_file._buffer = f.getvalue()
+        index_file._load("index")
+        return index_file
+
+    def _load(self, path: Union[Path, str]) -> None:
+        buffer = memoryview(self._buffer)
+        if len(buffer) < _HEADER.size:
+            raise IndexFormatError(f"{path} is truncated")
+        magic, version, byte_order, count = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise IndexFormatError(f"{path} is not a version {VERSION} index")
+        if byte_order != _BYTE_ORDERS[sys.byteorder]:
+            raise IndexFormatError(f"{path} was written on a different platform")
+
+        self._sections: Dict[str, memoryview] = {}
+        for i in range(count):
+            name, typecode, offset, length = _TOC_ENTRY.unpack_from(
+                buffer, _HEADER.size + i * _TOC_ENTRY.size
+            )
+            if offset + length > len(buffer):
+                raise IndexFormatError(f"{path} is truncated")
+            section = buffer[offset : offset + length]
+            if typecode != b"B":
+                section = section.cast(typecode.decode())
+            self._sections[name.rstrip(b"\0").decode()] = section
+
+        self._string_offsets = self.section("strings.offsets")
+        self._string_data = self.section("strings.data")
+        self._repo_hooks = self.section("repo.hooks")
+
+    def has_section(self, name: str) -> bool:
+        return name in self._sections
+
+    def section(self, name: str) -> memoryview:
+        try:
+            return self._sections[name]
+        except KeyError:
+            raise IndexFormatError(f"Index is missing the {name} section") from None
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == NONE:
+            return None
+        start = self._string_offsets[string_id]
+        end = self._string_offsets[string_id + 1]
+        return str(self._string_data[start:end], "utf-8")
+
+    @property
+    def repository_count(self) -> int:
+        return len(self._repo_hooks) - 1
+
+    def hook(self, hook_index: int) -> Hook:
+        return Hook.model_construct(
+            id=self.string(self.section("hook.id")[hook_index]),
+            name=self.string(self.section("hook.name")[hook_index]),
+            description=self.string(self.section("hook.description")[hook_index]),
+        )
+
+    def repository(self, repo_index: int) -> Repository:
+        start, end = self._repo_hooks[repo_index], self._repo_hooks[repo_index + 1]
+        return Repository.model_construct(
+            repository=self.string(self.section("repo.name")[repo_index]),
+            stars=self.section("repo.stars")[repo_index],
+            hooks=[self.hook(i) for i in range(start, end)],
+            **self._revision(repo_index),
+        )
+
+    def _revision(self, repo_index: int) -> Dict[str, Any]:
+        # Indexes written before revisions were stored don't have them.
+        if not self.has_section("repo.revision"):
+            return {}
+        resolved_at = self.section("repo.revision_resolved_at")[repo_index]
+        return {
+            "revision": self.string(self.section("repo.revision")[repo_index]),
+            "revision_commit": self.string(
+                self.section("repo.revision_commit")[repo_index]
+            ),
+            "revision_resolved_at": None if math.isnan(resolved_at) else resolved_at,
+        }
+
+    def repository_indexes(self) -> Dict[str, int]:
+        """The index of each repository, by name."""
+        names = self.section("repo.name")
+        return {self.string(names[i]) or "": i for i in range(len(names))}
+
+    def repository_index(self, hook_index: int) -> int:
+        """Index of the repository the hook belongs to."""
+        return bisect_right(self._repo_hooks, hook_index) - 1
+
+    def document(self, hook_index: int) -> dict:
+        """The hook as the flat dict `search` presents to the user."""
+        repo_index = self.repository_index(hook_index)
+        return {
+            "repository": self.string(self.section("repo.name")[repo_index]),
+            "stars": self.section("repo.stars")[repo_index],
+            "id": self.string(self.section("hook.id")[hook_index]),
+            "name": self.string(self.section("hook.name")[hook_index]),
+            "description": self.string(self.section("hook.description")[hook_index]),
+        }
+
+    def fuzzy_index(self) -> Optional[FuzzyIndex]:
+        if not self.has_section("search.postings"):
+            return None
+        documents = self.section("search.document")
+        return FuzzyIndex(
+            lambda hook_index: self.string(documents[hook_index]) or "",
+            len(documents),
+            min_length=self.section("search.min_length")[0],
+            postings_offsets=self.section("search.postings_offsets"),
+            postings=self.section("search.postings"),
+        )
+
+    def hook_lookup(self) -> Optional[HookLookup]:
+        if not self.has_section("lookup.slots"):
+            return None
+        repo_names = self.section("repo.name")
+        hook_ids = self.section("hook.id")
+        return HookLookup(
+            self.section("lookup.slots"),
+            self.section("lookup.hashes"),
+            lambda hook_index: (
+                self.string(repo_names[self.repository_index(hook_index)]) or "",
+                self.string(hook_ids[hook_index]) or "",
+            ),
+        )
+
+    def to_search_index(self) -> SearchIndex:
+        # Decode every string once up front rather than once per reference.
+        data = bytes(self._string_data)
+        offsets = self._string_offsets.tolist()
+        table = [data[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+
+        def lookup(string_id: int) -> Optional[str]:
+            return None if string_id == NONE else table[string_id]
+
+        hook_ids = self.section("hook.id").tolist()
+        hook_names = self.section("hook.name").tolist()
+        hook_descriptions = self.section("hook.description").tolist()
+        hooks = [
+            Hook.model_construct(
+                id=table[hook_id],
+                name=table[hook_name],
+                description=lookup(hook_description),
+            )
+            for hook_id, hook_name, hook_description in zip(
+                hook_ids, hook_names, hook_descriptions
+            )
+        ]
+
+        repo_hooks = self._repo_hooks.tolist()
+        return SearchIndex.model_construct(
+            repositories=[
+                Repository.model_construct(
+                    repository=table[name],
+                    stars=stars,
+                    hooks=hooks[repo_hooks[i] : repo_hooks[i + 1]],
+                    **self._revision(i),
+                )
+                for i, (name, stars) in enumerate(
+                    zip(
+                        self.section("repo.name").tolist(),
+                        self.section("repo.stars").tolist(),
+                    )
+                )
+            ]
+        )
@@ -0,0 +1,106 @@
+"""
+Constant-time lookup of hooks by the queries `add` accepts.
+
+Every hook is filed under its id, under `project:id` for each way its
+repository can be abbreviated, and under `owner/project:id`. The table is an
+open-addressing hash table stored as two flat arrays so it can live in the
+memory-mapped index file and be probed without being loaded.
+"""
+
+import zlib
+from array import array
+from typing import Callable, List, Sequence, Tuple
+
+# Kinds of keys. A query only matches keys of the kind it was parsed as, so a
+# hook whose id contains a colon can't be confused with a `project:id` key.
+ID = 0
+PROJECT = 1
+REPOSITORY = 2
+KIND_COUNT = 3
+
+Key = Tuple[int, str]
+
+
+def parse_query(query: str) -> List[Key]:
+    """The keys that hooks matching `query` are filed under."""
+    parts = query.split(":")
+    if len(parts) == 1:
+        return [(ID, query)]
+    elif len(parts) == 2:
+        # `project:id` matches repos ending with `/project` or named `project`.
+        return [(PROJECT, query), (REPOSITORY, query)]
+    elif len(parts) == 3:
+        user, project, hook_id = parts
+        return [(REPOSITORY, f"{user}/{project}:{hook_id}")]
+    return []
+
+
+def hook_keys(repository: str, hook_id: str) -> List[Key]:
+    keys = [(ID, hook_id), (REPOSITORY, f"{repository}:{hook_id}")]
+    position = repository.find("/")
+    while position != -1:
+        keys.append((PROJECT, f"{repository[position + 1 :]}:{hook_id}"))
+        position = repository.find("/", position + 1)
+    return keys
+
+
+def key_hash(key: Key) -> int:
+    kind, text = key
+    return zlib.crc32(text.encode(), kind)
+
+
+def build_table(hooks: Sequence[Tuple[str, str]]) -> Tuple[array, array]:
+    """
+    Build the table for `hooks`, a list of `(repository, hook id)` pairs.
+    Returns `(slots, hashes)`: each used slot holds `hook index + 1`, and
+    `hashes` holds the hash of the key it was filed under.
+    """
+    entries = [
+        (key_hash(key), hook_index)
+        for hook_index, (repository, hook_id) in enumerate(hooks)
+        for key in hook_keys(repository, hook_id)
+    ]
+
+    size = 8
+    while size < 2 * len(entries):
+        size *= 2
+    mask = size - 1
+
+    slots = array("I", bytes(4 * size))
+    hashes = array("I", bytes(4 * size))
+    for hash_value, hook_index in entries:
+        slot = hash_value & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = hook_index + 1
+        hashes[slot] = hash_value
+    return slots, hashes
+
+
+class HookLookup:
+    def __init__(
+        self,
+        slots: Sequence[int],
+        hashes: Sequence[int],
+        hook: Callable[[int], Tuple[str, str]],
+    ) -> None:
+        """`hook` maps a hook index to its `(repository, hook id)`."""
+        self._slots = slots
+        self._hashes = hashes
+        self._hook = hook
+        self._mask = len(slots) - 1
+
+    def find(self, query: str) -> List[int]:
+        """Indexes of the hooks matching `query`, in index order."""
+        matches = set()
+        for key in parse_query(query):
+            hash_value = key_hash(key)
+            slot = hash_value & self._mask
+            while self._slots[slot]:
+                hook_index = self._slots[slot] - 1
+                if self._hashes[slot] == hash_value and key in hook_keys(
+                    *self._hook(hook_index)
+                ):
+                    matches.add(hook_index)
+                slot = (slot + 1) & self._mask
+        return sorted(matches)
@@ -0,0 +1,124 @@
+"""
+The stages of `build-index`, connected by bounded queues: a pool of workers
+fetching items, a thread parsing what they fetched, and the calling thread
+appending what was parsed.
+
+Each queue holds at most `QUEUE_SIZE` results. When a stage falls behind, the
+one before it blocks on the full queue instead of piling up results, so how
+much is held in memory doesn't grow with the number of items.
+
+The stages are threads rather than asyncio tasks: the GitHub client blocks,
+and so would every task calling it.
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, TypeVar
+
+QUEUE_SIZE = 64
+
+# How often a stage blocked on a queue checks whether the pipeline stopped.
+POLL_INTERVAL = 0.1
+
+T = TypeVar("T")
+F = TypeVar("F")
+P = TypeVar("P")
+
+_DONE = object()
+
+
+def run_pipeline(
+    items: Iterable[T],
+    fetch: Callable[[T], Iterable[F]],
+    parse: Callable[[F], P],
+    append: Callable[[P], None],
+    jobs: int = 1,
+    queue_size: int = QUEUE_SIZE,
+) -> None:
+    """
+    Call `fetch` on every item in `jobs` threads, `parse` on each of their
+    results in another thread, and `append` on each parsed result in this one.
+    `fetch` and `parse` are expected to turn the errors of a single item into
+    results; any other exception stops the pipeline and is raised here.
+    """
+    pending = iter(items)
+    pending_lock = threading.Lock()
+    fetched: "queue.Queue[Any]" = queue.Queue(queue_size)
+    parsed: "queue.Queue[Any]" = queue.Queue(queue_size)
+    stopped = threading.Event()
+    errors: List[BaseException] = []
+    fetchers = max(jobs, 1)
+    fetchers_lock = threading.Lock()
+
+    def put(to: "queue.Queue[Any]", result: Any) -> None:
+        # Gives up once the pipeline stopped, so no stage is left waiting on a
+        # queue nobody reads anymore.
+        while not stopped.is_set():
+            try:
+                to.put(result, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def get(source: "queue.Queue[Any]") -> Any:
+        while not stopped.is_set():
+            try:
+                return source.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def fetch_items() -> None:
+        nonlocal fetchers
+        while not stopped.is_set():
+            with pending_lock:
+                try:
+                    item = next(pending)
+                except StopIteration:
+                    break
+            for result in fetch(item):
+                put(fetched, result)
+        with fetchers_lock:
+            fetchers -= 1
+            last = fetchers == 0
+        if last:
+            put(fetched, _DONE)
+
+    def parse_results() -> None:
+        while True:
+            result = get(fetched)
+            if result is _DONE:
+                break
+            put(parsed, parse(result))
+        put(parsed, _DONE)
+
+    def run(stage: Callable[[], None]) -> None:
+        try:
+            stage()
+        except BaseException as e:
+            errors.append(e)
+            stopped.set()
+
+    # Daemon threads, so a fetch stuck on the network doesn't keep the process
+    # from exiting once the pipeline stopped.
+    threads = [
+        threading.Thread(target=run, args=(fetch_items,), daemon=True)
+        for _ in range(fetchers)
+    ]
+    threads.append(threading.Thread(target=run, args=(parse_results,), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            result = get(parsed)
+            if result is _DONE:
+                break
+            append(result)
+    except BaseException:
+        stopped.set()
+        raise
+    if errors:
+        raise errors[0]
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,183 @@
+"""
+Persistent cache of search results, so repeated searches are answered without
+loading the index or importing the fuzzy search stack.
+
+Results are keyed by the normalized query, the scorer, the limit and the
+SHA-256 of the index they were found in, so a new index never serves stale
+results. Only the `MAX_ENTRIES` most recently used results are kept.
+
+The cache is an optimization only: if it can't be read or written, searches
+run as if it was empty.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+from ..trace import count, traced
+
+CACHE_NAME = "query-cache.sqlite"
+
+# Records the index's hash with the stat of the `index.bin` it was computed
+# for, so it's only computed once per index.
+HASH_NAME = "index.sha256"
+
+# Results are only valid for the scorer that produced them.
+SCORER = "partial_token_sort_ratio"
+
+MAX_ENTRIES = 1000
+
+Results = List[Tuple[dict, int]]
+
+
+def normalize_query(query: str) -> str:
+    # Queries equal after this are normalized to the same text by the scorer,
+    # which lowercases them and splits them into words.
+    return " ".join(query.lower().split())
+
+
+def index_hash() -> Optional[str]:
+    """The SHA-256 of `index.bin`, or `None` if there is none."""
+    cache_dir = Path.home() / ".pre-commit-hub"
+    index_path = cache_dir / "index.bin"
+    try:
+        stat = index_path.stat()
+    except FileNotFoundError:
+        return None
+    stamp = f"{stat.st_ino} {stat.st_mtime_ns} {stat.st_size}"
+
+    hash_path = cache_dir / HASH_NAME
+    try:
+        recorded_stamp, digest = hash_path.read_text().splitlines()
+        if recorded_stamp == stamp:
+            return digest
+    except (FileNotFoundError, ValueError):
+        pass
+
+    digest = hashlib.sha256(index_path.read_bytes()).hexdigest()
+    tmp_path = hash_path.with_name(f".{hash_path.name}.tmp")
+    tmp_path.write_text(f"{stamp}\n{digest}\n")
+    os.replace(tmp_path, hash_path)
+    return digest
+
+
+def clear() -> None:
+    """Drop every cached result, e.g. because a new index was written."""
+    cache_dir = Path.home() / ".pre-commit-hub"
+    for name in (CACHE_NAME, HASH_NAME):
+        (cache_dir / name).unlink(missing_ok=True)
+
+
+class QueryCache:
+    def __init__(
+        self,
+        connection: Optional[sqlite3.Connection],
+        index_hash: Optional[str],
+        max_entries: int = MAX_ENTRIES,
+    ) -> None:
+        self._connection = connection
+        self._index_hash = index_hash
+        self._max_entries = max_entries
+
+    @classmethod
+    @traced("query_cache.open")
+    def open(cls, max_entries: int = MAX_ENTRIES) -> "QueryCache":
+        """The cache of the current index; one that caches nothing if unusable."""
+        try:
+            digest = index_hash()
+            if digest is None:
+                return cls(None, None)
+            connection = sqlite3.connect(
+                str(Path.home() / ".pre-commit-hub" / CACHE_NAME), timeout=1
+            )
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results"
+                    " (key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                    " used INTEGER NOT NULL)"
+                )
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS results_used ON results (used)"
+                )
+        except (OSError, sqlite3.Error):
+            return cls(None, None)
+        return cls(connection, digest, max_entries)
+
+    def _key(self, query: str, limit: int) -> str:
+        return json.dumps([self._index_hash, SCORER, limit, normalize_query(query)])
+
+    def _tick(self) -> int:
+        # Orders uses without relying on the clock's resolution.
+        assert self._connection is not None
+        (used,) = self._connection.execute(
+            "SELECT COALESCE(MAX(used), 0) + 1 FROM results"
+        ).fetchone()
+        return used
+
+    @traced("query_cache.get")
+    def get(self, queries: Sequence[str], limit: int) -> List[Optional[Results]]:
+        """The cached results of each of `queries`, `None` for those not cached."""
+        if self._connection is None:
+            return [None] * len(queries)
+        keys = [self._key(query, limit) for query in queries]
+        values: List[Optional[str]] = []
+        try:
+            with self._connection:
+                for key in keys:
+                    row = self._connection.execute(
+                        "SELECT value FROM results WHERE key = ?", (key,)
+                    ).fetchone()
+                    values.append(None if row is None else row[0])
+                tick = self._tick()
+                self._connection.executemany(
+                    "UPDATE results SET used = ? WHERE key = ?",
+                    [(tick, key) for key, value in zip(keys, values) if value],
+                )
+        except sqlite3.Error:
+            return [None] * len(queries)
+
+        hits = sum(value is not None for value in values)
+        count("query_cache.hits", hits)
+        count("query_cache.misses", len(values) - hits)
+        return [
+            None
+            if value is None
+            else [(hook, score) for hook, score in json.loads(value)]
+            for value in values
+        ]
+
+    @traced("query_cache.put")
+    def put(self, queries: Sequence[str], limit: int, results: List[Results]) -> None:
+        """Cache the `results` of each of `queries`, evicting the least used."""
+        if self._connection is None:
+            return
+        try:
+            with self._connection:
+                tick = self._tick()
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO results (key, value, used)"
+                    " VALUES (?, ?, ?)",
+                    [
+                        (self._key(query, limit), json.dumps(query_results), tick)
+                        for query, query_results in zip(queries, results)
+                    ],
+                )
+                self._connection.execute(
+                    "DELETE FROM results WHERE key IN"
+                    " (SELECT key FROM results ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                    (self._max_entries,),
+                )
+        except sqlite3.Error:
+            pass
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+
+    def __enter__(self) -> "QueryCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -0,0 +1,184 @@
+import queue
+import threading
+import time
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from itertools import takewhile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from github.Repository import Repository as GithubRepository
+from ..models import CachedRevision, RevisionCache
+from ..trace import traced
+from ._github import get_github
+
+# How long a resolved revision is reused before asking GitHub again.
+REVISION_CACHE_TTL = 60 * 60
+
+# How old the revisions stored in the index can get before `add` resolves them
+# again.
+REVISION_MAX_AGE = 7 * 24 * 60 * 60
+
+MAX_WORKERS = 8
+
+
+def latest_tag_with_commit(
+    tags: Iterable[Tuple[str, str]],
+) -> Optional[Tuple[str, str]]:
+    """
+    Pick the tag to pin to from `(name, commit sha)` pairs, newest first, and
+    return it along with the commit it points at. `tags` is consumed lazily, so
+    it can be a paginated listing.
+    """
+    tags = iter(tags)
+    first_tag = next(tags, None)
+    if first_tag is None:
+        return None
+
+    # Only the tags pointing at the same commit as the first one matter, so
+    # stop paginating as soon as we've walked past them.
+    same_commit_tags = [
+        first_tag,
+        *takewhile(lambda tag: tag[1] == first_tag[1], tags),
+    ]
+
+    # Try to find a tag with a period in its name. This is the same criteria
+    # pre-commit uses [^1].
+    # [^1]: https://github.com/pre-commit/pre-commit/blob/d46423ffe14a37a06a0bcb6fe1b8294a27b6c289/pre_commit/git.py#L233
+    for name, commit in same_commit_tags:
+        if "." in name:
+            return name, commit
+
+    return first_tag
+
+
+def latest_revision(repo: GithubRepository) -> Tuple[str, str]:
+    """The revision to pin the repository to, and the commit it points at."""
+    tag = latest_tag_with_commit((tag.name, tag.commit.sha) for tag in repo.get_tags())
+    if tag is not None:
+        return tag
+    else:
+        sha = repo.get_commits()[0].sha
+        return sha, sha
+
+
+@traced("revisions.get_latest_revision")
+def get_latest_revision(repository: str) -> str:
+    return latest_revision(get_github().get_repo(repository))[0]
+
+
+def load_revision_cache() -> RevisionCache:
+    cache_file = Path.home() / ".pre-commit-hub" / "revisions.yaml"
+    if not cache_file.exists():
+        return RevisionCache()
+    with open(cache_file, "r") as f:
+        return RevisionCache.model_validate(yaml.safe_load(f) or {})
+
+
+def save_revision_cache(cache: RevisionCache):
+    cache_dir = Path.home() / ".pre-commit-hub"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_file = cache_dir / "revisions.yaml"
+
+    with open(cache_file, "w") as f:
+        yaml.dump(cache.model_dump(), f, default_flow_style=False)
+
+
+@traced("revisions.resolve_revisions")
+def resolve_revisions(
+    repositories: Iterable[str], ttl: float = REVISION_CACHE_TTL
+) -> Dict[str, str]:
+    """
+    Find the latest revision of each repository.
+    Revisions resolved less than `ttl` seconds ago are read from the cache,
+    the rest are resolved concurrently and added to it.
+    """
+    repositories = list(dict.fromkeys(repositories))
+    cache = load_revision_cache()
+    now = time.time()
+
+    revisions = {}
+    stale = []
+    for repository in repositories:
+        cached = cache.repositories.get(repository)
+        if cached is not None and now - cached.resolved_at < ttl:
+            revisions[repository] = cached.revision
+        else:
+            stale.append(repository)
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(stale))) as executor:
+            resolved = executor.map(get_latest_revision, stale)
+            for repository, revision in zip(stale, resolved):
+                revisions[repository] = revision
+                cache.repositories[repository] = CachedRevision(
+                    revision=revision, resolved_at=now
+                )
+        save_revision_cache(cache)
+
+    return revisions
+
+
+def resolve_latest_revisions(
+    repositories: List[str],
+    timeout: Optional[float] = None,
+    jobs: int = MAX_WORKERS,
+) -> Dict[str, Union[str, Exception]]:
+    """
+    Find the latest revision of each repository concurrently, bypassing the
+    cache. Repositories that fail map to the exception, and those taking longer
+    than `timeout` seconds to a `TimeoutError`.
+    """
+    repositories = list(dict.fromkeys(repositories))
+    pending: "queue.Queue[str]" = queue.Queue()
+    for repository in repositories:
+        pending.put(repository)
+    finished: "queue.Queue[Tuple[str, Union[str, Exception]]]" = queue.Queue()
+    started: Dict[str, float] = {}
+
+    def work() -> None:
+        while True:
+            try:
+                repository = pending.get_nowait()
+            except queue.Empty:
+                return
+            started[repository] = time.monotonic()
+            try:
+                result: Union[str, Exception] = get_latest_revision(repository)
+            except Exception as e:
+                result = e
+            finished.put((repository, result))
+
+    def start_worker() -> None:
+        # Daemon threads, so one stuck on a repository that timed out doesn't
+        # keep the process from exiting.
+        threading.Thread(target=work, daemon=True).start()
+
+    for _ in range(min(jobs, len(repositories))):
+        start_worker()
+
+    results: Dict[str, Union[str, Exception]] = {}
+    while len(results) < len(repositories):
+        wait = None
+        if timeout is not None:
+            now = time.monotonic()
+            deadlines = []
+            for repository, start in list(started.items()):
+                if repository in results:
+                    continue
+                if now - start >= timeout:
+                    results[repository] = TimeoutError(
+                        f"no answer within {timeout:g} seconds"
+                    )
+                    # Replace the worker stuck on it.
+                    start_worker()
+                else:
+                    deadlines.append(start + timeout - now)
+            if len(results) == len(repositories):
+                break
+            wait = min(deadlines, default=timeout)
+        try:
+            repository, result = finished.get(timeout=wait)
+        except queue.Empty:
+            continue
+        results.setdefault(repository, result)
+    return results
@@ -0,0 +1,95 @@
+"""
+The published form of the index: compressed shards of repositories, each named
+by the SHA-256 of its content, and a manifest listing them.
+
+Repositories are assigned to shards by a hash of their name, so a rebuild in
+which a few repositories changed only produces new shards for those, and
+clients fetching the index only download the shards whose hash changed. The
+manifest records the index's order of repositories, so adding one doesn't
+change the shards of the others, and when their revisions were resolved, so
+rebuilding doesn't change every shard holding a revision.
+"""
+
+import gzip
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+from typing import List
+from ..models import IndexManifest, Repository, SearchIndex, ShardInfo
+from ._config import write_atomic
+
+# Bumped whenever the manifest or shard format changes incompatibly.
+FORMAT_VERSION = 2
+
+SHARD_COUNT = 16
+
+MANIFEST_NAME = "manifest.json"
+
+SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+
+def shard_of(repository: str) -> int:
+    digest = hashlib.sha256(repository.encode()).digest()
+    return int.from_bytes(digest[:4], "big") % SHARD_COUNT
+
+
+def encode_shard(repositories: List[Repository]) -> bytes:
+    # Sorted, and without a timestamp in the gzip header or the repositories,
+    # so the same repositories always give the same bytes and hash.
+    data = [
+        repo.model_dump(exclude={"revision_resolved_at"})
+        for repo in sorted(repositories, key=lambda repo: repo.repository)
+    ]
+    return gzip.compress(
+        json.dumps(data, separators=(",", ":"), sort_keys=True).encode(), mtime=0
+    )
+
+
+def decode_shard(content: bytes) -> List[Repository]:
+    return [
+        Repository.model_validate(repo) for repo in json.loads(gzip.decompress(content))
+    ]
+
+
+def publish_index(search_index: SearchIndex, directory: Path) -> IndexManifest:
+    """
+    Write the index to `directory` as shards and a manifest. Shards are never
+    overwritten or removed, so clients still fetching the previous manifest
+    find all of its shards, and the manifest is written last.
+    """
+    shards: List[List[Repository]] = [[] for _ in range(SHARD_COUNT)]
+    for repo in search_index.repositories:
+        shards[shard_of(repo.repository)].append(repo)
+
+    (directory / "shards").mkdir(parents=True, exist_ok=True)
+    infos = []
+    for shard in shards:
+        content = encode_shard(shard)
+        digest = hashlib.sha256(content).hexdigest()
+        info = ShardInfo(
+            path=f"shards/{digest}.json.gz", sha256=digest, size=len(content)
+        )
+        if not (directory / info.path).exists():
+            write_atomic(directory / info.path, content)
+        infos.append(info)
+
+    manifest = IndexManifest(
+        version=FORMAT_VERSION,
+        created_at=time.time(),
+        shards=infos,
+        repositories=[repo.repository for repo in search_index.repositories],
+        # A build resolves every revision at once; should they differ, the
+        # oldest keeps `add` from trusting any of them for too long.
+        revisions_resolved_at=min(
+            (
+                repo.revision_resolved_at
+                for repo in search_index.repositories
+                if repo.revision_resolved_at is not None
+            ),
+            default=None,
+        ),
+    )
+    write_atomic(directory / MANIFEST_NAME, manifest.model_dump_json(indent=2) + "\n")
+    return manifest
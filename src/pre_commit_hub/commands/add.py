@@ -1,14 +1,52 @@
-import yaml
-from rich.prompt import Confirm
-from typing import Optional, List, Tuple
+import time
+from pathlib import Path
+from typing import Dict, Optional, List, Tuple, Union
 from ..models import SearchIndex, Hook, Repository
-from .search import load_cache
-from ._github import g
-from ..console import error
-from ._git import find_config_file
+from .search import load_index
+from ._daemon import Daemon, DaemonError
+from ._index_file import IndexFile
+from ._revisions import REVISION_CACHE_TTL, REVISION_MAX_AGE, resolve_revisions
+from ..console import error, warning
+from ..trace import traced
+from ._git import find_config_files
+from ._config import (
+    ConfigEditor,
+    ConfigTransaction,
+    edit_configs,
+    report_config_results,
+)
 
 
-def find_hooks(search_index: SearchIndex, query: str) -> List[Tuple[Hook, Repository]]:
+def load_hook_index() -> IndexFile:
+    """
+    Load the index hooks are looked up in. Its prebuilt lookup table means
+    nothing needs to be read up front to resolve queries.
+    """
+    return load_index()
+
+
+@traced("add.find_hooks")
+def find_hooks(
+    search_index: Union[IndexFile, SearchIndex, Daemon], query: str
+) -> List[Tuple[Hook, Repository]]:
+    if isinstance(search_index, Daemon):
+        return [
+            (Hook.model_validate(hook), Repository.model_validate(repo))
+            for hook, repo in search_index.request("lookup", query=query)
+        ]
+
+    if isinstance(search_index, IndexFile):
+        lookup = search_index.hook_lookup()
+        if lookup is not None:
+            return [
+                (
+                    search_index.hook(hook_index),
+                    search_index.repository(search_index.repository_index(hook_index)),
+                )
+                for hook_index in lookup.find(query)
+            ]
+        search_index = search_index.to_search_index()
+
     parts = query.split(":")
     hook_id = parts[-1]
 
@@ -32,9 +70,14 @@ def find_hooks(search_index: SearchIndex, query: str) -> List[Tuple[Hook, Reposi
 
 
 def find_hook(
-    query: str, search_index: SearchIndex
+    query: str, search_index: Union[IndexFile, SearchIndex, Daemon]
+) -> Optional[Tuple[Hook, Repository]]:
+    return report_matches(query, find_hooks(search_index, query))
+
+
+def report_matches(
+    query: str, matches: List[Tuple[Hook, Repository]]
 ) -> Optional[Tuple[Hook, Repository]]:
-    matches = find_hooks(search_index, query)
     if len(matches) == 0:
         error(f"No hooks found matching '{query}'")
         return None
@@ -46,96 +89,199 @@ def find_hook(
     return matches[0]
 
 
-def add_hook_to_config(
-    hook: Hook, repository: Repository, config_file: Optional[str] = None
-) -> bool:
-    config_path = find_config_file(config_file)
-    if not config_path.exists():
-        if not Confirm.ask(f"No {config_path} file found. Create one?"):
-            print("Aborting.")
-            return False
+def find_repo_entry(config: dict, repository: str) -> Optional[dict]:
+    repo_url = f"https://github.com/{repository}"
+    return next((repo for repo in config["repos"] if repo["repo"] == repo_url), None)
+
+
+def hook_exists_in_config(config: dict, hook: Hook, repository: str) -> bool:
+    repo_entry = find_repo_entry(config, repository)
+    return repo_entry is not None and any(
+        h["id"] == hook.id for h in repo_entry.get("hooks", [])
+    )
+
+
+@traced("config.modify_yaml_config")
+def modify_yaml_config(
+    yaml_content: str, hook: Hook, repository: str, latest_rev: str
+) -> str:
+    editor = ConfigEditor(yaml_content)
+    editor.add_hook(f"https://github.com/{repository}", hook.id, latest_rev)
+    return editor.text
 
-    yaml_content = config_path.read_text() if config_path.exists() else ""
 
-    if hook_exists_in_config(yaml_content, hook, repository.repository):
+def add_hook_to_config(
+    hook: Hook,
+    repository: Repository,
+    transaction: ConfigTransaction,
+    revisions: Dict[str, str],
+) -> bool:
+    if hook_exists_in_config(transaction.config, hook, repository.repository):
         print(f"Hook '{hook.id}' from '{repository.repository}' is already in config")
         return False
 
-    latest_rev = get_latest_revision(repository.repository)
-    modified_yaml = modify_yaml_config(
-        yaml_content, hook, repository.repository, latest_rev
+    transaction.add_hook(
+        f"https://github.com/{repository.repository}",
+        hook.id,
+        revisions.get(repository.repository),
     )
 
-    config_path.write_text(modified_yaml)
     print(f"Added hook '{hook.id}' from '{repository.repository}' to config")
     return True
 
 
-def hook_exists_in_config(yaml_content: str, hook: Hook, repository: str) -> bool:
-    config = yaml.safe_load(yaml_content)
-    if config is None:
-        return False
-
-    repo_url = f"https://github.com/{repository}"
-    for repo in config.get("repos", []):
-        if repo["repo"] == repo_url:
-            if any(h["id"] == hook.id for h in repo.get("hooks", [])):
-                return True
-    return False
-
-
-def add_hook(query: str, config_file: Optional[str] = None) -> int:
-    search_index = load_cache()
-    result = find_hook(query, search_index)
-    if result:
-        hook, repository = result
-        return 0 if add_hook_to_config(hook, repository, config_file) else 1
-    else:
+def add_hooks(
+    queries: List[str],
+    config_files: Union[str, List[str], None] = None,
+    fresh: bool = False,
+    max_age: float = REVISION_MAX_AGE,
+) -> int:
+    """
+    Add the hooks matching `queries` to each config, reading and writing every
+    config only once. Hooks are looked up, and revisions resolved, once for all
+    configs, by a running server if there is one.
+    New repositories are pinned to the revision stored in the index, unless it
+    is older than `max_age` seconds or `fresh` is set.
+    """
+    if isinstance(config_files, str):
+        config_files = [config_files]
+    config_paths = find_config_files(config_files)
+    if not config_paths:
+        error("No config files found.")
         return 1
+    if len(config_paths) == 1 and not config_paths[0].exists():
+        from rich.prompt import Confirm
 
+        if not Confirm.ask(f"No {config_paths[0]} file found. Create one?"):
+            print("Aborting.")
+            return 1
 
-def modify_yaml_config(
-    yaml_content: str, hook: Hook, repository: str, latest_rev: str
-) -> str:
-    config = yaml.safe_load(yaml_content) if yaml_content else {"repos": []}
+    daemon = Daemon.connect()
+    if daemon is None:
+        return _add_hooks(queries, config_paths, load_hook_index(), fresh, max_age)
+    with daemon:
+        return _add_hooks(queries, config_paths, daemon, fresh, max_age)
 
-    repo_url = f"https://github.com/{repository}"
-    repo_entry = next(
-        (repo for repo in config["repos"] if repo["repo"] == repo_url), None
-    )
 
-    if repo_entry is None:
-        repo_entry = {"repo": repo_url, "rev": latest_rev, "hooks": []}
-        config["repos"].append(repo_entry)
-    elif "rev" not in repo_entry:
-        repo_entry["rev"] = latest_rev
+def _find_all_hooks(
+    queries: List[str], search_index: Union[IndexFile, SearchIndex, Daemon]
+) -> List[List[Tuple[Hook, Repository]]]:
+    if isinstance(search_index, Daemon):
+        try:
+            return [find_hooks(search_index, query) for query in queries]
+        except DaemonError:
+            # The server went away mid-way, look all of them up here instead.
+            search_index = load_hook_index()
+    return [find_hooks(search_index, query) for query in queries]
 
-    # Check if the hook already exists
-    existing_hook = next((h for h in repo_entry["hooks"] if h["id"] == hook.id), None)
-    if existing_hook is None:
-        new_hook = {"id": hook.id}
-        repo_entry["hooks"].append(new_hook)
 
-    return yaml.dump(config, default_flow_style=False, sort_keys=False)
+def _resolve_revisions(
+    repositories: List[Repository],
+    search_index: Union[IndexFile, SearchIndex, Daemon],
+    fresh: bool,
+    max_age: float,
+) -> Dict[str, str]:
+    """
+    The revision to pin each repository to. The ones stored in the index are
+    used without asking GitHub, see `add_hooks`. If resolving the others fails,
+    e.g. without network access, their stale stored revisions are used.
+    """
+    now = time.time()
+    revisions = {}
+    live = []
+    for repository in {repo.repository: repo for repo in repositories}.values():
+        resolved_at = repository.revision_resolved_at
+        if (
+            not fresh
+            and repository.revision is not None
+            and resolved_at is not None
+            and now - resolved_at <= max_age
+        ):
+            revisions[repository.repository] = repository.revision
+        else:
+            live.append(repository)
+    if not live:
+        return revisions
 
+    names = [repository.repository for repository in live]
+    ttl = 0 if fresh else REVISION_CACHE_TTL
+    if isinstance(search_index, Daemon):
+        try:
+            revisions.update(
+                search_index.request("resolve", repositories=names, ttl=ttl)
+            )
+            return revisions
+        except DaemonError:
+            # The server went away, resolve them here instead.
+            pass
+    try:
+        revisions.update(resolve_revisions(names, ttl))
+    except Exception as e:
+        stored = {repo.repository: repo.revision for repo in live if repo.revision}
+        if fresh or len(stored) < len(live):
+            raise
+        warning(f"Couldn't resolve the latest revisions, using the index's: {e}")
+        revisions.update(stored)
+    return revisions
 
-def get_latest_revision(repository: str) -> str:
-    repo = g.get_repo(repository)
-    tags = list(repo.get_tags())
-    if tags:
-        first_tag = tags[0]
 
-        same_commit_tags = [
-            tag for tag in tags if tag.commit.sha == first_tag.commit.sha
-        ]
+def _add_hooks(
+    queries: List[str],
+    config_paths: List[Path],
+    search_index: Union[IndexFile, SearchIndex, Daemon],
+    fresh: bool = False,
+    max_age: float = REVISION_MAX_AGE,
+) -> int:
+    results = [
+        report_matches(query, matches)
+        for query, matches in zip(queries, _find_all_hooks(queries, search_index))
+    ]
+    if len(config_paths) > 1:
+        return _add_hooks_to_configs(
+            results, config_paths, search_index, fresh, max_age
+        )
+
+    transaction = ConfigTransaction(config_paths[0])
+
+    # Resolve the revisions of every repository that isn't pinned yet up front,
+    # so any that need fetching are fetched concurrently.
+    unpinned = []
+    for result in results:
+        if result is not None:
+            repo_entry = find_repo_entry(transaction.config, result[1].repository)
+            if repo_entry is None or "rev" not in repo_entry:
+                unpinned.append(result[1])
+    revisions = _resolve_revisions(unpinned, search_index, fresh, max_age)
+
+    exit_code = 0
+    for result in results:
+        if not result or not add_hook_to_config(*result, transaction, revisions):
+            exit_code = 1
+    transaction.commit()
+    return exit_code
+
+
+def _add_hooks_to_configs(
+    results: List[Optional[Tuple[Hook, Repository]]],
+    config_paths: List[Path],
+    search_index: Union[IndexFile, SearchIndex, Daemon],
+    fresh: bool,
+    max_age: float,
+) -> int:
+    found = [result for result in results if result is not None]
+    # Which repositories each config has pinned isn't known before editing it,
+    # so every repository is resolved. Once, rather than once per config.
+    revisions = _resolve_revisions(
+        [repository for _, repository in found], search_index, fresh, max_age
+    )
 
-        # Try to find a tag with a period in its name. This is the same criteria
-        # pre-commit uses [^1].
-        # [^1]: https://github.com/pre-commit/pre-commit/blob/d46423ffe14a37a06a0bcb6fe1b8294a27b6c289/pre_commit/git.py#L233
-        for tag in same_commit_tags:
-            if "." in tag.name:
-                return tag.name
+    def edit(transaction: ConfigTransaction) -> None:
+        for hook, repository in found:
+            transaction.add_hook(
+                f"https://github.com/{repository.repository}",
+                hook.id,
+                revisions.get(repository.repository),
+            )
 
-        return first_tag.name
-    else:
-        return repo.get_commits()[0].sha
+    exit_code = report_config_results(edit_configs(config_paths, edit))
+    return 1 if len(found) < len(results) else exit_code
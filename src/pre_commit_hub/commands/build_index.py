@@ -1,8 +1,53 @@
+import os
+import time
 import yaml
+from dataclasses import dataclass, field
 from importlib import resources
 from pathlib import Path
-from ..models import Hook, Repository, SearchIndex
-from ._github import g
+from typing import (
+    IO,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from github.ContentFile import ContentFile
+from github.Repository import Repository as GithubRepository
+from pydantic import ValidationError
+from ..console import error
+from ..trace import traced
+from ..models import (
+    BuildJournalEntry,
+    CachedRevision,
+    Hook,
+    IndexState,
+    Repository,
+    RepositoryState,
+    SearchIndex,
+)
+from .search import load_cache, load_index
+from ._config import Dumper, open_atomic
+from ._hook_files import HookFileStore
+from ._query_cache import clear as clear_query_cache
+from ._index_file import IndexFile, write_repositories
+from ._pipeline import run_pipeline
+from ._github import get_github
+from ._graphql import BATCH_SIZE, fetch_blobs, fetch_repositories, tag_commits
+from ._revisions import (
+    latest_revision,
+    latest_tag_with_commit,
+    load_revision_cache,
+    save_revision_cache,
+)
+from ._shards import publish_index
+
+HOOKS_FILE = ".pre-commit-hooks.yaml"
 
 
 def load_repositories():
@@ -10,59 +55,544 @@ def load_repositories():
         return yaml.safe_load(f)
 
 
-def fetch_repo_info(repo):
+def fetch_repo_info(github_repo: GithubRepository):
     try:
-        github_repo = g.get_repo(repo)
         return {
             "stargazers_count": github_repo.stargazers_count,
             "description": github_repo.description,
             "homepage": github_repo.homepage,
         }
     except Exception as e:
-        raise RuntimeError(f"Got error fetching repo info for {repo}") from e
+        raise RuntimeError(
+            f"Got error fetching repo info for {github_repo.full_name}"
+        ) from e
 
 
+@traced("build_index.save_to_cache")
 def save_to_cache(data: SearchIndex):
+    save_repositories(data.repositories)
+
+
+def save_repositories(repositories: Iterable[Repository]) -> None:
+    """
+    Write the index of `repositories`, iterating them only once, so a build can
+    stream them from its journal rather than hold them all in memory.
+    """
     cache_dir = Path.home() / ".pre-commit-hub"
     cache_dir.mkdir(parents=True, exist_ok=True)
     cache_file = cache_dir / "index.yaml"
 
-    with open(cache_file, "w") as f:
-        yaml.dump(data.model_dump(), f, default_flow_style=False)
+    def exported(f: IO) -> Iterator[Repository]:
+        # The YAML copy is the human-readable export of the index; the CLI
+        # itself reads the binary one. It's dumped a repository at a time with
+        # the C dumper. Its text can differ from the pure-Python dumper's (e.g.
+        # where long escaped strings wrap), but it loads back the same.
+        f.write("repositories:")
+        empty = True
+        for repo in repositories:
+            if empty:
+                f.write("\n")
+                empty = False
+            yaml.dump([repo.model_dump()], f, Dumper=Dumper, default_flow_style=False)
+            yield repo
+        if empty:
+            f.write(" []\n")
+
+    with open_atomic(cache_file) as f:
+        write_repositories(cache_dir / "index.bin", exported(f))
+    # Results cached for the previous index can never be served again.
+    clear_query_cache()
+
+
+def load_state() -> IndexState:
+    state_file = Path.home() / ".pre-commit-hub" / "index-state.yaml"
+    if not state_file.exists():
+        return IndexState()
+    with open(state_file, "r") as f:
+        return IndexState.model_validate(yaml.safe_load(f) or {})
+
+
+def save_state(state: IndexState):
+    cache_dir = Path.home() / ".pre-commit-hub"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    state_file = cache_dir / "index-state.yaml"
+
+    with open(state_file, "w") as f:
+        yaml.dump(state.model_dump(), f, default_flow_style=False)
+
+
+def fetch_hooks_file(github_repo: GithubRepository) -> ContentFile:
+    contents = github_repo.get_contents(HOOKS_FILE)
+    if isinstance(contents, list):
+        return contents[0]
+    return contents
+
+
+@dataclass
+class FetchedRepository:
+    """
+    A repository as the fetch stage of `build_cache` leaves it, with its hooks
+    file not parsed yet, or the error fetching it failed with.
+    """
+
+    repository: str
+    state: Optional[RepositoryState] = None
+    stars: int = 0
+    hooks_sha: Optional[str] = None
+    # Reads the hooks file, which is only called if its SHA wasn't parsed
+    # before. `None` when the hooks are already in `hooks`.
+    hooks_text: Optional[Callable[[], Union[str, bytes]]] = None
+    hooks: List[Hook] = field(default_factory=list)
+    revision: Optional[str] = None
+    revision_commit: Optional[str] = None
+    # The tags came with the response, so the revision can be cached for `add`.
+    cache_revision: bool = False
+    error: Optional[str] = None
 
 
-def fetch_hooks(repo):
+@traced("build_index.fetch_repository")
+def fetch_repository(repo: str) -> FetchedRepository:
+    """
+    Fetch the metadata and hooks file of a single repository.
+    Both are read off of one `get_repo` response, so each repository costs a
+    single metadata round-trip plus the hooks file download.
+    """
     try:
-        github_repo = g.get_repo(repo)
-        contents = github_repo.get_contents(".pre-commit-hooks.yaml")
-        if isinstance(contents, list):
-            content = contents[0]
-        else:
-            content = contents
-        hooks = yaml.safe_load(content.decoded_content)
-        return [Hook.model_validate(hook) for hook in hooks]
+        github_repo = get_github().get_repo(repo)
+    except Exception as e:
+        raise RuntimeError(f"Got error fetching repo info for {repo}") from e
+
+    state = RepositoryState(
+        etag=github_repo.etag, last_modified=github_repo.last_modified
+    )
+
+    info = fetch_repo_info(github_repo)
+    if not info:
+        return FetchedRepository(repository=repo, state=state)
+
+    try:
+        content = fetch_hooks_file(github_repo)
     except Exception as e:
         raise RuntimeError(f"Got error fetching hooks in repo {repo}") from e
+    state.hooks_etag = content.etag
+    state.hooks_last_modified = content.last_modified
+    state.hooks_sha = content.sha
 
+    try:
+        revision, commit = latest_revision(github_repo)
+    except Exception as e:
+        raise RuntimeError(f"Got error fetching the latest revision of {repo}") from e
+    return FetchedRepository(
+        repository=repo,
+        state=state,
+        stars=info["stargazers_count"],
+        hooks_sha=content.sha,
+        hooks_text=lambda: content.decoded_content,
+        revision=revision,
+        revision_commit=commit,
+    )
 
-def build_cache() -> int:
-    repos = load_repositories()
-    cache_data = []
-    for repo in repos:
-        info = fetch_repo_info(repo)
-        if not info:
-            continue
 
-        hooks = fetch_hooks(repo)
-        if not hooks:
+def conditional_headers(
+    etag: Optional[str], last_modified: Optional[str]
+) -> Dict[str, str]:
+    headers = {}
+    if etag is not None:
+        headers["If-None-Match"] = etag
+    if last_modified is not None:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
+@traced("build_index.refresh_repository")
+def refresh_repository(
+    repo: str, previous: Repository, state: RepositoryState
+) -> FetchedRepository:
+    """
+    Refresh a repository that is already in the index.
+    Uses conditional requests, so when neither the repository nor its hooks file
+    changed GitHub answers both with a 304, which does not count against the
+    rate limit, and the previous entry is reused as is.
+    """
+    github_repo = get_github().get_repo(repo, lazy=True)
+    new_state = state.model_copy()
+    fetched = FetchedRepository(
+        repository=repo, state=new_state, stars=previous.stars, hooks=previous.hooks
+    )
+
+    try:
+        repo_changed = github_repo.update(
+            conditional_headers(state.etag, state.last_modified)
+        )
+        if repo_changed:
+            fetched.stars = github_repo.stargazers_count
+            new_state.etag = github_repo.etag
+            new_state.last_modified = github_repo.last_modified
+    except Exception as e:
+        raise RuntimeError(f"Got error fetching repo info for {repo}") from e
+
+    content = ContentFile(
+        github_repo._requester,
+        {},
+        {"url": f"{github_repo.url}/contents/{HOOKS_FILE}"},
+        completed=False,
+    )
+    try:
+        if content.update(
+            conditional_headers(state.hooks_etag, state.hooks_last_modified)
+        ):
+            # The validators can change without the file changing (e.g. a push
+            # touching other files), so only re-parse when the blob differs.
+            if content.sha != state.hooks_sha:
+                fetched.hooks_sha = content.sha
+                fetched.hooks_text = lambda: content.decoded_content
+            new_state.hooks_etag = content.etag
+            new_state.hooks_last_modified = content.last_modified
+            new_state.hooks_sha = content.sha
+    except Exception as e:
+        raise RuntimeError(f"Got error fetching hooks in repo {repo}") from e
+
+    # Pushing a tag updates the repository's `pushed_at`, so an unchanged
+    # repository still has the same latest revision.
+    fetched.revision = previous.revision
+    fetched.revision_commit = previous.revision_commit
+    if repo_changed or fetched.revision is None:
+        try:
+            fetched.revision, fetched.revision_commit = latest_revision(github_repo)
+        except Exception as e:
+            raise RuntimeError(
+                f"Got error fetching the latest revision of {repo}"
+            ) from e
+    return fetched
+
+
+def repository_from_node(
+    repo: str,
+    node: Dict[str, Any],
+    texts: Dict[str, Optional[str]],
+    hook_files: HookFileStore,
+) -> FetchedRepository:
+    """
+    Turn a GraphQL repository node into what REST fetches produce. `texts`
+    are the hooks files downloaded for the batch, by blob SHA.
+    """
+    hooks_file = node["hooksFile"]
+    if not hooks_file:
+        raise ValueError(f"No {HOOKS_FILE} in {repo}")
+    fetched = FetchedRepository(
+        repository=repo,
+        state=RepositoryState(hooks_sha=hooks_file["oid"]),
+        stars=node["stargazerCount"],
+        hooks_sha=hooks_file["oid"],
+        cache_revision=True,
+    )
+    text = texts.get(hooks_file["oid"])
+    if text is not None:
+        fetched.hooks_text = lambda: text
+    else:
+        hooks = hook_files.get(hooks_file["oid"])
+        if hooks is None:
+            # Let the REST fetch download the file, or report it missing.
+            raise ValueError(f"No usable {HOOKS_FILE} in {repo}")
+        fetched.hooks = hooks
+
+    revision, commit = latest_tag_with_commit(tag_commits(node)) or (None, None)
+    if revision is None and node["defaultBranchRef"]:
+        revision = commit = node["defaultBranchRef"]["target"]["oid"]
+    fetched.revision = revision
+    fetched.revision_commit = commit
+    return fetched
+
+
+@traced("build_index.fetch_batch_graphql")
+def fetch_batch_graphql(
+    repos: Sequence[str], hook_files: HookFileStore
+) -> List[FetchedRepository]:
+    """
+    Fetch a batch of repositories with one GraphQL query, and the hooks files
+    not parsed before with another. Repositories missing from the result are
+    left for the caller to fetch over REST, which is also where their errors
+    get reported.
+    """
+    try:
+        nodes = fetch_repositories(repos)
+    except Exception:
+        return []
+
+    # Each unknown file once, from the first repository publishing it.
+    unknown: Dict[str, str] = {}
+    for repo, node in zip(repos, nodes):
+        hooks_file = node and node["hooksFile"]
+        if hooks_file and hooks_file["oid"] not in hook_files:
+            unknown.setdefault(hooks_file["oid"], repo)
+    texts: Dict[str, Optional[str]] = {}
+    if unknown:
+        try:
+            blobs = [(repo, oid) for oid, repo in unknown.items()]
+            texts = dict(zip(unknown, fetch_blobs(blobs)))
+        except Exception:
+            pass
+
+    results = []
+    for repo, node in zip(repos, nodes):
+        if node is None:
+            continue
+        try:
+            results.append(repository_from_node(repo, node, texts, hook_files))
+        except Exception:
             continue
+    return results
+
+
+def parse_repository(
+    fetched: FetchedRepository, hook_files: HookFileStore
+) -> BuildJournalEntry:
+    """The journal entry of a fetched repository, with its hooks validated."""
+    repo = fetched.repository
+    if fetched.error is not None:
+        return BuildJournalEntry(repository=repo, error=fetched.error)
+    hooks = fetched.hooks
+    if fetched.hooks_text is not None:
+        try:
+            hooks = hook_files.hooks(fetched.hooks_sha, fetched.hooks_text)
+        except Exception as e:
+            return BuildJournalEntry(
+                repository=repo, error=f"Got error parsing hooks in repo {repo}: {e}"
+            )
+
+    data = None
+    if hooks:
+        data = Repository(
+            repository=repo,
+            stars=fetched.stars,
+            hooks=hooks,
+            revision=fetched.revision,
+            revision_commit=fetched.revision_commit,
+        )
+    return BuildJournalEntry(
+        repository=repo,
+        data=data,
+        state=fetched.state,
+        revision=fetched.revision if fetched.cache_revision else None,
+    )
+
+
+def journal_path() -> Path:
+    return Path.home() / ".pre-commit-hub" / "build-journal.jsonl"
+
+
+def read_journal() -> Iterator[Tuple[int, BuildJournalEntry]]:
+    """Each entry in the journal, with its offset in it, see `build_cache`."""
+    try:
+        f = open(journal_path(), "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        offset = 0
+        for line in f:
+            try:
+                yield offset, BuildJournalEntry.model_validate_json(line)
+            except ValidationError:
+                # The last line of a build that was killed mid-write.
+                pass
+            offset += len(line)
+
+
+def journal_ends_mid_line() -> bool:
+    try:
+        with open(journal_path(), "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    except FileNotFoundError:
+        return False
+
+
+def describe_error(e: Exception) -> str:
+    if e.__cause__ is not None:
+        return f"{e}: {e.__cause__}"
+    return str(e)
+
+
+def load_previous_index() -> Optional[IndexFile]:
+    try:
+        return load_index()
+    except FileNotFoundError:
+        return None
+
+
+def unchanged(previous: Optional[Repository], data: Repository) -> bool:
+    # Every build resolves the revisions again, at a new time.
+    return previous is not None and previous.model_dump(
+        exclude={"revision_resolved_at"}
+    ) == data.model_dump(exclude={"revision_resolved_at"})
+
+
+def build_cache(
+    jobs: int = 1,
+    incremental: bool = False,
+    graphql: bool = False,
+    publish: Optional[str] = None,
+    resume: bool = False,
+) -> int:
+    """
+    Fetch every repository and write the index.
+
+    Repositories go through the stages of a pipeline (see `_pipeline`): fetch
+    workers download them, a parser validates their hooks, and each result is
+    appended to a journal on disk as soon as it's parsed. Only where each
+    entry is in the journal is kept in memory. The index is then written from
+    the journal a repository at a time, in the order of `repositories.yaml`,
+    so it's the same regardless of how many workers there are or how often
+    the build resumed.
+
+    A repository that fails doesn't stop the others. If any failed, the index
+    is still written, with the previous index's entries for them, and the
+    index state lists them as `missing`. `resume` then reuses the journal and
+    only fetches the repositories that failed or weren't reached, e.g.
+    because the build was interrupted.
+    """
+    repos = load_repositories()
+    started_at = time.time()
+
+    state = load_state()
+    previous = load_previous_index()
+    previous_indexes = previous.repository_indexes() if previous else {}
+
+    def previous_entry(repo: str) -> Optional[Repository]:
+        if previous is None or repo not in previous_indexes:
+            return None
+        return previous.repository(previous_indexes[repo])
+
+    offsets: Dict[str, int] = {}
+    errors: Dict[str, str] = {}
+    if resume:
+        wanted = set(repos)
+        for offset, entry in read_journal():
+            if entry.error is None and entry.repository in wanted:
+                offsets[entry.repository] = offset
+            else:
+                offsets.pop(entry.repository, None)
+        print(f"Resuming, {len(offsets)} of {len(repos)} repositories already fetched")
+    todo = [repo for repo in repos if repo not in offsets]
+
+    journal_path().parent.mkdir(parents=True, exist_ok=True)
+    journal = open(journal_path(), "ab" if resume else "wb")
+    if resume and journal_ends_mid_line():
+        # The build being resumed was killed mid-write; keep that line from
+        # swallowing the first new entry.
+        journal.write(b"\n")
+    hook_files = HookFileStore.load()
+
+    def parse(fetched: FetchedRepository) -> BuildJournalEntry:
+        return parse_repository(fetched, hook_files)
+
+    def record(entry: BuildJournalEntry) -> None:
+        if entry.error is None:
+            offsets[entry.repository] = journal.tell()
+        else:
+            errors[entry.repository] = entry.error
+        journal.write(entry.model_dump_json().encode() + b"\n")
+        journal.flush()
+
+    def fetch(repo: str) -> List[FetchedRepository]:
+        try:
+            previous_repo = previous_entry(repo) if incremental else None
+            if previous_repo is not None and repo in state.repositories:
+                return [
+                    refresh_repository(repo, previous_repo, state.repositories[repo])
+                ]
+            return [fetch_repository(repo)]
+        except Exception as e:
+            return [FetchedRepository(repository=repo, error=describe_error(e))]
+
+    with journal:
+        try:
+            if graphql and todo:
+                batches = [
+                    todo[i : i + BATCH_SIZE] for i in range(0, len(todo), BATCH_SIZE)
+                ]
+                run_pipeline(
+                    batches,
+                    lambda batch: fetch_batch_graphql(batch, hook_files),
+                    parse,
+                    record,
+                    jobs,
+                )
+                todo = [
+                    repo for repo in todo if repo not in offsets and repo not in errors
+                ]
+                if todo:
+                    print(
+                        f"Fetching {len(todo)} repositories GraphQL couldn't over REST"
+                    )
+            run_pipeline(todo, fetch, parse, record, jobs)
+        finally:
+            hook_files.save()
+
+    missing = [repo for repo in repos if repo not in offsets]
+    new_state = IndexState(missing=missing)
+    revisions: Dict[str, str] = {}
+    changed = 0
+
+    def assembled() -> Iterator[Repository]:
+        nonlocal changed
+        with open(journal_path(), "rb") as f:
+            for repo in repos:
+                if repo not in offsets:
+                    # Usable, if out of date, until the build is resumed.
+                    if repo in state.repositories:
+                        new_state.repositories[repo] = state.repositories[repo]
+                    previous_repo = previous_entry(repo)
+                    if previous_repo is not None:
+                        yield previous_repo
+                    continue
+
+                f.seek(offsets[repo])
+                entry = BuildJournalEntry.model_validate_json(f.readline())
+                if entry.state is not None:
+                    new_state.repositories[repo] = entry.state
+                if entry.revision is not None:
+                    revisions[repo] = entry.revision
+                if entry.data is None or not unchanged(
+                    previous_entry(repo), entry.data
+                ):
+                    changed += 1
+                if entry.data is not None:
+                    if entry.data.revision is not None:
+                        entry.data.revision_resolved_at = started_at
+                    yield entry.data
+
+    save_repositories(assembled())
+    save_state(new_state)
+    if revisions:
+        # The tags came with the GraphQL response, so `add` doesn't need to
+        # ask for them again until the cache expires.
+        revision_cache = load_revision_cache()
+        for repo, revision in revisions.items():
+            revision_cache.repositories[repo] = CachedRevision(
+                revision=revision, resolved_at=started_at
+            )
+        save_revision_cache(revision_cache)
 
-        repo_data = Repository(
-            repository=repo, stars=info["stargazers_count"], hooks=hooks
+    if missing:
+        error(f"Couldn't fetch {len(missing)} of {len(repos)} repositories:")
+        for repo in missing:
+            print(f"  {repo}: {errors[repo]}")
+        print(
+            "The index keeps their previous entries, if it had them."
+            " Run `pre-commit-hub build-index --resume` to retry them"
         )
-        cache_data.append(repo_data)
+        return 1
+    journal_path().unlink()
 
-    search_index = SearchIndex(repositories=cache_data)
-    save_to_cache(search_index)
+    if incremental:
+        print(f"Refreshed {changed} of {len(repos)} repositories")
     print("Data saved to ~/.pre-commit-hub/index.yaml")
+    if publish:
+        # Shards are grouped in memory, so only this loads the whole index.
+        manifest = publish_index(load_cache(), Path(publish))
+        print(f"Published {len(manifest.shards)} shards to {publish}")
     return 0
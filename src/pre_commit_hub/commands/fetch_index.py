@@ -0,0 +1,158 @@
+import hashlib
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse
+from pydantic import ValidationError
+from ..console import error
+from ..models import IndexManifest, Repository, SearchIndex, ShardInfo
+from ._config import write_atomic
+from ._shards import FORMAT_VERSION, MANIFEST_NAME, SHA256, decode_shard
+from .build_index import save_to_cache
+
+MAX_WORKERS = 8
+
+# Seconds to wait on the index source before giving up.
+TIMEOUT = 30
+
+
+class FetchError(Exception):
+    pass
+
+
+def source_url(source: str) -> str:
+    """The base URL of an index published to a directory or a web server."""
+    if urlparse(source).scheme in ("http", "https", "file"):
+        url = source
+    else:
+        url = Path(source).resolve().as_uri()
+    return url if url.endswith("/") else url + "/"
+
+
+def read_url(url: str) -> bytes:
+    try:
+        with urllib.request.urlopen(url, timeout=TIMEOUT) as response:
+            return response.read()
+    except OSError as e:
+        raise FetchError(f"Couldn't read {url}: {e}") from e
+
+
+def load_manifest(base_url: str) -> IndexManifest:
+    try:
+        manifest = IndexManifest.model_validate_json(
+            read_url(urljoin(base_url, MANIFEST_NAME))
+        )
+    except ValidationError as e:
+        raise FetchError(f"Invalid manifest at {base_url}: {e}") from e
+    if manifest.version != FORMAT_VERSION:
+        raise FetchError(
+            f"The index at {base_url} has format version {manifest.version},"
+            f" this version of pre-commit-hub reads version {FORMAT_VERSION}"
+        )
+    for shard in manifest.shards:
+        if not SHA256.match(shard.sha256):
+            raise FetchError(f"Invalid shard hash in manifest: {shard.sha256}")
+    return manifest
+
+
+def cached_shard(path: Path, shard: ShardInfo) -> Optional[bytes]:
+    try:
+        content = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    if hashlib.sha256(content).hexdigest() != shard.sha256:
+        return None
+    return content
+
+
+def download_shard(base_url: str, shard: ShardInfo) -> bytes:
+    content = read_url(urljoin(base_url, shard.path))
+    if hashlib.sha256(content).hexdigest() != shard.sha256:
+        raise FetchError(f"{shard.path} doesn't match its hash in the manifest")
+    return content
+
+
+def read_shard(shard: ShardInfo, content: bytes) -> List[Repository]:
+    # The hash only proves the shard is the one published, not that what was
+    # published is valid.
+    try:
+        return decode_shard(content)
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        raise FetchError(f"Couldn't read {shard.path}: {e}") from e
+
+
+def in_manifest_order(
+    manifest: IndexManifest, repositories: List[Repository]
+) -> List[Repository]:
+    # Search ranks ties by their order in the index, so a fetched index has to
+    # keep the order of the one that was published.
+    by_name = {repo.repository: repo for repo in repositories}
+    if len(by_name) != len(repositories) or set(by_name) != set(manifest.repositories):
+        raise FetchError("The shards don't hold the repositories in the manifest")
+    return [by_name[name] for name in manifest.repositories]
+
+
+def fetch_index(source: str) -> int:
+    """
+    Replace the local index with the one published at `source`, downloading
+    only the shards that aren't in the local shard store yet. Every shard is
+    checked against the manifest's hash before the index is replaced.
+    """
+    base_url = source_url(source)
+    shard_dir = Path.home() / ".pre-commit-hub" / "shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        manifest = load_manifest(base_url)
+        contents: Dict[str, bytes] = {}
+        missing = []
+        for shard in manifest.shards:
+            content = cached_shard(shard_dir / f"{shard.sha256}.json.gz", shard)
+            if content is None:
+                missing.append(shard)
+            else:
+                contents[shard.sha256] = content
+
+        if missing:
+            with ThreadPoolExecutor(
+                max_workers=min(MAX_WORKERS, len(missing))
+            ) as executor:
+                downloaded = executor.map(
+                    lambda shard: download_shard(base_url, shard), missing
+                )
+                for shard, content in zip(missing, downloaded):
+                    contents[shard.sha256] = content
+
+        search_index = SearchIndex(
+            repositories=in_manifest_order(
+                manifest,
+                [
+                    repo
+                    for shard in manifest.shards
+                    for repo in read_shard(shard, contents[shard.sha256])
+                ],
+            )
+        )
+        # Shards leave out when the revisions were resolved, see `_shards`.
+        for repo in search_index.repositories:
+            if repo.revision is not None:
+                repo.revision_resolved_at = manifest.revisions_resolved_at
+    except FetchError as e:
+        error(str(e))
+        return 1
+    for shard in missing:
+        write_atomic(shard_dir / f"{shard.sha256}.json.gz", contents[shard.sha256])
+    save_to_cache(search_index)
+
+    # Shards of older manifests are no longer needed.
+    wanted = {f"{shard.sha256}.json.gz" for shard in manifest.shards}
+    for path in shard_dir.iterdir():
+        if path.name not in wanted:
+            path.unlink()
+
+    print(
+        f"Downloaded {len(missing)} of {len(manifest.shards)} shards,"
+        f" {len(search_index.repositories)} repositories"
+    )
+    return 0
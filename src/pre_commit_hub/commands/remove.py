@@ -1,43 +1,72 @@
-import yaml
-from typing import Optional
+from pathlib import Path
+from typing import List, Union
 from ..console import error
-from ._git import find_config_file
+from ..trace import traced
+from ._config import (
+    ConfigEditor,
+    ConfigTransaction,
+    edit_configs,
+    report_config_results,
+)
+from ._git import find_config_files
 
 
+@traced("config.transform_yaml_remove_hook")
 def transform_yaml_remove_hook(yaml_content: str, hook_id: str) -> str:
-    config = yaml.safe_load(yaml_content) or {"repos": []}
-    repos = config["repos"]
+    editor = ConfigEditor(yaml_content)
+    editor.remove_hook(hook_id)
+    return editor.text or "repos: []\n"
 
-    new_repos = []
-    for repo in repos:
-        hooks = repo.get("hooks", [])
-        new_hooks = [h for h in hooks if h.get("id") != hook_id]
-        if new_hooks:
-            repo["hooks"] = new_hooks
-            new_repos.append(repo)
 
-    config["repos"] = new_repos
+def remove_hook_from_config(hook_id: str, transaction: ConfigTransaction) -> bool:
+    if transaction.remove_hook(hook_id):
+        print(f"Removed hook '{hook_id}' from config")
+        return True
+    else:
+        print(f"Hook '{hook_id}' not found in config")
+        return False
 
-    return yaml.dump(config, default_flow_style=False, sort_keys=False)
 
+def remove_hooks(
+    hook_ids: List[str], config_files: Union[str, List[str], None] = None
+) -> int:
+    """
+    Remove the hooks from each config, reading and writing every config once.
+    """
+    if isinstance(config_files, str):
+        config_files = [config_files]
+    config_paths = find_config_files(config_files)
+    if not config_paths:
+        error("No config files found.")
+        return 1
+    if len(config_paths) > 1:
+        return _remove_hooks_from_configs(hook_ids, config_paths)
 
-def remove_hook_from_config(hook_id: str, config_file: Optional[str] = None) -> bool:
-    config_path = find_config_file(config_file)
+    config_path = config_paths[0]
     if not config_path.exists():
         error(f"Config file {config_path} not found.")
-        return False
+        return 1
 
-    yaml_content = config_path.read_text()
-    new_yaml_content = transform_yaml_remove_hook(yaml_content, hook_id)
+    transaction = ConfigTransaction(config_path)
+    exit_code = 0
+    for hook_id in hook_ids:
+        if not remove_hook_from_config(hook_id, transaction):
+            exit_code = 1
+    transaction.commit()
+    return exit_code
 
-    if new_yaml_content != yaml_content:
-        config_path.write_text(new_yaml_content)
-        print(f"Removed hook '{hook_id}' from config")
-        return True
-    else:
-        print(f"Hook '{hook_id}' not found in config")
-        return False
 
+def _remove_hooks_from_configs(hook_ids: List[str], config_paths: List[Path]) -> int:
+    removed = set()
+
+    def edit(transaction: ConfigTransaction) -> None:
+        for hook_id in hook_ids:
+            if transaction.remove_hook(hook_id):
+                removed.add(hook_id)
 
-def remove_hook(hook_id: str, config_file: Optional[str] = None) -> int:
-    return 0 if remove_hook_from_config(hook_id, config_file) else 1
+    exit_code = report_config_results(edit_configs(config_paths, edit))
+    for hook_id in hook_ids:
+        if hook_id not in removed:
+            error(f"Hook '{hook_id}' not found in any config")
+            exit_code = 1
+    return exit_code
@@ -1,39 +1,216 @@
-from typing import Tuple, cast
-import yaml
+import json
+import sys
+from typing import TYPE_CHECKING, List, Optional, Tuple, cast
 from pathlib import Path
-from thefuzz import fuzz, process
-from ..models import SearchIndex
 from ..console import error
+from ..trace import phase, traced
+from ._daemon import Daemon, DaemonError
 
+# The index and search modules are only imported when there is no server to
+# answer the search, see `search_hooks`.
+if TYPE_CHECKING:
+    from ..models import SearchIndex
+    from ._fuzzy import FuzzyIndex
+    from ._index_file import IndexFile
 
-def load_cache() -> SearchIndex:
-    cache_file = Path.home() / ".pre-commit-hub" / "index.yaml"
-    with open(cache_file, "r") as f:
+
+@traced("search.load_index")
+def load_index() -> "IndexFile":
+    """
+    Load the index in its compact, read-only form. Searches and lookups should
+    use this; `load_cache` builds pydantic models for every hook.
+    """
+    import yaml
+    from ..models import SearchIndex
+    from ._index_file import IndexFile, IndexFormatError
+
+    cache_dir = Path.home() / ".pre-commit-hub"
+    try:
+        index_file = IndexFile(cache_dir / "index.bin")
+    except (FileNotFoundError, IndexFormatError):
+        # Caches built before the binary format existed only have the YAML,
+        # which is validated once and converted.
+        with open(cache_dir / "index.yaml", "r") as f:
+            search_index = SearchIndex.model_validate(yaml.safe_load(f))
+        return upgrade_index(search_index)
+
+    if not index_file.has_section("search.postings") or not index_file.has_section(
+        "lookup.slots"
+    ):
+        # Written by a version without the search or lookup sections.
+        return upgrade_index(index_file.to_search_index())
+    return index_file
+
+
+def upgrade_index(search_index: "SearchIndex") -> "IndexFile":
+    """
+    Write the current binary index for a cache built by an older version, so
+    the conversion only happens once.
+    """
+    from ._index_file import IndexFile, write_index
+
+    index_path = Path.home() / ".pre-commit-hub" / "index.bin"
+    try:
+        write_index(index_path, search_index)
+    except OSError:
+        return IndexFile.from_search_index(search_index)
+    return IndexFile(index_path)
+
+
+@traced("search.load_cache")
+def load_cache() -> "SearchIndex":
+    import yaml
+    from ..models import SearchIndex
+    from ._index_file import IndexFile, IndexFormatError
+
+    cache_dir = Path.home() / ".pre-commit-hub"
+    try:
+        return IndexFile(cache_dir / "index.bin").to_search_index()
+    except (FileNotFoundError, IndexFormatError):
+        # Caches built before the binary format existed only have the YAML.
+        pass
+
+    cache_file = cache_dir / "index.yaml"
+    with open(cache_file, "r") as f, phase("yaml.load"):
         data = yaml.safe_load(f)
+    with phase("pydantic.validate"):
         return SearchIndex.model_validate(data)
 
 
-def search_hooks(query: str) -> int:
-    search_index = load_cache()
+@traced("search.extract")
+def extract(query: str, limit: int = 5) -> List[Tuple[dict, int]]:
+    """Find the `limit` hooks best matching `query`, with their match scores."""
+    index_file = load_index()
+    fuzzy_index = cast("FuzzyIndex", index_file.fuzzy_index())
+
+    return [
+        (index_file.document(hook_index), int(round(score)))
+        for hook_index, score in fuzzy_index.extract(query, limit)
+    ]
+
+
+@traced("search.extract_many")
+def extract_many(queries: List[str], limit: int = 5) -> List[List[Tuple[dict, int]]]:
+    """`extract` for each of `queries`, scored together; see `FuzzyIndex`."""
+    index_file = load_index()
+    fuzzy_index = cast("FuzzyIndex", index_file.fuzzy_index())
 
-    documents = [
-        {"repository": repo.repository, "stars": repo.stars, **hook.model_dump()}
-        for repo in search_index.repositories
-        for hook in repo.hooks
+    return [
+        [
+            (index_file.document(hook_index), int(round(score)))
+            for hook_index, score in results
+        ]
+        for results in fuzzy_index.extract_many(queries, limit)
     ]
 
-    results = process.extract(query, documents, scorer=fuzz.partial_token_sort_ratio)
 
-    if not results:
+@traced("search.daemon_extract")
+def daemon_extract(query: str, limit: int = 5) -> Optional[List[Tuple[dict, int]]]:
+    """`extract` answered by a running server, or `None` if there is none."""
+    daemon = Daemon.connect()
+    if daemon is None:
+        return None
+    with daemon:
+        try:
+            results = daemon.request("search", query=query, limit=limit)
+        except DaemonError:
+            return None
+    return [(hook, score) for hook, score in results]
+
+
+def format_text(results: List[Tuple[dict, int]]) -> str:
+    return "".join(
+        f"Match score: {score}\n"
+        f"Repository: {hook['repository']}\n"
+        f"Stars: {hook['stars']}\n"
+        f"Hook ID: {hook['id']}\n"
+        f"Hook Name: {hook['name']}\n"
+        f"Description: {hook['description']}\n"
+        "---\n"
+        for hook, score in results
+    )
+
+
+def format_jsonl(results: List[Tuple[dict, int]]) -> str:
+    return "".join(
+        json.dumps({**hook, "score": score}) + "\n" for hook, score in results
+    )
+
+
+def format_json(results: List[Tuple[dict, int]]) -> str:
+    return json.dumps([{**hook, "score": score} for hook, score in results]) + "\n"
+
+
+FORMATTERS = {"text": format_text, "json": format_json, "jsonl": format_jsonl}
+
+
+def read_queries(batch_file: str) -> List[str]:
+    """The non-blank lines of `batch_file`, or of stdin if it's `-`."""
+    if batch_file == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(batch_file).read_text().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+@traced("search.search_hooks")
+def search_hooks(query: str, limit: int = 5, output: str = "text") -> int:
+    from ._query_cache import QueryCache
+
+    with QueryCache.open() as cache:
+        results = cache.get([query], limit)[0]
+        if results is None:
+            results = daemon_extract(query, limit)
+            if results is None:
+                results = extract(query, limit)
+            cache.put([query], limit, [results])
+
+    if not results and output == "text":
         error(f"No results found for query: {query}")
         return 1
+
+    # One write for the whole result set, rather than a print per line.
+    sys.stdout.write(FORMATTERS[output](results))
+    sys.stdout.flush()
+    return 0 if results else 1
+
+
+@traced("search.search_batch")
+def search_batch(batch_file: str, limit: int = 5, output: str = "text") -> int:
+    """
+    Search for every query in `batch_file`, one per line. The JSON outputs
+    add the query each result matched to the result.
+    """
+    from ._query_cache import QueryCache
+
+    try:
+        queries = read_queries(batch_file)
+    except OSError as e:
+        error(f"Couldn't read queries: {e}")
+        return 1
+
+    with QueryCache.open() as cache:
+        cached = cache.get(queries, limit)
+        missing = [query for query, results in zip(queries, cached) if results is None]
+        found = extract_many(missing, limit) if missing else []
+        cache.put(missing, limit, found)
+    remaining = iter(found)
+    all_results = [
+        next(remaining) if results is None else results for results in cached
+    ]
+    if output == "text":
+        content = "".join(
+            f"Query: {query}\n" + format_text(results)
+            for query, results in zip(queries, all_results)
+        )
     else:
-        for hook, score in cast(list[Tuple[dict, int]], results):
-            print(f"Match score: {score}")
-            print(f"Repository: {hook['repository']}")
-            print(f"Stars: {hook['stars']}")
-            print(f"Hook ID: {hook['id']}")
-            print(f"Hook Name: {hook['name']}")
-            print(f"Description: {hook['description']}")
-            print("---")
-        return 0
+        content = FORMATTERS[output](
+            [
+                ({"query": query, **hook}, score)
+                for query, results in zip(queries, all_results)
+                for hook, score in results
+            ]
+        )
+    sys.stdout.write(content)
+    sys.stdout.flush()
+    return 0
@@ -0,0 +1,131 @@
+"""
+`pre-commit-hub serve`: answer searches and lookups from an index kept in
+memory, so editor integrations don't pay for a new process, the imports and
+loading the index on every keystroke.
+
+The index is reloaded as soon as `build-index` replaces it.
+"""
+
+import json
+import os
+import signal
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, cast
+from ..console import error
+from ._daemon import Daemon, socket_path
+from ._fuzzy import FuzzyIndex
+from ._revisions import REVISION_CACHE_TTL, resolve_revisions
+from .add import find_hooks
+from .search import load_index
+
+INDEX_FILES = ("index.bin", "index.yaml")
+
+
+def index_stamp() -> Tuple[Optional[Tuple[int, int, int]], ...]:
+    """Changes whenever `build-index` writes a new index."""
+    cache_dir = Path.home() / ".pre-commit-hub"
+    stamps = []
+    for name in INDEX_FILES:
+        try:
+            stat = (cache_dir / name).stat()
+        except FileNotFoundError:
+            stamps.append(None)
+        else:
+            stamps.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+class LoadedIndex:
+    """The index and the search structures built from it."""
+
+    def __init__(self) -> None:
+        self.stamp = index_stamp()
+        self.index_file = load_index()
+        self.fuzzy_index = cast(FuzzyIndex, self.index_file.fuzzy_index())
+
+    def search(self, query: str, limit: int) -> List[Tuple[dict, int]]:
+        return [
+            (self.index_file.document(hook_index), int(round(score)))
+            for hook_index, score in self.fuzzy_index.extract(query, limit)
+        ]
+
+    def lookup(self, query: str) -> List[Tuple[dict, dict]]:
+        return [
+            (hook.model_dump(), repo.model_dump())
+            for hook, repo in find_hooks(self.index_file, query)
+        ]
+
+
+class IndexService:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loaded: Optional[LoadedIndex] = None
+
+    def index(self) -> LoadedIndex:
+        with self._lock:
+            if self._loaded is None or self._loaded.stamp != index_stamp():
+                self._loaded = LoadedIndex()
+            return self._loaded
+
+    def handle(self, message: Dict[str, Any]) -> Any:
+        command = message.get("command")
+        if command == "ping":
+            return "pong"
+        elif command == "search":
+            return self.index().search(message["query"], message.get("limit", 5))
+        elif command == "lookup":
+            return self.index().lookup(message["query"])
+        elif command == "resolve":
+            return resolve_revisions(
+                message["repositories"], message.get("ttl", REVISION_CACHE_TTL)
+            )
+        raise ValueError(f"Unknown command: {command}")
+
+
+def make_server(path: Path, service: IndexService) -> socketserver.BaseServer:
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self) -> None:
+            # Connections are kept open for as many requests as the client
+            # sends, so an editor can reuse one for the whole session.
+            for line in self.rfile:
+                try:
+                    response = {"result": service.handle(json.loads(line))}
+                except Exception as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+                self.wfile.flush()
+
+    server = socketserver.ThreadingUnixStreamServer(str(path), Handler)
+    server.daemon_threads = True
+    os.chmod(path, 0o600)
+    return server
+
+
+def serve(path: Optional[str] = None) -> int:
+    socket_file = Path(path) if path else socket_path()
+
+    running = Daemon.connect(socket_file)
+    if running is not None:
+        running.close()
+        error(f"A server is already listening on {socket_file}")
+        return 1
+    # Left behind by a server that didn't shut down cleanly.
+    socket_file.unlink(missing_ok=True)
+
+    service = IndexService()
+    service.index()
+    server = make_server(socket_file, service)
+    print(f"Serving on {socket_file}")
+    # Exit through the `finally` below on `kill` too, so the socket is removed.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        socket_file.unlink(missing_ok=True)
+    return 0
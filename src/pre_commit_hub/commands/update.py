@@ -0,0 +1,66 @@
+import re
+from typing import Dict, Optional
+from ..console import error
+from ._config import ConfigTransaction
+from ._git import find_config_file
+from ._revisions import MAX_WORKERS, resolve_latest_revisions
+
+GITHUB_URL = re.compile(r"^https?://github\.com/([^/]+/[^/]+?)(?:\.git)?/?$")
+
+
+def github_repositories(config: dict) -> Dict[str, str]:
+    """The GitHub repositories in the config, by the URL their entry uses."""
+    repositories = {}
+    for entry in config.get("repos") or []:
+        match = GITHUB_URL.match(str(entry.get("repo", "")))
+        if match:
+            repositories[entry["repo"]] = match.group(1)
+    return repositories
+
+
+def update_repos(
+    config_file: Optional[str] = None,
+    dry_run: bool = False,
+    timeout: Optional[float] = None,
+    jobs: int = MAX_WORKERS,
+) -> int:
+    """
+    Pin every GitHub repository in the config to its latest revision. The
+    revisions are resolved concurrently and written with a single rewrite.
+    """
+    config_path = find_config_file(config_file)
+    if not config_path.exists():
+        error(f"Config file {config_path} not found.")
+        return 1
+
+    transaction = ConfigTransaction(config_path)
+    repositories = github_repositories(transaction.config)
+    if not repositories:
+        print("No GitHub repositories in config")
+        return 0
+
+    current = {
+        entry.get("repo"): entry.get("rev") for entry in transaction.config["repos"]
+    }
+    latest = resolve_latest_revisions(list(repositories.values()), timeout, jobs)
+
+    exit_code = 0
+    revisions = {}
+    for repo_url, repository in repositories.items():
+        revision = latest[repository]
+        if isinstance(revision, Exception):
+            error(f"Couldn't resolve the latest revision of {repository}: {revision}")
+            exit_code = 1
+        elif str(current[repo_url]) != revision:
+            print(f"Updating {repository}: {current[repo_url]} -> {revision}")
+            revisions[repo_url] = revision
+        else:
+            print(f"{repository} is already up to date")
+
+    if dry_run:
+        if revisions:
+            print("Dry run, config not written")
+    else:
+        transaction.set_revisions(revisions)
+        transaction.commit()
+    return exit_code
@@ -1,10 +1,15 @@
-from rich import print as rprint
+# rich is imported when a message is printed rather than at import time, since
+# most runs never print one and importing it is a noticeable part of startup.
 
 
 def error(message: str) -> None:
     """Print an error message in red."""
+    from rich import print as rprint
+
     rprint(f"[bold red]error:[/bold red] {message}")
 
 
 def warning(message: str) -> None:
+    from rich import print as rprint
+
     rprint(f"[yellow]warning:[/yellow] {message}")
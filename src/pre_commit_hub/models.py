@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -12,7 +12,70 @@ class Repository(BaseModel):
     repository: str
     stars: int
     hooks: List[Hook]
+    # The revision `add` pins to, the commit it points at and when (as a Unix
+    # timestamp) `build-index` resolved it.
+    revision: Optional[str] = None
+    revision_commit: Optional[str] = None
+    revision_resolved_at: Optional[float] = None
 
 
 class SearchIndex(BaseModel):
     repositories: List[Repository]
+
+
+class RepositoryState(BaseModel):
+    """Validators from the last fetch of a repository, used for conditional
+    requests when refreshing the index."""
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    hooks_etag: Optional[str] = None
+    hooks_last_modified: Optional[str] = None
+    hooks_sha: Optional[str] = None
+
+
+class IndexState(BaseModel):
+    repositories: Dict[str, RepositoryState] = {}
+    # Repositories the build that wrote the index couldn't fetch. The index
+    # has their entries from the index before it, if it had them.
+    missing: List[str] = []
+
+
+class BuildJournalEntry(BaseModel):
+    """The result of fetching one repository during `build-index`: its entry
+    (`None` if it has no hooks) and state, or the error fetching it failed
+    with."""
+
+    repository: str
+    data: Optional[Repository] = None
+    state: Optional[RepositoryState] = None
+    revision: Optional[str] = None
+    error: Optional[str] = None
+
+
+class CachedRevision(BaseModel):
+    revision: str
+    resolved_at: float
+
+
+class RevisionCache(BaseModel):
+    repositories: Dict[str, CachedRevision] = {}
+
+
+class ShardInfo(BaseModel):
+    path: str
+    sha256: str
+    size: int
+
+
+class IndexManifest(BaseModel):
+    """Describes a published index, see `_shards.publish_index`."""
+
+    version: int
+    created_at: float
+    shards: List[ShardInfo]
+    # The index's order, which shards don't keep.
+    repositories: List[str]
+    # When the repositories' revisions were resolved, which shards don't keep
+    # either: every build resolves them again.
+    revisions_resolved_at: Optional[float] = None
@@ -0,0 +1,146 @@
+"""
+Timing of named phases of a run, enabled with `--profile` or the
+`PRE_COMMIT_HUB_TRACE` environment variable.
+
+At the end of a traced run a summary of the time spent in each phase, and of
+the counters (e.g. HTTP requests and bytes), is printed to stderr. The phases
+can also be written as a Chrome trace (`--trace FILE`, or a file name as the
+value of `PRE_COMMIT_HUB_TRACE`), which `chrome://tracing` and Perfetto open.
+
+When tracing is off, `phase` and `count` do nothing but check a flag.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_enabled = False
+_events: List[Dict[str, Any]] = []
+_counters: Counter = Counter()
+# Counters are bumped by e.g. `build-index`'s fetch workers.
+_counters_lock = threading.Lock()
+_start = time.perf_counter()
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    global _enabled
+    _enabled = False
+    _events.clear()
+    with _counters_lock:
+        _counters.clear()
+
+
+@contextmanager
+def phase(name: str, **args: Any) -> Iterator[None]:
+    """Time the body as a phase called `name`; `args` end up in the trace."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _events.append(
+            {
+                "name": name,
+                "start": start - _start,
+                "duration": time.perf_counter() - start,
+                "thread": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator timing every call of the function as a phase."""
+
+    def decorator(function: F) -> F:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
+
+
+def count(name: str, value: int = 1) -> None:
+    if _enabled:
+        with _counters_lock:
+            _counters[name] += value
+
+
+def summary() -> List[List[str]]:
+    """Rows of phase name, calls, total and longest duration, and counters."""
+    totals: Dict[str, List[float]] = {}
+    for event in _events:
+        totals.setdefault(event["name"], []).append(event["duration"])
+    rows = [
+        [
+            name,
+            str(len(durations)),
+            f"{sum(durations) * 1000:.1f}",
+            f"{max(durations) * 1000:.1f}",
+        ]
+        for name, durations in sorted(totals.items(), key=lambda item: -sum(item[1]))
+    ]
+    rows.extend([name, str(value), "", ""] for name, value in sorted(_counters.items()))
+    return rows
+
+
+def print_summary() -> None:
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table("phase", title="Profile")
+    for column in ("calls", "total ms", "max ms"):
+        table.add_column(column, justify="right")
+    for row in summary():
+        table.add_row(*row)
+    # On stderr, so it doesn't mix with e.g. `search --json` output.
+    Console(stderr=True).print(table)
+
+
+def write_chrome_trace(path: Path) -> None:
+    pid = os.getpid()
+    events = [
+        {
+            "name": event["name"],
+            "ph": "X",
+            "ts": event["start"] * 1e6,
+            "dur": event["duration"] * 1e6,
+            "pid": pid,
+            "tid": event["thread"],
+            "args": event["args"],
+        }
+        for event in _events
+    ]
+    end = max((event["ts"] + event["dur"] for event in events), default=0)
+    events.extend(
+        {"name": name, "ph": "C", "ts": end, "pid": pid, "args": {name: value}}
+        for name, value in _counters.items()
+    )
+    path.write_text(json.dumps({"traceEvents": events}))
+
+
+def trace_file_from_env() -> Optional[str]:
+    value = os.environ.get("PRE_COMMIT_HUB_TRACE", "")
+    return None if value in ("", "0", "1") else value
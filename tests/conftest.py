@@ -0,0 +1,26 @@
+import pytest
+from pre_commit_hub.models import Hook, Repository, SearchIndex
+
+
+@pytest.fixture
+def sample_search_index():
+    return SearchIndex(
+        repositories=[
+            Repository(
+                repository="user1/project1",
+                stars=100,
+                hooks=[
+                    Hook(id="hook1", name="Hook 1", description="Description 1"),
+                    Hook(id="hook2", name="Hook 2", description="Description 2"),
+                ],
+            ),
+            Repository(
+                repository="user2/project2",
+                stars=200,
+                hooks=[
+                    Hook(id="hook1", name="Hook 1", description="Description 1"),
+                    Hook(id="hook3", name="Hook 3", description="Description 3"),
+                ],
+            ),
+        ]
+    )
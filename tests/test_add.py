@@ -1,31 +1,16 @@
 import pytest
 import yaml
+from pre_commit_hub.commands import _config, add
 from pre_commit_hub.commands.add import find_hooks, modify_yaml_config
-from pre_commit_hub.models import SearchIndex, Repository, Hook
-
-
-@pytest.fixture
-def sample_search_index():
-    return SearchIndex(
-        repositories=[
-            Repository(
-                repository="user1/project1",
-                stars=100,
-                hooks=[
-                    Hook(id="hook1", name="Hook 1", description="Description 1"),
-                    Hook(id="hook2", name="Hook 2", description="Description 2"),
-                ],
-            ),
-            Repository(
-                repository="user2/project2",
-                stars=200,
-                hooks=[
-                    Hook(id="hook1", name="Hook 1", description="Description 1"),
-                    Hook(id="hook3", name="Hook 3", description="Description 3"),
-                ],
-            ),
-        ]
-    )
+from pre_commit_hub.commands._daemon import Daemon, DaemonError
+from pre_commit_hub.commands._index_file import IndexFile, write_index
+from pre_commit_hub.models import Hook, Repository
+
+
+@pytest.fixture(autouse=True)
+def home(monkeypatch, tmp_path):
+    # Keeps a server the developer is running from answering `add_hooks`.
+    monkeypatch.setenv("HOME", str(tmp_path))
 
 
 def test_find_hooks_by_id(sample_search_index):
@@ -61,6 +46,28 @@ def test_find_hooks_invalid_query(sample_search_index):
     assert len(results) == 0
 
 
+@pytest.mark.parametrize(
+    "query",
+    [
+        "hook1",
+        "hook3",
+        "project1:hook1",
+        "user2/project2:hook3",
+        "user1:project1:hook2",
+        "user1:project2:hook1",
+        "project:hook1",
+        "nonexistent",
+        "invalid:query:format",
+        "too:many:parts:here",
+    ],
+)
+def test_find_hooks_index_file_matches_scan(sample_search_index, tmp_path, query):
+    write_index(tmp_path / "index.bin", sample_search_index)
+    index_file = IndexFile(tmp_path / "index.bin")
+
+    assert find_hooks(index_file, query) == find_hooks(sample_search_index, query)
+
+
 def test_modify_yaml_config_empty():
     yaml_content = ""
     hook = Hook(id="test-hook", name="Test Hook", description="A test hook")
@@ -167,3 +174,188 @@ def test_modify_yaml_config_new_repo():
     }
 
     assert yaml.safe_load(result) == expected
+
+
+def test_add_hooks_batch(tmp_path, capsys, monkeypatch, sample_search_index):
+    config_path = tmp_path / ".pre-commit-config.yaml"
+    config_path.write_text(
+        yaml.dump(
+            {
+                "repos": [
+                    {
+                        "repo": "https://github.com/user1/project1",
+                        "rev": "v1.0.0",
+                        "hooks": [{"id": "hook2"}],
+                    }
+                ]
+            }
+        )
+    )
+    monkeypatch.setattr(add, "load_hook_index", lambda: sample_search_index)
+    revisions = []
+    monkeypatch.setattr(
+        add,
+        "resolve_revisions",
+        lambda repos, ttl: (
+            revisions.extend(repos) or {repo: "v2.0.0" for repo in repos}
+        ),
+    )
+    writes = []
+    write_atomic = _config.write_atomic
+    monkeypatch.setattr(
+        _config,
+        "write_atomic",
+        lambda path, content: writes.append(path) or write_atomic(path, content),
+    )
+
+    assert (
+        add.add_hooks(
+            ["project1:hook1", "hook2", "hook3", "hook1", "missing"], str(config_path)
+        )
+        == 1
+    )
+
+    assert capsys.readouterr().out.splitlines()[-3:] == [
+        "Added hook 'hook1' from 'user1/project1' to config",
+        "Hook 'hook2' from 'user1/project1' is already in config",
+        "Added hook 'hook3' from 'user2/project2' to config",
+    ]
+    assert revisions == ["user2/project2"]
+    assert len(writes) == 1
+    assert yaml.safe_load(config_path.read_text()) == {
+        "repos": [
+            {
+                "repo": "https://github.com/user1/project1",
+                "rev": "v1.0.0",
+                "hooks": [{"id": "hook2"}, {"id": "hook1"}],
+            },
+            {
+                "repo": "https://github.com/user2/project2",
+                "rev": "v2.0.0",
+                "hooks": [{"id": "hook3"}],
+            },
+        ]
+    }
+
+
+def test_add_hooks_many_configs(tmp_path, capsys, monkeypatch, sample_search_index):
+    pinned = (
+        "repos:\n"
+        "- repo: https://github.com/user2/project2\n"
+        "  rev: v1.0.0\n"
+        "  hooks:\n"
+        "  - id: hook1\n"
+    )
+    for name, content in [("a", "repos: []\n"), ("b", pinned), ("c", "repos: []\n")]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / ".pre-commit-config.yaml").write_text(content)
+    monkeypatch.setattr(add, "load_hook_index", lambda: sample_search_index)
+    revisions = []
+    monkeypatch.setattr(
+        add,
+        "resolve_revisions",
+        lambda repos, ttl: (
+            revisions.append(repos) or {repo: "v2.0.0" for repo in repos}
+        ),
+    )
+
+    assert add.add_hooks(["hook3"], [str(tmp_path / "[ab]"), str(tmp_path / "c")]) == 0
+
+    assert revisions == [["user2/project2"]]
+    assert capsys.readouterr().out.splitlines() == [
+        "Changed 3 of 3 configs",
+        f"  {tmp_path / 'a' / '.pre-commit-config.yaml'}",
+        f"  {tmp_path / 'b' / '.pre-commit-config.yaml'}",
+        f"  {tmp_path / 'c' / '.pre-commit-config.yaml'}",
+    ]
+    assert (tmp_path / "b" / ".pre-commit-config.yaml").read_text() == (
+        pinned + "  - id: hook3\n"
+    )
+    assert yaml.safe_load((tmp_path / "a" / ".pre-commit-config.yaml").read_text()) == {
+        "repos": [
+            {
+                "repo": "https://github.com/user2/project2",
+                "rev": "v2.0.0",
+                "hooks": [{"id": "hook3"}],
+            }
+        ]
+    }
+
+
+@pytest.mark.parametrize(
+    "fresh, resolved_ago, expected",
+    [(False, 60, "v1.0.0"), (True, 60, "v2.0.0"), (False, 8 * 24 * 60 * 60, "v2.0.0")],
+)
+def test_add_hooks_uses_stored_revision(
+    tmp_path, monkeypatch, sample_search_index, fresh, resolved_ago, expected
+):
+    config_path = tmp_path / ".pre-commit-config.yaml"
+    config_path.write_text("repos: []\n")
+    repository = sample_search_index.repositories[1]
+    repository.revision = "v1.0.0"
+    repository.revision_resolved_at = add.time.time() - resolved_ago
+    monkeypatch.setattr(add, "load_hook_index", lambda: sample_search_index)
+    resolved = []
+    monkeypatch.setattr(
+        add,
+        "resolve_revisions",
+        lambda repos, ttl: resolved.append(ttl) or {repo: "v2.0.0" for repo in repos},
+    )
+
+    assert add.add_hooks(["hook3"], str(config_path), fresh=fresh) == 0
+
+    assert resolved == ([] if expected == "v1.0.0" else [0 if fresh else 3600])
+    assert yaml.safe_load(config_path.read_text())["repos"][0]["rev"] == expected
+
+
+def test_add_hooks_offline_uses_stale_revision(
+    tmp_path, capsys, monkeypatch, sample_search_index
+):
+    config_path = tmp_path / ".pre-commit-config.yaml"
+    config_path.write_text("repos: []\n")
+    repository = sample_search_index.repositories[1]
+    repository.revision = "v1.0.0"
+    repository.revision_resolved_at = 0
+    monkeypatch.setattr(add, "load_hook_index", lambda: sample_search_index)
+
+    def resolve_revisions(repos, ttl):
+        raise OSError("Network is unreachable")
+
+    monkeypatch.setattr(add, "resolve_revisions", resolve_revisions)
+
+    assert add.add_hooks(["hook3"], str(config_path)) == 0
+
+    assert "Couldn't resolve the latest revisions" in capsys.readouterr().out
+    assert yaml.safe_load(config_path.read_text())["repos"][0]["rev"] == "v1.0.0"
+
+
+def test_add_hooks_server_lost_reports_once(
+    tmp_path, capsys, monkeypatch, sample_search_index
+):
+    class LostDaemon(Daemon):
+        """Answers the first lookup, then goes away."""
+
+        def __init__(self):
+            self.answered = False
+
+        def request(self, command, **params):
+            if self.answered:
+                raise DaemonError("The server closed the connection")
+            self.answered = True
+            return []
+
+        def close(self):
+            pass
+
+    config_path = tmp_path / ".pre-commit-config.yaml"
+    config_path.write_text("repos: []\n")
+    monkeypatch.setattr(add.Daemon, "connect", lambda: LostDaemon())
+    monkeypatch.setattr(add, "load_hook_index", lambda: sample_search_index)
+    monkeypatch.setattr(
+        add, "resolve_revisions", lambda repos, ttl: {repo: "v2.0.0" for repo in repos}
+    )
+
+    assert add.add_hooks(["missing", "hook3"], str(config_path)) == 1
+
+    assert capsys.readouterr().out.count("No hooks found") == 1
+    assert yaml.safe_load(config_path.read_text())["repos"][0]["rev"] == "v2.0.0"
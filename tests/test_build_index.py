@@ -0,0 +1,477 @@
+import base64
+import hashlib
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import pytest
+import yaml
+from pre_commit_hub.commands._github import rate_limit, reset_github
+from pre_commit_hub.commands import _hook_files, _revisions, build_index
+from pre_commit_hub.commands.search import load_cache
+from pre_commit_hub.models import Hook, Repository, SearchIndex
+
+
+class FakeGitHub:
+    """A tiny stand-in for the GitHub REST API serving a fixed set of repos."""
+
+    def __init__(self, repos):
+        self.repos = repos
+        self.requests = Counter()
+        self.not_modified = Counter()
+        self.graphql_failures = set()
+        self.blobs = Counter()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                fake.requests[path] = fake.requests[path] + 1
+                status, body = fake.respond(path)
+                payload = json.dumps(body).encode()
+                etag = f'"{hashlib.sha1(payload).hexdigest()}"'
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    fake.not_modified[path] = fake.not_modified[path] + 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                fake.requests[self.path] = fake.requests[self.path] + 1
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                payload = json.dumps(
+                    fake.respond_graphql(body["query"], body["variables"])
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path):
+        parts = path.strip("/").split("/")
+        if len(parts) < 3 or parts[0] != "repos":
+            return 404, {"message": "Not Found"}
+        name = f"{parts[1]}/{parts[2]}"
+        if name not in self.repos:
+            return 404, {"message": "Not Found"}
+        repo = self.repos[name]
+        repo_url = f"{self.url}/repos/{name}"
+
+        if len(parts) == 3:
+            return 200, {
+                "url": repo_url,
+                "full_name": name,
+                "stargazers_count": repo["stars"],
+                "description": None,
+                "homepage": None,
+            }
+        if parts[3:] == ["contents", ".pre-commit-hooks.yaml"]:
+            content = yaml.dump(repo["hooks"]).encode()
+            return 200, {
+                "type": "file",
+                "encoding": "base64",
+                "url": f"{repo_url}/contents/.pre-commit-hooks.yaml",
+                "path": ".pre-commit-hooks.yaml",
+                "sha": repo.get("sha", "0" * 40),
+                "content": base64.b64encode(content).decode(),
+            }
+        if parts[3:] == ["tags"]:
+            return 200, [
+                {"name": tag, "commit": {"sha": commit, "url": f"{repo_url}/commits"}}
+                for tag, commit in repo.get("tags", [])
+            ]
+        if parts[3:] == ["commits"]:
+            return 200, [{"sha": "c" * 40, "url": f"{repo_url}/commits/{'c' * 40}"}]
+        return 404, {"message": "Not Found"}
+
+    def respond_graphql(self, query, variables):
+        blobs = "object(oid:" in query
+        alias = "b" if blobs else "r"
+        data, errors = {}, []
+        for i in range(sum(key.startswith("owner") for key in variables)):
+            name = f"{variables[f'owner{i}']}/{variables[f'name{i}']}"
+            if name not in self.repos or name in self.graphql_failures:
+                data[f"{alias}{i}"] = None
+                errors.append({"type": "NOT_FOUND", "path": [f"{alias}{i}"]})
+                continue
+            repo = self.repos[name]
+            if blobs:
+                self.blobs[variables[f"oid{i}"]] += 1
+                data[f"b{i}"] = {
+                    "object": {"text": yaml.dump(repo["hooks"]), "isTruncated": False}
+                }
+                continue
+            data[f"r{i}"] = {
+                "stargazerCount": repo["stars"],
+                "description": None,
+                "homepageUrl": None,
+                "hooksFile": {"oid": repo.get("sha", "0" * 40)},
+                "defaultBranchRef": {"target": {"oid": "c" * 40}},
+                "tags": {
+                    "nodes": [
+                        {"name": tag, "target": {"oid": commit}}
+                        for tag, commit in repo.get("tags", [])
+                    ]
+                },
+            }
+        return {"data": data, "errors": errors} if errors else {"data": data}
+
+    def __enter__(self):
+        threading.Thread(
+            target=self.server.serve_forever, args=(0.01,), daemon=True
+        ).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_fake_repos():
+    return {
+        f"user{i}/project{i}": {
+            "stars": i * 10,
+            "hooks": [
+                {
+                    "id": f"hook{i}",
+                    "name": f"Hook {i}",
+                    "description": f"Hook number {i}",
+                },
+                {"id": "shared", "name": "Shared"},
+            ],
+            "sha": f"{i:040d}",
+            "tags": [("latest", "a" * 40), ("v1.0.0", "a" * 40)] if i % 2 else [],
+        }
+        for i in range(12)
+    }
+
+
+FAKE_REPOS = make_fake_repos()
+
+BUILT_AT = 1_700_000_000.0
+
+
+def load_journal():
+    return {entry.repository: entry for _, entry in build_index.read_journal()}
+
+
+@pytest.fixture
+def fake_github(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(build_index, "load_repositories", lambda: list(FAKE_REPOS))
+    # Builds record when they resolved revisions, which would otherwise make
+    # the indexes of any two builds differ.
+    monkeypatch.setattr(build_index, "time", SimpleNamespace(time=lambda: BUILT_AT))
+    with FakeGitHub(make_fake_repos()) as fake:
+        monkeypatch.setenv("GITHUB_API_URL", fake.url)
+        monkeypatch.setenv("PRE_COMMIT_HUB_REQUESTS_PER_SECOND", "10000")
+        reset_github()
+        yield fake
+    reset_github()
+
+
+@pytest.mark.parametrize("jobs", [1, 4])
+def test_build_cache_matches_repositories_order(fake_github, jobs):
+    assert build_index.build_cache(jobs) == 0
+
+    search_index = load_cache()
+    assert [repo.repository for repo in search_index.repositories] == list(FAKE_REPOS)
+    assert search_index.repositories[3].stars == 30
+    assert [hook.id for hook in search_index.repositories[3].hooks] == [
+        "hook3",
+        "shared",
+    ]
+
+
+def test_build_cache_fetches_each_repo_once(fake_github):
+    build_index.build_cache(8)
+
+    for name in FAKE_REPOS:
+        assert fake_github.requests[f"/repos/{name}"] == 1
+        assert (
+            fake_github.requests[f"/repos/{name}/contents/.pre-commit-hooks.yaml"] == 1
+        )
+
+
+def test_build_cache_concurrent_matches_serial(fake_github, tmp_path):
+    build_index.build_cache(1)
+    serial = load_cache()
+    build_index.build_cache(8)
+    assert load_cache() == serial
+
+
+def test_build_cache_missing_repo_is_recorded(fake_github, monkeypatch, capsys):
+    monkeypatch.setattr(
+        build_index, "load_repositories", lambda: [*FAKE_REPOS, "missing/repo"]
+    )
+    assert build_index.build_cache(4) == 1
+
+    assert "missing/repo: Got error fetching repo info for missing/repo" in (
+        capsys.readouterr().out
+    )
+    # The partial index is usable, and records what it's missing.
+    assert [repo.repository for repo in load_cache().repositories] == list(FAKE_REPOS)
+    assert build_index.load_state().missing == ["missing/repo"]
+    journal = load_journal()
+    assert journal["missing/repo"].error is not None
+    assert all(journal[repo].error is None for repo in FAKE_REPOS)
+
+
+def test_resume_only_fetches_failed_repos(fake_github, monkeypatch):
+    build_index.build_cache(4)
+    uninterrupted = load_cache()
+    fake_github.requests.clear()
+
+    monkeypatch.setattr(
+        build_index, "load_repositories", lambda: [*FAKE_REPOS, "user0/late"]
+    )
+    assert build_index.build_cache(4) == 1
+    fake_github.repos["user0/late"] = fake_github.repos["user0/project0"]
+    fake_github.requests.clear()
+
+    assert build_index.build_cache(4, resume=True) == 0
+    assert fake_github.requests == {
+        "/repos/user0/late": 1,
+        "/repos/user0/late/contents/.pre-commit-hooks.yaml": 1,
+        "/repos/user0/late/tags": 1,
+        "/repos/user0/late/commits": 1,
+    }
+    resumed = load_cache().repositories
+    assert [repo.repository for repo in resumed] == [*FAKE_REPOS, "user0/late"]
+    assert resumed[:-1] == uninterrupted.repositories
+    assert not build_index.journal_path().exists()
+
+
+def test_failed_build_keeps_previous_entries(fake_github):
+    build_index.build_cache(4)
+    full = load_cache()
+    del fake_github.repos["user1/project1"]
+    fake_github.repos["user2/project2"]["stars"] = 1000
+
+    assert build_index.build_cache(4) == 1
+    partial = load_cache()
+    assert partial.repositories[1] == full.repositories[1]
+    assert partial.repositories[2].stars == 1000
+    state = build_index.load_state()
+    assert state.missing == ["user1/project1"]
+    assert "user1/project1" in state.repositories
+
+    fake_github.repos["user1/project1"] = FAKE_REPOS["user1/project1"]
+    fake_github.requests.clear()
+    assert build_index.build_cache(4, resume=True) == 0
+    assert {"/".join(path.split("/")[2:4]) for path in fake_github.requests} == {
+        "user1/project1"
+    }
+    assert build_index.load_state().missing == []
+
+
+def test_resume_after_crash(fake_github, monkeypatch):
+    build_index.build_cache(1)
+    uninterrupted = load_cache()
+
+    # A build killed after fetching a few repositories, mid-way through
+    # writing the journal entry of the next one.
+    lines = [
+        build_index.BuildJournalEntry(
+            repository=repo.repository,
+            data=repo,
+            state=build_index.load_state().repositories[repo.repository],
+        ).model_dump_json()
+        for repo in uninterrupted.repositories[:4]
+    ]
+    lines.append(lines[0][:20])
+    build_index.journal_path().write_text("\n".join(lines))
+    fake_github.requests.clear()
+
+    assert build_index.build_cache(4, resume=True) == 0
+    assert load_cache() == uninterrupted
+    assert {"/".join(path.split("/")[2:4]) for path in fake_github.requests} == set(
+        list(FAKE_REPOS)[4:]
+    )
+
+
+def test_resume_after_crash_records_every_entry(fake_github, monkeypatch):
+    # Killed mid-way through writing the first entry.
+    build_index.journal_path().parent.mkdir(parents=True)
+    build_index.journal_path().write_text('{"repository": "user0/pro')
+    monkeypatch.setattr(
+        build_index, "load_repositories", lambda: [*FAKE_REPOS, "missing/repo"]
+    )
+
+    assert build_index.build_cache(1, resume=True) == 1
+
+    journal = load_journal()
+    assert all(journal[repo].error is None for repo in FAKE_REPOS)
+    assert journal["missing/repo"].error is not None
+
+
+def test_incremental_build_unchanged(fake_github):
+    build_index.build_cache(4)
+    full = load_cache()
+    fake_github.requests.clear()
+
+    build_index.build_cache(4, incremental=True)
+
+    assert load_cache() == full
+    assert fake_github.not_modified == fake_github.requests
+    assert sum(fake_github.requests.values()) == 2 * len(FAKE_REPOS)
+
+
+def test_incremental_build_merges_changed_repos(fake_github):
+    build_index.build_cache(4)
+    fake_github.repos["user1/project1"]["stars"] = 1000
+    fake_github.repos["user2/project2"]["hooks"] = [{"id": "new", "name": "New"}]
+    fake_github.repos["user2/project2"]["sha"] = "f" * 40
+
+    build_index.build_cache(4, incremental=True)
+
+    repositories = load_cache().repositories
+    assert repositories[1].stars == 1000
+    assert [hook.id for hook in repositories[2].hooks] == ["new"]
+    assert repositories[3].hooks[0].id == "hook3"
+    assert build_index.load_state().repositories["user2/project2"].hooks_sha == (
+        "f" * 40
+    )
+
+
+def test_incremental_build_without_cache_does_full_build(fake_github):
+    build_index.build_cache(4, incremental=True)
+
+    assert len(load_cache().repositories) == len(FAKE_REPOS)
+    assert not fake_github.not_modified
+
+
+def test_build_cache_requests_go_through_scheduler(fake_github):
+    assert build_index.build_cache(4) == 0
+    assert rate_limit().requests == sum(fake_github.requests.values())
+
+
+def test_graphql_build_matches_rest(fake_github, tmp_path):
+    build_index.build_cache()
+    rest_index = (tmp_path / ".pre-commit-hub" / "index.yaml").read_text()
+    fake_github.requests.clear()
+
+    assert build_index.build_cache(graphql=True) == 0
+    assert (tmp_path / ".pre-commit-hub" / "index.yaml").read_text() == rest_index
+    assert fake_github.requests == {"/graphql": 1}
+
+
+def test_graphql_build_caches_revisions(fake_github):
+    build_index.build_cache(graphql=True)
+    revisions = _revisions.load_revision_cache().repositories
+    assert revisions["user1/project1"].revision == "v1.0.0"
+    assert revisions["user2/project2"].revision == "c" * 40
+
+
+def test_graphql_build_falls_back_to_rest(fake_github, monkeypatch):
+    fake_github.graphql_failures.add("user3/project3")
+    monkeypatch.setattr(build_index, "BATCH_SIZE", 5)
+    assert build_index.build_cache(graphql=True, jobs=2) == 0
+    # A repository query and a query for its new hooks files per batch.
+    assert fake_github.requests["/graphql"] == 6
+    assert fake_github.requests["/repos/user3/project3"] == 1
+    assert fake_github.requests["/repos/user3/project3/tags"] == 1
+    assert sum(fake_github.requests.values()) == 9
+    assert [repo.repository for repo in load_cache().repositories] == list(FAKE_REPOS)
+
+
+def test_graphql_build_downloads_new_hook_files_only(fake_github):
+    assert build_index.build_cache(graphql=True) == 0
+    assert fake_github.requests == {"/graphql": 2}
+    assert fake_github.blobs == {repo["sha"]: 1 for repo in FAKE_REPOS.values()}
+    fake_github.requests.clear()
+    fake_github.blobs.clear()
+
+    fake_github.repos["user2/project2"]["hooks"] = [{"id": "new", "name": "New"}]
+    fake_github.repos["user2/project2"]["sha"] = "f" * 40
+    assert build_index.build_cache(graphql=True) == 0
+    assert fake_github.requests == {"/graphql": 2}
+    assert fake_github.blobs == {"f" * 40: 1}
+    assert [hook.id for hook in load_cache().repositories[2].hooks] == ["new"]
+
+
+def test_rebuild_publishes_same_shards(fake_github, monkeypatch, tmp_path):
+    monkeypatch.setattr(build_index, "time", time)
+    published = tmp_path / "published"
+    assert build_index.build_cache(publish=str(published)) == 0
+    first = json.loads((published / "manifest.json").read_text())
+    assert build_index.build_cache(publish=str(published)) == 0
+    second = json.loads((published / "manifest.json").read_text())
+
+    assert second["shards"] == first["shards"]
+    assert second["revisions_resolved_at"] > first["revisions_resolved_at"]
+
+
+@pytest.mark.parametrize("graphql", [False, True])
+def test_build_cache_stores_revisions(fake_github, graphql):
+    build_index.build_cache(graphql=graphql)
+
+    repositories = load_cache().repositories
+    assert repositories[1].revision == "v1.0.0"
+    assert repositories[1].revision_commit == "a" * 40
+    assert repositories[2].revision == repositories[2].revision_commit == "c" * 40
+    assert repositories[2].revision_resolved_at == BUILT_AT
+
+
+@pytest.mark.parametrize("repo_count", [0, 3])
+def test_save_to_cache_yaml_loads_back(tmp_path, monkeypatch, repo_count):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    search_index = SearchIndex(
+        repositories=[
+            Repository(
+                repository=f"user/repo{i}",
+                stars=i,
+                hooks=[
+                    Hook(id="hook", name="Hook: 'quoted'\nüñí", description=None),
+                    Hook(id="long", name="Lông ñame " * 20, description="ü\n" * 30),
+                ],
+            )
+            for i in range(repo_count)
+        ]
+    )
+
+    build_index.save_to_cache(search_index)
+
+    text = (tmp_path / ".pre-commit-hub" / "index.yaml").read_text()
+    assert yaml.safe_load(text) == search_index.model_dump()
+
+
+def test_build_cache_parses_each_hook_file_once(fake_github, monkeypatch):
+    # A fork publishing the same file as the repository it was forked from.
+    fake_github.repos["user1/project1"]["hooks"] = FAKE_REPOS["user0/project0"]["hooks"]
+    fake_github.repos["user1/project1"]["sha"] = FAKE_REPOS["user0/project0"]["sha"]
+    parsed = []
+    parse_hooks_text = _hook_files.parse_hooks_text
+    monkeypatch.setattr(
+        _hook_files,
+        "parse_hooks_text",
+        lambda text: parsed.append(text) or parse_hooks_text(text),
+    )
+
+    assert build_index.build_cache() == 0
+    index = load_cache()
+    assert len(parsed) == len(FAKE_REPOS) - 1
+    assert index.repositories[1].hooks == index.repositories[0].hooks
+
+    assert build_index.build_cache() == 0
+    assert len(parsed) == len(FAKE_REPOS) - 1
+    assert load_cache() == index
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+import pytest
+
+CHECK_IMPORTS = """
+import sys
+from pre_commit_hub.cli import main
+try:
+    main()
+except SystemExit:
+    pass
+print(",".join(sorted(sys.modules)))
+"""
+
+HEAVY_MODULES = ["github", "requests", "thefuzz", "rapidfuzz", "pydantic", "rich"]
+
+
+def imported_modules(tmp_path, *args):
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK_IMPORTS, *args],
+        cwd=tmp_path,
+        env={"HOME": str(tmp_path), "PATH": ""},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = result.stdout.strip().splitlines()[-1].split(",")
+    return {module.split(".")[0] for module in modules}
+
+
+@pytest.mark.parametrize("args", [["--help"], ["remove", "black"]])
+def test_cli_does_not_import_unused_dependencies(tmp_path, args):
+    (tmp_path / ".pre-commit-hub").mkdir()
+    (tmp_path / ".pre-commit-hub" / "index.yaml").write_text("repositories: []\n")
+    (tmp_path / ".pre-commit-config.yaml").write_text(
+        "repos:\n- repo: local\n  hooks:\n  - id: black\n"
+    )
+    assert not imported_modules(tmp_path, *args) & set(HEAVY_MODULES)
@@ -0,0 +1,183 @@
+import os
+import pytest
+from pre_commit_hub.commands._config import (
+    ConfigEditor,
+    ConfigTransaction,
+    edit_configs,
+    write_atomic,
+)
+
+
+def test_write_atomic_keeps_mode(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("old")
+    os.chmod(path, 0o640)
+
+    write_atomic(path, "new")
+
+    assert path.read_text() == "new"
+    assert path.stat().st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["config.yaml"]
+
+
+def test_transaction_writes_only_when_changed(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text("repos: []  # Unchanged\n")
+
+    transaction = ConfigTransaction(path)
+    transaction.commit()
+    assert path.read_text() == "repos: []  # Unchanged\n"
+
+    transaction.add_hook("local", "check", None)
+    transaction.commit()
+    assert (
+        path.read_text()
+        == "repos:  # Unchanged\n- repo: local\n  hooks:\n  - id: check\n"
+    )
+
+
+def test_transaction_new_file(tmp_path):
+    transaction = ConfigTransaction(tmp_path / "config.yaml")
+    assert transaction.config == {"repos": []}
+
+
+CONFIG = """\
+# Formatting and linting.
+default_stages: [pre-commit]
+repos:
+  # The formatter.
+  - repo: https://github.com/psf/black
+    rev: 24.1.0   # Pinned for the CI image.
+    hooks:
+      - id: black
+        args: [--fast]
+
+  - repo: https://github.com/astral-sh/ruff-pre-commit
+    hooks:
+      - id: ruff
+      - id: ruff-format  # Replaces black eventually.
+# Trailing comment.
+"""
+
+
+def test_add_to_existing_repo_keeps_formatting():
+    editor = ConfigEditor(CONFIG)
+    assert editor.add_hook("https://github.com/psf/black", "black-jupyter", "25.0")
+    assert editor.text == CONFIG.replace(
+        "        args: [--fast]\n",
+        "        args: [--fast]\n      - id: black-jupyter\n",
+    )
+
+
+def test_add_pins_unpinned_repo():
+    editor = ConfigEditor(CONFIG)
+    url = "https://github.com/astral-sh/ruff-pre-commit"
+    assert editor.add_hook(url, "ruff-check", "v0.5.0")
+    assert editor.text == CONFIG.replace(
+        f"  - repo: {url}\n",
+        f"  - repo: {url}\n    rev: v0.5.0\n",
+    ).replace(
+        "      - id: ruff-format  # Replaces black eventually.\n",
+        "      - id: ruff-format  # Replaces black eventually.\n"
+        "      - id: ruff-check\n",
+    )
+
+
+def test_add_new_repo_matches_indentation():
+    editor = ConfigEditor(CONFIG)
+    assert editor.add_hook("https://github.com/a/b", "c", "1.10")
+    assert editor.text == CONFIG.replace(
+        "# Trailing comment.\n",
+        "  - repo: https://github.com/a/b\n"
+        "    rev: '1.10'\n"
+        "    hooks:\n"
+        "      - id: c\n"
+        "# Trailing comment.\n",
+    )
+    assert editor.config["repos"][-1] == {
+        "repo": "https://github.com/a/b",
+        "rev": "1.10",
+        "hooks": [{"id": "c"}],
+    }
+
+
+def test_add_existing_hook_is_unchanged():
+    editor = ConfigEditor(CONFIG)
+    assert not editor.add_hook("https://github.com/psf/black", "black", "25.0")
+    assert editor.text == CONFIG
+
+
+def test_add_to_empty_hooks():
+    editor = ConfigEditor("repos:\n- repo: local\n  hooks: []  # None yet.\n")
+    assert editor.add_hook("local", "check", None)
+    assert (
+        editor.text == "repos:\n- repo: local\n  hooks:  # None yet.\n  - id: check\n"
+    )
+
+
+def test_add_to_flow_style_falls_back():
+    editor = ConfigEditor("repos: [{repo: local, hooks: [{id: a}]}]\n")
+    assert editor.add_hook("local", "b", None)
+    assert editor.config == {
+        "repos": [{"repo": "local", "hooks": [{"id": "a"}, {"id": "b"}]}]
+    }
+
+
+def test_remove_keeps_formatting():
+    editor = ConfigEditor(CONFIG)
+    assert editor.remove_hook("ruff")
+    assert editor.text == CONFIG.replace("      - id: ruff\n", "")
+
+
+def test_remove_last_hook_drops_repo():
+    editor = ConfigEditor(CONFIG)
+    assert editor.remove_hook("black")
+    assert editor.text == CONFIG.replace(
+        "  - repo: https://github.com/psf/black\n"
+        "    rev: 24.1.0   # Pinned for the CI image.\n"
+        "    hooks:\n"
+        "      - id: black\n"
+        "        args: [--fast]\n",
+        "",
+    )
+
+
+def test_remove_every_repo():
+    editor = ConfigEditor("# Hooks.\nrepos:\n- repo: local\n  hooks:\n  - id: a\n")
+    assert editor.remove_hook("a")
+    assert editor.text == "# Hooks.\nrepos: []\n"
+    assert not editor.remove_hook("a")
+
+
+def test_set_revisions():
+    editor = ConfigEditor(CONFIG)
+    black = "https://github.com/psf/black"
+    ruff = "https://github.com/astral-sh/ruff-pre-commit"
+    assert editor.set_revisions({black: "24.1.0", ruff: "v0.5.0"})
+    assert editor.text == CONFIG.replace(
+        f"  - repo: {ruff}\n", f"  - repo: {ruff}\n    rev: v0.5.0\n"
+    )
+    assert not editor.set_revisions({black: "24.1.0", ruff: "v0.5.0"})
+
+
+@pytest.mark.parametrize(
+    "content",
+    ["- repo: local\n", "repos: 5\n", "repos:\n- 5\n", "repos:\n- hooks: check\n"],
+)
+def test_edit_configs_reports_malformed_config(tmp_path, content):
+    malformed = tmp_path / "malformed.yaml"
+    malformed.write_text(content)
+    paths = [tmp_path / f"{name}.yaml" for name in "ab"]
+    for path in paths:
+        path.write_text("repos: []\n")
+
+    results = edit_configs(
+        [paths[0], malformed, paths[1]],
+        lambda transaction: transaction.add_hook("local", "check", None),
+    )
+
+    assert [result.changed for result in results] == [True, False, True]
+    assert results[1].error is not None and "expected" in results[1].error
+    assert malformed.read_text() == content
+    for path in paths:
+        assert "id: check" in path.read_text()
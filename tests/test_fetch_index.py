@@ -0,0 +1,125 @@
+import functools
+import gzip
+import hashlib
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from pre_commit_hub.commands import _shards
+from pre_commit_hub.commands.fetch_index import fetch_index
+from pre_commit_hub.commands.search import load_cache
+from pre_commit_hub.models import Hook, Repository, SearchIndex, ShardInfo
+
+
+def make_index(count=40, stars=10):
+    return SearchIndex(
+        repositories=[
+            Repository(
+                repository=f"user/repo{i}",
+                stars=stars if i == 0 else i,
+                hooks=[Hook(id=f"hook{i}", name=f"Hook {i}")],
+                revision=f"v{i}.0.0" if i % 2 else None,
+                revision_resolved_at=1_700_000_000.0 if i % 2 else None,
+            )
+            for i in range(count)
+        ]
+    )
+
+
+@pytest.fixture
+def home(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    return tmp_path / "home"
+
+
+def test_fetch_only_changed_shards(home, tmp_path, capsys):
+    published = tmp_path / "published"
+    _shards.publish_index(make_index(), published)
+
+    assert fetch_index(str(published)) == 0
+    assert load_cache() == make_index()
+    assert capsys.readouterr().out.startswith(
+        f"Downloaded {_shards.SHARD_COUNT} of {_shards.SHARD_COUNT} shards"
+    )
+
+    _shards.publish_index(make_index(stars=20), published)
+    assert fetch_index(str(published)) == 0
+    assert load_cache() == make_index(stars=20)
+    assert capsys.readouterr().out.startswith("Downloaded 1 of")
+    assert len(list((home / ".pre-commit-hub" / "shards").iterdir())) == (
+        _shards.SHARD_COUNT
+    )
+
+
+def test_corrupt_shard_keeps_index(home, tmp_path):
+    published = tmp_path / "published"
+    _shards.publish_index(make_index(), published)
+    assert fetch_index(str(published)) == 0
+
+    manifest = _shards.publish_index(make_index(stars=20), published)
+    changed = next(
+        shard
+        for shard in manifest.shards
+        if not (
+            home / ".pre-commit-hub" / "shards" / f"{shard.sha256}.json.gz"
+        ).exists()
+    )
+    (published / changed.path).write_bytes(_shards.encode_shard([]))
+
+    assert fetch_index(str(published)) == 1
+    assert load_cache() == make_index()
+
+
+@pytest.mark.parametrize(
+    "content", [b"not gzip", gzip.compress(b"{not json"), gzip.compress(b'[{"a": 1}]')]
+)
+def test_invalid_shard_keeps_index(home, tmp_path, capsys, content):
+    published = tmp_path / "published"
+    _shards.publish_index(make_index(), published)
+    assert fetch_index(str(published)) == 0
+
+    # A shard that matches its hash, but was published broken.
+    manifest = _shards.publish_index(make_index(stars=20), published)
+    digest = hashlib.sha256(content).hexdigest()
+    (published / "shards" / f"{digest}.json.gz").write_bytes(content)
+    manifest.shards[0] = ShardInfo(
+        path=f"shards/{digest}.json.gz", sha256=digest, size=len(content)
+    )
+    (published / _shards.MANIFEST_NAME).write_text(manifest.model_dump_json())
+    capsys.readouterr()
+
+    assert fetch_index(str(published)) == 1
+    assert f"{digest}.json.gz" in capsys.readouterr().out
+    assert load_cache() == make_index()
+
+
+def test_fetch_over_http(home, tmp_path):
+    published = tmp_path / "published"
+    _shards.publish_index(make_index(), published)
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(published))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        assert fetch_index(url) == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert load_cache() == make_index()
+
+
+def test_unsupported_version(home, tmp_path):
+    published = tmp_path / "published"
+    manifest = _shards.publish_index(make_index(), published)
+    manifest.version += 1
+    (published / _shards.MANIFEST_NAME).write_text(manifest.model_dump_json())
+    assert fetch_index(str(published)) == 1
+
+
+def test_shards_not_matching_manifest(home, tmp_path, capsys):
+    published = tmp_path / "published"
+    manifest = _shards.publish_index(make_index(), published)
+    manifest.repositories.append("user/missing")
+    (published / _shards.MANIFEST_NAME).write_text(manifest.model_dump_json())
+
+    assert fetch_index(str(published)) == 1
+    assert "manifest" in capsys.readouterr().out
@@ -0,0 +1,112 @@
+import sys
+import random
+import pytest
+from thefuzz import fuzz, process
+from pre_commit_hub.commands._fuzzy import FuzzyIndex, build_postings, document_text
+from pre_commit_hub.commands._index_file import IndexFile, write_index
+from pre_commit_hub.models import Hook, Repository, SearchIndex
+
+WORDS = ["lint", "format", "black", "ruff", "yaml", "check", "py", "mypy", "go"]
+
+
+@pytest.fixture(scope="module")
+def search_index():
+    rng = random.Random(0)
+    return SearchIndex(
+        repositories=[
+            Repository(
+                repository=f"{rng.choice(WORDS)}{i}/{rng.choice(WORDS)}-{rng.choice(WORDS)}",
+                stars=rng.randrange(1000),
+                hooks=[
+                    Hook(
+                        id="-".join(rng.sample(WORDS, 2)),
+                        name=" ".join(rng.sample(WORDS, 2)),
+                        description=(
+                            " ".join(rng.sample(WORDS, 4))
+                            if rng.random() < 0.7
+                            else None
+                        ),
+                    )
+                    for _ in range(rng.randrange(1, 6))
+                ],
+            )
+            for i in range(60)
+        ]
+    )
+
+
+@pytest.fixture(scope="module")
+def index_file(search_index, tmp_path_factory):
+    path = tmp_path_factory.mktemp("index") / "index.bin"
+    write_index(path, search_index)
+    return IndexFile(path)
+
+
+def thefuzz_extract(search_index, query, limit):
+    documents = [
+        {"repository": repo.repository, "stars": repo.stars, **hook.model_dump()}
+        for repo in search_index.repositories
+        for hook in repo.hooks
+    ]
+    return process.extract(
+        query, documents, scorer=fuzz.partial_token_sort_ratio, limit=limit
+    )
+
+
+@pytest.mark.parametrize(
+    "query", ["black", "ruff format", "mypy", "lint yaml", "blakc", "pyy", "g", "zzz"]
+)
+@pytest.mark.parametrize("limit", [1, 5, 20])
+def test_extract_matches_thefuzz(search_index, index_file, query, limit):
+    expected = thefuzz_extract(search_index, query, limit)
+    results = index_file.fuzzy_index().extract(query, limit)
+
+    assert [
+        (index_file.document(hook_index), int(round(score)))
+        for hook_index, score in results
+    ] == expected
+
+
+def test_from_documents_scores_everything(search_index):
+    documents = [
+        document_text(repo, hook)
+        for repo in search_index.repositories
+        for hook in repo.hooks
+    ]
+    expected = thefuzz_extract(search_index, "check", 5)
+    results = FuzzyIndex.from_documents(documents).extract("check", 5)
+
+    assert [int(round(score)) for _, score in results] == [
+        score for _, score in expected
+    ]
+
+
+def test_extract_keeps_ties_with_the_cutoff():
+    # The first document shares no trigram with the query, so it's scored last
+    # with the second's (equal) score as the cutoff, but it ranks first.
+    documents = [" latlccckkbc", "mck laalamcl"]
+    offsets, postings = build_postings(documents)
+    fuzzy_index = FuzzyIndex(documents.__getitem__, 2, 10, offsets, postings)
+
+    assert [doc_index for doc_index, _ in fuzzy_index.extract("black fmt", 1)] == [0]
+
+
+@pytest.mark.parametrize("limit", [1, 5, 20, 1000])
+def test_extract_many_matches_extract(index_file, limit):
+    pytest.importorskip("numpy")
+    queries = ["black", "ruff format", "mypy", "lint yaml", "blakc", "g", "zzz", ""]
+    fuzzy_index = index_file.fuzzy_index()
+
+    assert fuzzy_index.extract_many(queries, limit) == [
+        fuzzy_index.extract(query, limit) for query in queries
+    ]
+
+
+def test_extract_many_without_numpy(index_file, monkeypatch):
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    fuzzy_index = index_file.fuzzy_index()
+
+    assert fuzzy_index.extract_many(["black", "mypy"], 5) == [
+        fuzzy_index.extract("black", 5),
+        fuzzy_index.extract("mypy", 5),
+    ]
@@ -0,0 +1,97 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pre_commit_hub.commands import _github
+from pre_commit_hub.commands._github import RequestScheduler, TokenBucket
+
+
+def test_token_bucket_allows_burst():
+    bucket = TokenBucket(rate=1, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+def test_token_bucket_paces_after_burst():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_scheduler_records_rate_limit():
+    scheduler = RequestScheduler(100, 10)
+    scheduler.after_response({}, 10)
+    scheduler.after_response(
+        {
+            "x-ratelimit-remaining": "4999",
+            "x-ratelimit-limit": "5000",
+            "x-ratelimit-reset": "1700000000",
+        },
+        20,
+    )
+    assert scheduler.rate_limit.requests == 2
+    assert scheduler.rate_limit.bytes == 30
+    assert scheduler.rate_limit.remaining == 4999
+    assert scheduler.rate_limit.limit == 5000
+
+
+def test_scheduler_waits_for_reset_when_exhausted(monkeypatch):
+    scheduler = RequestScheduler(100, 10)
+    scheduler.rate_limit.remaining = 0
+    scheduler.rate_limit.reset = int(time.time()) + 30
+    sleeps = []
+    monkeypatch.setattr(_github.time, "sleep", sleeps.append)
+    scheduler.before_request()
+    assert sleeps and sleeps[0] > 29
+
+
+def test_usage_summary(monkeypatch):
+    scheduler = RequestScheduler(100, 10)
+    monkeypatch.setattr(_github, "_scheduler", scheduler)
+    assert _github.usage_summary() is None
+    scheduler.after_response(
+        {
+            "x-ratelimit-remaining": "10",
+            "x-ratelimit-limit": "60",
+            "x-ratelimit-reset": "1700000000",
+        },
+        2048,
+    )
+    summary = _github.usage_summary()
+    assert summary is not None
+    assert summary.startswith("GitHub API: 1 requests, 2 KiB, 10/60 remaining")
+
+
+def test_connection_counts_body_bytes(monkeypatch):
+    body = '{"description": "ünïcödé"}'.encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            # No Content-Length, so the body itself has to be measured.
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    scheduler = RequestScheduler(100, 10)
+    monkeypatch.setattr(_github, "_scheduler", scheduler)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        connection = _github.ScheduledHTTPConnection(
+            "127.0.0.1", server.server_address[1]
+        )
+        connection.request("GET", "/", None, {})
+        response = connection.getresponse()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert response.text == body.decode()
+    assert scheduler.rate_limit.bytes == len(body)
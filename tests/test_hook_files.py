@@ -0,0 +1,51 @@
+from pre_commit_hub.commands._hook_files import HookFileStore
+
+HOOKS = "- id: hook\n  name: Hook\n"
+
+
+def test_hooks_kept_by_sha(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    store = HookFileStore.load()
+
+    hooks = store.hooks("a", lambda: HOOKS)
+    assert store.hooks("a", lambda: "not: [parsed") == hooks
+    assert store.hooks(None, lambda: HOOKS) == hooks
+    store.save()
+
+    assert HookFileStore.load().hooks("a", lambda: "not: [parsed") == hooks
+
+
+def parsed_after_builds(builds, max_files):
+    for shas in builds:
+        store = HookFileStore.load(max_files=max_files)
+        for sha in shas:
+            store.hooks(sha, lambda: HOOKS)
+        store.save()
+
+    store = HookFileStore.load()
+    parsed = []
+    for sha in ["a", "b", "c"]:
+        store.hooks(sha, lambda: parsed.append(sha) or HOOKS)
+    return parsed
+
+
+def test_least_recently_used_files_evicted(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert parsed_after_builds([["a"], ["b"], ["a", "c"]], max_files=2) == ["b"]
+
+
+def test_files_used_by_one_build_evicted_in_use_order(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert parsed_after_builds([["a", "b", "c"]], max_files=2) == ["a"]
+
+
+def test_unusable_store_parses_every_file(tmp_path, monkeypatch):
+    (tmp_path / "home").write_text("not a directory")
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    store = HookFileStore.load()
+
+    parsed = []
+    for _ in range(2):
+        store.hooks("a", lambda: parsed.append("a") or HOOKS)
+    store.save()
+    assert parsed == ["a", "a"]
@@ -0,0 +1,109 @@
+import pytest
+import yaml
+from pre_commit_hub.commands._index_file import (
+    MAGIC,
+    VERSION,
+    IndexFile,
+    IndexFormatError,
+    write_index,
+)
+from pre_commit_hub.commands.search import load_cache, load_index
+from pre_commit_hub.models import Hook, Repository, SearchIndex
+
+
+@pytest.fixture
+def search_index(sample_search_index):
+    """The sample index, plus values the format stores specially."""
+    sample_search_index.repositories += [
+        Repository(repository="user3/empty", stars=0, hooks=[]),
+        Repository(
+            repository="user4/project4",
+            stars=2**40,
+            hooks=[
+                Hook(id="hook1", name="Hook ☃", description=""),
+                Hook(id="hook4", name="Hook 4"),
+            ],
+        ),
+    ]
+    return sample_search_index
+
+
+def test_round_trip(tmp_path, search_index):
+    write_index(tmp_path / "index.bin", search_index)
+    index_file = IndexFile(tmp_path / "index.bin")
+
+    assert index_file.to_search_index() == search_index
+    assert index_file.repository_count == 4
+    assert index_file.repository(2) == search_index.repositories[2]
+    assert index_file.repository(3) == search_index.repositories[3]
+    assert index_file.hook(5).description is None
+
+
+def test_round_trip_empty(tmp_path):
+    write_index(tmp_path / "index.bin", SearchIndex(repositories=[]))
+    assert IndexFile(tmp_path / "index.bin").to_search_index().repositories == []
+
+
+def test_rejects_other_files(tmp_path):
+    (tmp_path / "empty.bin").write_bytes(b"")
+    (tmp_path / "index.yaml").write_text("repositories: []\n")
+
+    with pytest.raises(IndexFormatError):
+        IndexFile(tmp_path / "empty.bin")
+    with pytest.raises(IndexFormatError):
+        IndexFile(tmp_path / "index.yaml")
+
+
+def test_rejects_other_versions(tmp_path, search_index):
+    path = tmp_path / "index.bin"
+    write_index(path, search_index)
+    content = bytearray(path.read_bytes())
+    content[len(MAGIC)] = VERSION - 1
+    path.write_bytes(content)
+
+    with pytest.raises(IndexFormatError, match=f"not a version {VERSION} index"):
+        IndexFile(path)
+
+
+def test_load_cache_falls_back_to_yaml(tmp_path, monkeypatch, search_index):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    cache_dir = tmp_path / ".pre-commit-hub"
+    cache_dir.mkdir()
+    (cache_dir / "index.yaml").write_text(yaml.dump(search_index.model_dump()))
+
+    assert load_cache() == search_index
+
+    write_index(cache_dir / "index.bin", SearchIndex(repositories=[]))
+    assert load_cache().repositories == []
+
+
+def test_from_search_index(tmp_path, search_index):
+    write_index(tmp_path / "index.bin", search_index)
+    on_disk = IndexFile(tmp_path / "index.bin")
+    in_memory = IndexFile.from_search_index(search_index)
+
+    assert in_memory.to_search_index() == search_index
+    assert [in_memory.document(i) for i in range(6)] == [
+        on_disk.document(i) for i in range(6)
+    ]
+
+
+def test_load_index_converts_yaml(tmp_path, monkeypatch, search_index):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    cache_dir = tmp_path / ".pre-commit-hub"
+    cache_dir.mkdir()
+    (cache_dir / "index.yaml").write_text(yaml.dump(search_index.model_dump()))
+
+    index_file = load_index()
+    assert (cache_dir / "index.bin").exists()
+    assert index_file.to_search_index() == search_index
+    hook_lookup = index_file.hook_lookup()
+    assert hook_lookup is not None
+    assert hook_lookup.find("hook1") == [0, 2, 4]
+    assert index_file.document(5) == {
+        "repository": "user4/project4",
+        "stars": 2**40,
+        "id": "hook4",
+        "name": "Hook 4",
+        "description": None,
+    }
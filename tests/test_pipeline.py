@@ -0,0 +1,56 @@
+import threading
+import time
+import pytest
+from pre_commit_hub.commands._pipeline import run_pipeline
+
+
+def test_results_appended_once_each():
+    appended = []
+
+    run_pipeline(
+        range(100),
+        lambda item: [item, -item] if item % 2 else [],
+        lambda result: result * 10,
+        appended.append,
+        jobs=4,
+    )
+
+    assert sorted(appended) == sorted(
+        result * 10 for item in range(1, 100, 2) for result in (item, -item)
+    )
+
+
+def test_slow_append_holds_back_fetches():
+    lock = threading.Lock()
+    fetched = 0
+    ahead = []
+
+    def fetch(item):
+        nonlocal fetched
+        with lock:
+            fetched += 1
+        return [item]
+
+    def append(result):
+        with lock:
+            ahead.append(fetched - len(ahead))
+        time.sleep(0.001)
+
+    run_pipeline(range(200), fetch, lambda result: result, append, jobs=4, queue_size=2)
+
+    # The result being appended, two full queues, a result held by the parser
+    # and one per fetch worker; without backpressure all 200 would be.
+    assert len(ahead) == 200
+    assert max(ahead) <= 1 + 2 + 2 + 1 + 4
+
+
+def test_stage_errors_stop_pipeline():
+    def parse(result):
+        if result == 50:
+            raise ValueError("bad result")
+        return result
+
+    appended = []
+    with pytest.raises(ValueError, match="bad result"):
+        run_pipeline(range(1000), lambda item: [item], parse, appended.append, jobs=2)
+    assert 50 not in appended
@@ -0,0 +1,61 @@
+import json
+import pytest
+from pre_commit_hub.commands import search
+from pre_commit_hub.commands._query_cache import QueryCache
+from pre_commit_hub.commands.build_index import save_to_cache
+from pre_commit_hub.models import Hook, Repository, SearchIndex
+
+
+def make_index(name: str) -> SearchIndex:
+    return SearchIndex(
+        repositories=[
+            Repository(
+                repository=f"user{i}/{name}{i}",
+                stars=i,
+                hooks=[Hook(id=f"{name}{i}", name=f"{name} {i}")],
+            )
+            for i in range(5)
+        ]
+    )
+
+
+@pytest.fixture(autouse=True)
+def home(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    save_to_cache(make_index("lint"))
+
+
+def search_ids(capsys, query):
+    assert search.search_hooks(query, limit=2, output="json") == 0
+    return [result["id"] for result in json.loads(capsys.readouterr().out)]
+
+
+def test_repeated_search_skips_index(capsys, monkeypatch):
+    expected = search_ids(capsys, "Lint3")
+
+    def load_index():
+        raise AssertionError("searched the index")
+
+    monkeypatch.setattr(search, "load_index", load_index)
+
+    assert search_ids(capsys, "  lint3 ") == expected
+    with pytest.raises(AssertionError):
+        search_ids(capsys, "lint3 lint")
+
+
+def test_new_index_invalidates(capsys):
+    assert search_ids(capsys, "lint3")[0] == "lint3"
+
+    save_to_cache(make_index("format"))
+
+    assert search_ids(capsys, "lint3")[0].startswith("format")
+
+
+def test_least_recently_used_evicted():
+    with QueryCache.open(max_entries=2) as cache:
+        cache.put(["a", "b"], 5, [[({"id": "a"}, 100)], [({"id": "b"}, 100)]])
+        assert cache.get(["a"], 5) == [[({"id": "a"}, 100)]]
+        cache.put(["c"], 5, [[]])
+
+        assert cache.get(["a", "b", "c"], 5) == [[({"id": "a"}, 100)], None, []]
+        assert cache.get(["a"], 1) == [None]
@@ -1,4 +1,5 @@
 import yaml
+from pre_commit_hub.commands import _config, remove
 from pre_commit_hub.commands.remove import transform_yaml_remove_hook
 
 
@@ -87,3 +88,75 @@ def test_transform_yaml_remove_hook_multiple_repos():
         ]
     }
     assert yaml.safe_load(result) == expected
+
+
+def test_remove_hooks_batch(tmp_path, capsys, monkeypatch):
+    config_path = tmp_path / ".pre-commit-config.yaml"
+    config_path.write_text(
+        yaml.dump(
+            {
+                "repos": [
+                    {
+                        "repo": "https://github.com/user/repo1",
+                        "hooks": [{"id": "hook1"}, {"id": "hook2"}],
+                    },
+                    {
+                        "repo": "https://github.com/user/repo2",
+                        "hooks": [{"id": "hook3"}],
+                    },
+                ]
+            }
+        )
+    )
+    writes = []
+    write_atomic = _config.write_atomic
+    monkeypatch.setattr(
+        _config,
+        "write_atomic",
+        lambda path, content: writes.append(path) or write_atomic(path, content),
+    )
+
+    assert remove.remove_hooks(["hook1", "missing", "hook3"], str(config_path)) == 1
+
+    assert capsys.readouterr().out.splitlines() == [
+        "Removed hook 'hook1' from config",
+        "Hook 'missing' not found in config",
+        "Removed hook 'hook3' from config",
+    ]
+    assert len(writes) == 1
+    assert yaml.safe_load(config_path.read_text()) == {
+        "repos": [{"repo": "https://github.com/user/repo1", "hooks": [{"id": "hook2"}]}]
+    }
+
+
+def test_remove_hooks_nothing_to_remove(tmp_path):
+    config_path = tmp_path / ".pre-commit-config.yaml"
+    config_path.write_text("# Comment\nrepos: []\n")
+
+    assert remove.remove_hooks(["hook1"], str(config_path)) == 1
+    assert config_path.read_text() == "# Comment\nrepos: []\n"
+
+
+def test_remove_hooks_many_configs(tmp_path, capsys):
+    for name in ["a", "b", "c/d"]:
+        (tmp_path / name).mkdir(parents=True)
+    config = "repos:\n- repo: local\n  hooks:\n  - id: hook1\n  - id: hook2\n"
+    (tmp_path / "a" / ".pre-commit-config.yaml").write_text(config)
+    (tmp_path / "c" / "d" / ".pre-commit-config.yaml").write_text(config)
+    (tmp_path / "b" / ".pre-commit-config.yaml").write_text("repos: []\n")
+
+    pattern = str(tmp_path / "**" / ".pre-commit-config.yaml")
+    assert remove.remove_hooks(["hook1", "missing"], [pattern]) == 1
+
+    out = capsys.readouterr().out
+    assert out.startswith(
+        "Changed 2 of 3 configs\n"
+        f"  {tmp_path / 'a' / '.pre-commit-config.yaml'}\n"
+        f"  {tmp_path / 'c' / 'd' / '.pre-commit-config.yaml'}\n"
+    )
+    assert "Hook 'missing' not found in any config" in out
+    for name in ["a", "c/d"]:
+        assert (tmp_path / name / ".pre-commit-config.yaml").read_text() == (
+            config.replace("  - id: hook1\n", "")
+        )
+    assert (tmp_path / "b" / ".pre-commit-config.yaml").read_text() == "repos: []\n"
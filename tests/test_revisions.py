@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+import pytest
+from pre_commit_hub.commands import _revisions
+
+
+def make_tag(name, sha):
+    return SimpleNamespace(name=name, commit=SimpleNamespace(sha=sha))
+
+
+class FakeRepo:
+    def __init__(self, tags, commits=()):
+        self.tags = tags
+        self.commits = list(commits)
+        self.tags_read = 0
+
+    def get_tags(self):
+        for tag in self.tags:
+            self.tags_read += 1
+            yield tag
+
+    def get_commits(self):
+        return [SimpleNamespace(sha=sha) for sha in self.commits]
+
+
+@pytest.fixture
+def fake_repos(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    repos = {}
+    calls = []
+
+    def get_repo(name):
+        calls.append(name)
+        return repos[name]
+
+    monkeypatch.setattr(
+        _revisions, "get_github", lambda: SimpleNamespace(get_repo=get_repo)
+    )
+    return repos, calls
+
+
+def test_prefers_tag_with_period(fake_repos):
+    repos, _ = fake_repos
+    repos["user/repo"] = FakeRepo(
+        [make_tag("latest", "a"), make_tag("v1.2.0", "a"), make_tag("v1.1.0", "b")]
+    )
+    assert _revisions.get_latest_revision("user/repo") == "v1.2.0"
+
+
+def test_stops_after_first_commit_tags(fake_repos):
+    repos, _ = fake_repos
+    tags = [make_tag("v2", "a"), make_tag("v1.0", "b")] + [
+        make_tag(f"v0.{i}", str(i)) for i in range(1000)
+    ]
+    repos["user/repo"] = FakeRepo(tags)
+
+    assert _revisions.get_latest_revision("user/repo") == "v2"
+    assert repos["user/repo"].tags_read == 2
+
+
+def test_falls_back_to_latest_commit(fake_repos):
+    repos, _ = fake_repos
+    repos["user/repo"] = FakeRepo([], commits=["abc123", "def456"])
+    assert _revisions.get_latest_revision("user/repo") == "abc123"
+
+
+def test_resolve_revisions_uses_cache(fake_repos, monkeypatch):
+    repos, calls = fake_repos
+    repos["user/one"] = FakeRepo([make_tag("v1.0", "a")])
+    repos["user/two"] = FakeRepo([make_tag("v2.0", "b")])
+
+    assert _revisions.resolve_revisions(["user/one", "user/two", "user/one"]) == {
+        "user/one": "v1.0",
+        "user/two": "v2.0",
+    }
+    assert sorted(calls) == ["user/one", "user/two"]
+
+    repos["user/one"].tags = [make_tag("v1.1", "c")]
+    assert _revisions.resolve_revisions(["user/one"]) == {"user/one": "v1.0"}
+    assert len(calls) == 2
+
+    assert _revisions.resolve_revisions(["user/one"], ttl=0) == {"user/one": "v1.1"}
+    assert len(calls) == 3
@@ -0,0 +1,81 @@
+import json
+import pytest
+from pre_commit_hub.commands import search
+from pre_commit_hub.commands.build_index import save_to_cache
+from pre_commit_hub.models import Hook, Repository, SearchIndex
+
+
+@pytest.fixture(autouse=True)
+def index(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    save_to_cache(
+        SearchIndex(
+            repositories=[
+                Repository(
+                    repository=f"user{i}/lint{i}",
+                    stars=i,
+                    hooks=[Hook(id=f"lint{i}", name=f"Lint {i}")],
+                )
+                for i in range(10)
+            ]
+        )
+    )
+
+
+def test_text_output(capsys):
+    assert search.search_hooks("lint3", limit=1) == 0
+    assert capsys.readouterr().out == (
+        "Match score: 100\n"
+        "Repository: user3/lint3\n"
+        "Stars: 3\n"
+        "Hook ID: lint3\n"
+        "Hook Name: Lint 3\n"
+        "Description: None\n"
+        "---\n"
+    )
+
+
+@pytest.mark.parametrize("limit", [1, 3, 8])
+def test_jsonl_output(capsys, limit):
+    assert search.search_hooks("lint", limit=limit, output="jsonl") == 0
+    lines = capsys.readouterr().out.splitlines()
+    results = [json.loads(line) for line in lines]
+    assert results == [
+        {**hook, "score": score} for hook, score in search.extract("lint", limit)
+    ]
+    assert len(results) == limit
+
+
+def test_json_output(capsys):
+    assert search.search_hooks("lint", limit=2, output="json") == 0
+    results = json.loads(capsys.readouterr().out)
+    assert [result["id"] for result in results] == [
+        hook["id"] for hook, _ in search.extract("lint", 2)
+    ]
+    assert set(results[0]) == {
+        "repository",
+        "stars",
+        "id",
+        "name",
+        "description",
+        "score",
+    }
+
+
+def test_json_output_without_results(capsys, monkeypatch):
+    monkeypatch.setattr(search, "extract", lambda query, limit: [])
+    assert search.search_hooks("nothing", output="json") == 1
+    assert json.loads(capsys.readouterr().out) == []
+
+
+def test_search_batch(capsys, tmp_path):
+    batch_file = tmp_path / "queries.txt"
+    batch_file.write_text("lint3\n\nlint\n")
+
+    assert search.search_batch(str(batch_file), limit=2, output="jsonl") == 0
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert results == [
+        {"query": query, **hook, "score": score}
+        for query in ["lint3", "lint"]
+        for hook, score in search.extract(query, 2)
+    ]
@@ -0,0 +1,98 @@
+import os
+import tempfile
+import threading
+from pathlib import Path
+import pytest
+from pre_commit_hub.commands import search, serve
+from pre_commit_hub.commands._daemon import Daemon, DaemonError
+from pre_commit_hub.commands.build_index import save_to_cache
+from pre_commit_hub.models import Hook, Repository, SearchIndex
+
+
+def make_index(stars=100):
+    return SearchIndex(
+        repositories=[
+            Repository(
+                repository="psf/black",
+                stars=stars,
+                hooks=[
+                    Hook(id="black", name="black", description="The formatter"),
+                    Hook(id="black-jupyter", name="black-jupyter"),
+                ],
+            ),
+            Repository(
+                repository="astral-sh/ruff-pre-commit",
+                stars=50,
+                hooks=[Hook(id="ruff", name="ruff", description="The linter")],
+            ),
+        ]
+    )
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # Unix socket paths are limited to about a hundred characters, which
+    # pytest's `tmp_path` can exceed.
+    with tempfile.TemporaryDirectory() as home:
+        monkeypatch.setenv("HOME", home)
+        save_to_cache(make_index())
+        path = Path(home) / ".pre-commit-hub" / "serve.sock"
+        server = serve.make_server(path, serve.IndexService())
+        threading.Thread(target=server.serve_forever, args=(0.01,)).start()
+        yield path
+        server.shutdown()
+        server.server_close()
+
+
+def connect() -> Daemon:
+    daemon = Daemon.connect()
+    assert daemon is not None
+    return daemon
+
+
+def test_search_matches_local(server):
+    with connect() as daemon:
+        for query in ["black", "ruff", "formatter", "zzz"]:
+            results = daemon.request("search", query=query, limit=5)
+            assert [tuple(result) for result in results] == search.extract(query)
+
+
+def test_lookup(server):
+    with connect() as daemon:
+        [[hook, repo]] = daemon.request("lookup", query="psf/black:black")
+    assert hook == {"id": "black", "name": "black", "description": "The formatter"}
+    assert repo["repository"] == "psf/black"
+
+
+def test_errors_are_reported(server):
+    with connect() as daemon:
+        with pytest.raises(DaemonError, match="Unknown command"):
+            daemon.request("nope")
+        assert daemon.request("ping") == "pong"
+
+
+def test_reloads_rebuilt_index(server):
+    with connect() as daemon:
+        assert daemon.request("search", query="black", limit=1)[0][0]["stars"] == 100
+        save_to_cache(make_index(stars=200))
+        assert daemon.request("search", query="black", limit=1)[0][0]["stars"] == 200
+
+
+def test_search_hooks_uses_server(server, monkeypatch, capsys):
+    def extract(query, limit=5):
+        raise AssertionError("searched locally")
+
+    monkeypatch.setattr(search, "extract", extract)
+    assert search.search_hooks("ruff") == 0
+    assert "Repository: astral-sh/ruff-pre-commit" in capsys.readouterr().out
+
+
+def test_no_server(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    assert Daemon.connect() is None
+    assert search.daemon_extract("black") is None
+
+
+def test_serve_refuses_second_server(server, capsys):
+    assert serve.serve(str(server)) == 1
+    assert os.path.exists(server)
@@ -0,0 +1,82 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import pytest
+from pre_commit_hub import cli, trace
+from pre_commit_hub.commands._config import ConfigEditor
+
+
+@pytest.fixture(autouse=True)
+def reset_trace():
+    trace.reset()
+    yield
+    trace.reset()
+
+
+def test_disabled_records_nothing():
+    with trace.phase("phase"):
+        trace.count("counter")
+    assert trace.summary() == []
+
+
+def test_summary():
+    trace.enable()
+    for _ in range(2):
+        with trace.phase("outer"):
+            ConfigEditor("repos: []\n").add_hook("local", "check", None)
+    trace.count("http.bytes", 10)
+    trace.count("http.bytes", 5)
+
+    rows = trace.summary()
+    assert [row[:2] for row in rows] == [
+        ["outer", "2"],
+        ["config.add_hook", "2"],
+        ["config.parse", "2"],
+        ["http.bytes", "15"],
+    ]
+
+
+def test_cli_writes_chrome_trace(tmp_path, monkeypatch, capsys):
+    config = tmp_path / "config.yaml"
+    config.write_text("repos:\n- repo: local\n  hooks:\n  - id: check\n")
+    (tmp_path / ".pre-commit-hub").mkdir()
+    (tmp_path / ".pre-commit-hub" / "index.yaml").write_text("repositories: []\n")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "pre-commit-hub",
+            "--trace",
+            str(tmp_path / "trace.json"),
+            "remove",
+            "-f",
+            str(config),
+            "check",
+        ],
+    )
+
+    assert cli.main() == 0
+
+    assert "config.remove_hook" in capsys.readouterr().err
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    main = next(event for event in events if event["name"] == "cli.main")
+    assert main["args"] == {"command": "remove"}
+    write = next(event for event in events if event["name"] == "config.write")
+    assert (
+        main["ts"]
+        <= write["ts"]
+        <= write["ts"] + write["dur"]
+        <= main["ts"] + main["dur"]
+    )
+
+
+def test_count_from_threads():
+    trace.enable()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(8):
+            executor.submit(
+                lambda: [trace.count("http.requests") for _ in range(10000)]
+            )
+
+    assert trace.summary() == [["http.requests", "80000", "", ""]]
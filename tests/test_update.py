@@ -0,0 +1,105 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from pre_commit_hub.commands import _revisions
+from pre_commit_hub.commands.update import github_repositories, update_repos
+
+CONFIG = """\
+repos:
+# Formatter.
+- repo: https://github.com/psf/black
+  rev: 24.1.0  # Keep in sync with CI.
+  hooks:
+  - id: black
+- repo: https://github.com/astral-sh/ruff-pre-commit.git
+  rev: v0.5.0
+  hooks:
+  - id: ruff
+- repo: local
+  hooks:
+  - id: check
+"""
+
+
+class FakeRepo:
+    def __init__(self, tag, block=None):
+        self.tag = tag
+        self.block = block
+
+    def get_tags(self):
+        if self.block is not None:
+            self.block.wait()
+        yield SimpleNamespace(name=self.tag, commit=SimpleNamespace(sha="a"))
+
+
+@pytest.fixture
+def fake_repos(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    repos = {}
+    monkeypatch.setattr(
+        _revisions,
+        "get_github",
+        lambda: SimpleNamespace(get_repo=lambda name: repos[name]),
+    )
+    return repos
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / ".pre-commit-config.yaml"
+    path.write_text(CONFIG)
+    return path
+
+
+def test_github_repositories():
+    config = {
+        "repos": [
+            {"repo": "https://github.com/psf/black"},
+            {"repo": "https://github.com/astral-sh/ruff-pre-commit.git"},
+            {"repo": "https://gitlab.com/pycqa/flake8"},
+            {"repo": "local"},
+        ]
+    }
+    assert github_repositories(config) == {
+        "https://github.com/psf/black": "psf/black",
+        "https://github.com/astral-sh/ruff-pre-commit.git": "astral-sh/ruff-pre-commit",
+    }
+
+
+def test_update_writes_bumps(fake_repos, config_file):
+    fake_repos["psf/black"] = FakeRepo("24.2.0")
+    fake_repos["astral-sh/ruff-pre-commit"] = FakeRepo("v0.5.0")
+
+    assert update_repos(str(config_file)) == 0
+    assert config_file.read_text() == CONFIG.replace("24.1.0", "24.2.0")
+
+
+def test_update_dry_run(fake_repos, config_file, capsys):
+    fake_repos["psf/black"] = FakeRepo("24.2.0")
+    fake_repos["astral-sh/ruff-pre-commit"] = FakeRepo("v0.6.0")
+
+    assert update_repos(str(config_file), dry_run=True) == 0
+    assert config_file.read_text() == CONFIG
+    out = capsys.readouterr().out
+    assert "Updating psf/black: 24.1.0 -> 24.2.0" in out
+    assert "Updating astral-sh/ruff-pre-commit: v0.5.0 -> v0.6.0" in out
+
+
+def test_update_timeout(fake_repos, config_file):
+    block = threading.Event()
+    fake_repos["psf/black"] = FakeRepo("24.2.0", block=block)
+    fake_repos["astral-sh/ruff-pre-commit"] = FakeRepo("v0.6.0")
+
+    try:
+        assert update_repos(str(config_file), timeout=0.1) == 1
+    finally:
+        block.set()
+    assert config_file.read_text() == CONFIG.replace("v0.5.0", "v0.6.0")
+
+
+def test_resolve_reports_failures(fake_repos):
+    fake_repos["psf/black"] = FakeRepo("24.2.0")
+
+    results = _revisions.resolve_latest_revisions(["psf/black", "missing/repo"])
+    assert results["psf/black"] == "24.2.0"
+    assert isinstance(results["missing/repo"], KeyError)